@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+tp = pytest.importorskip('tomopy')
+from tomopy_ui import fbp
+
+
+@pytest.fixture(scope='module')
+def phantom():
+    obj = tp.shepp2d(64).astype(np.float32)
+    theta = tp.angles(180)
+    proj = tp.project(obj, theta)
+    return proj, theta
+
+
+def _disk(n, ratio=0.8):
+    ## Pixels well inside the reconstruction circle.
+    r = np.arange(n) + 0.5 - n / 2.
+    return np.hypot(r[:, None], r[None, :]) < ratio * n / 2.
+
+
+@pytest.mark.parametrize('algorithm', ['fbp', 'gridrec'])
+@pytest.mark.parametrize('filter_name', fbp.FILTERS)
+def test_numpy_fbp_matches_tomopy(phantom, algorithm, filter_name):
+    proj, theta = phantom
+    center = proj.shape[2] / 2.
+    ours = fbp.recon(proj, theta, center=center, filter_name=filter_name, ncore=2)
+    ref = tp.recon(proj, theta, center=center, algorithm=algorithm,
+                   filter_name=filter_name, ncore=2)
+    assert ours.shape == ref.shape
+    mask = _disk(ref.shape[-1])
+    a = ours[0][mask].astype(np.float64)
+    b = ref[0][mask].astype(np.float64)
+    ## Same image up to a scale close to 1; interpolation and filter
+    ## details differ a little between the engines.
+    scale = np.dot(a, b) / np.dot(a, a)
+    assert 0.75 < scale < 1.33
+    assert np.linalg.norm(scale * a - b) / np.linalg.norm(b) < 0.2
@@ -0,0 +1,16 @@
+import numpy as np
+from tomopy_ui.session import SessionManager
+
+
+def test_enforce_after_popping_spilled_dataset(tmp_path):
+    ## put A; put B (A spills); pop A; put C; enforce over budget.
+    session = SessionManager(max_bytes=1000, spill_dir=str(tmp_path))
+    session.put('A', 'data', np.zeros(100, dtype=np.float32))
+    session.put('B', 'data', np.zeros(100, dtype=np.float32), reserve=600)
+    assert session.report()['A']['data'] == (400, True)
+    arrays, _ = session.pop('A')
+    assert not isinstance(arrays['data'], np.memmap)
+    session.put('C', 'data', np.zeros(100, dtype=np.float32))
+    assert session.enforce(reserve=900) == [('B', 'data'), ('C', 'data')]
+    assert all(name != 'A' for name, key in session._used)
+    session.close()
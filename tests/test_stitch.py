@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('tomopy')
+from tomopy_ui.stitch import stitch_slabs
+
+
+def _slabs(volume, slab_rows):
+    for r0 in range(0, volume.shape[0], slab_rows):
+        yield volume[r0:r0+slab_rows].copy()
+
+
+def test_stitch_slabs_blends_overlap_with_ramp():
+    ## Scan 0 is all ones, scan 1 all threes; 4 shared rows.
+    rows, overlap = [10, 12], 4
+    parts = [_slabs(np.full((10, 2, 2), 1., dtype=np.float32), 3),
+             _slabs(np.full((12, 2, 2), 3., dtype=np.float32), 5)]
+    out = np.concatenate(list(stitch_slabs(parts, rows, [overlap])))
+    assert out.shape == (sum(rows) - overlap, 2, 2)
+    assert np.all(out[:10-overlap] == 1.)
+    assert np.all(out[10:] == 3.)
+    ## Weight of scan 1 goes (k + 0.5) / overlap across the shared rows.
+    w = (np.arange(overlap) + 0.5) / overlap
+    np.testing.assert_allclose(out[10-overlap:10, 0, 0], (1 - w) * 1. + w * 3., rtol=1e-6)
+
+
+def test_stitch_slabs_rejects_large_overlap():
+    parts = [_slabs(np.zeros((4, 1, 1), dtype=np.float32), 2),
+             _slabs(np.zeros((4, 1, 1), dtype=np.float32), 2)]
+    with pytest.raises(ValueError):
+        list(stitch_slabs(parts, [4, 4], [5]))
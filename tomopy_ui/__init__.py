@@ -1 +1,12 @@
-from .aps13bm_gui import tomopy_13bmapp, APS_13BM
+'''
+TomoPy_GUI. The GUI (and wx) are imported on first use, so worker processes
+that import one module of the package do not load them.
+'''
+__all__ = ['tomopy_13bmapp', 'APS_13BM']
+
+
+def __getattr__(name):
+    if name in __all__:
+        from . import aps13bm_gui
+        return getattr(aps13bm_gui, name)
+    raise AttributeError('module ' + __name__ + ' has no attribute ' + name)
@@ -29,11 +29,28 @@ import os
 import glob
 import gc
 import time
+import threading
 from optparse import OptionParser
-import scipy
+import scipy.ndimage
 import skimage
 from .save_data import save_recon
-from .import_data import import_data
+from .import_data import open_data, BEAMLINES
+from .data_stats import VolumeStats, sample_bounds, scale_to_bounds
+from .views import OrthoViews
+from .layout import to_sinogram_order, to_projection_order, sino_slab, sinogram, projection, nangles, nrows
+from .centering import interpolate_centers, multi_slice_centers, entropy_center, pair_axis, \
+    opposite_projection, center_slices
+from .iterative import ITERATIVE_ALGORITHMS, iterative_recon
+from .scheduler import slab_recon, shared_empty
+from .padding import pad_width, padded_recon, roi_recon
+from .autotune import autotune, auto_pad, load_profile, save_profile
+from .threads import ThreadGovernor
+from .metrics import RunStatus, StatusServer
+from .remote import RemoteServer
+from .session import SessionManager
+from .stitch import stitch_scans, read_slab, preprocess_slab
+from .phase import retrieve_phase
+from .sweep import FILTERED_ALGORITHMS, sweep_grid, sweep_slice, mosaic
 
 from netCDF4 import Dataset
 
@@ -53,6 +70,76 @@ class APS_13BM(wx.Frame):
     '''
     Setting up the GUI frame.
     '''
+    ## Parameters that remote scripts can set: name -> (widget, handler run
+    ## after the widget changes, as if the user had changed it).
+    REMOTE_PARAMS = {'beamline': ('beamline_menu', 'OnBeamlineCombo'),
+                     'pad_size': ('pad_size_combo', 'pad_size_combo_recall'),
+                     'air_normalization': ('bg_cb', 'onChecked'),
+                     'sino_order': ('sino_cb', None),
+                     'ring_width': ('ring_width_blank', None),
+                     'phase_energy': ('energy_blank', None),
+                     'phase_distance': ('distance_blank', None),
+                     'phase_pixel': ('pixel_blank', None),
+                     'phase_alpha': ('alpha_blank', None),
+                     'zinger_diff': ('zinger_diff_blank', None),
+                     'zinger_kernel_size': ('zinger_kernel_size_blank', None),
+                     'upper_slice': ('upper_rot_slice_blank', None),
+                     'upper_center': ('upper_rot_center_blank', None),
+                     'lower_slice': ('lower_rot_slice_blank', None),
+                     'lower_center': ('lower_rot_center_blank', None),
+                     'center_method': ('find_center_menu', 'find_center_algo_type'),
+                     'center_tol': ('tol_blank', None),
+                     'n_center_slices': ('n_center_slices_blank', None),
+                     'recon_algorithm': ('recon_menu', 'OnReconCombo'),
+                     'recon_filter': ('filter_menu', 'OnFilterCombo'),
+                     'warm_start': ('warm_start_cb', None),
+                     'batch_iter': ('batch_iter_blank', None),
+                     'max_iter': ('max_iter_blank', None),
+                     'iter_tol': ('iter_tol_blank', None),
+                     'roi': ('roi_cb', None),
+                     'roi_row_start': ('roi_row_start_blank', None),
+                     'roi_row_end': ('roi_row_end_blank', None),
+                     'roi_y_start': ('roi_y_start_blank', None),
+                     'roi_y_end': ('roi_y_end_blank', None),
+                     'roi_x_start': ('roi_x_start_blank', None),
+                     'roi_x_end': ('roi_x_end_blank', None),
+                     'pp_filter': ('pp_filter_menu', 'OnppFilterCombo'),
+                     'save_dtype': ('save_dtype_menu', 'OnSaveDtypeCombo'),
+                     'save_data_type': ('save_data_type_menu', 'OnSaveDataTypeCombo'),
+                     'crop': ('crop_cb', None),
+                     'ncore': ('ncore_blank', None),
+                     'nchunk': ('nchunk_blank', None),
+                     'nproc': ('nproc_blank', None)}
+    ## Pipeline steps remote scripts can run, as button handler names.
+    REMOTE_STEPS = {'zinger': 'zinger_removal',
+                    'normalize': 'normalization',
+                    'phase': 'phase_retrieval',
+                    'find_center': 'find_rot_center',
+                    'tilt': 'tilt_correction',
+                    'reconstruct': 'reconstruct',
+                    'remove_ring': 'remove_ring',
+                    'filter': 'filter_pp_data',
+                    'auto_tune': 'auto_tune',
+                    'save': 'save_recon'}
+    ## Reconstruction menu names -> TomoPy algorithm names, where they differ.
+    RECON_ALGORITHMS = {'Algebraic': 'art',
+                        'Block Algebraic': 'bart',
+                        'Filtered Back-projection': 'fbp',
+                        'FBP (NumPy)': 'numpy_fbp',
+                        'Gridrec': 'gridrec',
+                        'Max-likelihood Expectation': 'mlem',
+                        'Ordered-subset Expectation': 'osem',
+                        'Simultaneous Algebraic': 'sirt',
+                        'Total Variation': 'tv',
+                        'Gradient Descent': 'grad'}
+    ## Per-dataset attributes kept with a dataset's arrays when another
+    ## dataset is made active (see stash_dataset).
+    SESSION_ARRAYS = ('data', 'flat', 'dark', 'data_slice')
+    SESSION_ATTRS = ('dataset', 'data_path', '_fname', 'theta', 'sx', 'sy', 'sz',
+                     'data_min', 'data_max', 'sino_order', 'npad', 'logfile')
+    SESSION_WIDGETS = ('upper_rot_slice_blank', 'upper_rot_center_blank',
+                       'lower_rot_slice_blank', 'lower_rot_center_blank')
+
     def __init__(self, parent=None, *args,**kwds):
 
         kwds["style"] = wx.DEFAULT_FRAME_STYLE|wx.RESIZE_BORDER|wx.TAB_TRAVERSAL
@@ -63,6 +150,27 @@ class APS_13BM(wx.Frame):
         font = wx.SystemSettings.GetFont(wx.SYS_SYSTEM_FONT)
         font.SetPointSize(9)
         self.image_frame = None
+        ## Plot windows opened from the visualization panel.
+        self.plot_frames = []
+        ## Working volume and its cached statistics. Statistics are only
+        ## recomputed after data_changed() is called.
+        self.data = None
+        self.data_slice = None
+        self.stats = VolumeStats()
+        self.views = OrthoViews()
+        ## Progress of the running stage, served over HTTP when enabled.
+        self.run_status = RunStatus()
+        self.status_server = None
+        ## Per-stage thread budgets for tomopy, BLAS and OpenMP.
+        self.governor = ThreadGovernor(status = self.run_status)
+        ## Working array layout. False is (angle, row, column) as read from
+        ## file, True is (row, angle, column). See layout.py.
+        self.sino_order = False
+        ## Datasets opened earlier in this session. The active dataset is
+        ## held by the frame; the others by the session, which spills their
+        ## least recently used arrays to disk when memory runs short.
+        self.session = SessionManager()
+        self.data_path = None
         '''
         Making the menu
         '''
@@ -72,6 +180,7 @@ class APS_13BM(wx.Frame):
         menu_open = menu.Append(wx.NewId(), "Import Data", "Read in data files")
         menu_chdr = menu.Append(wx.NewId(), 'Change Directory', 'Change the Saving and Working Directory')
         menu_free = menu.Append(wx.NewId(), "Free Memory", "Release data from RAM")
+        menu_stitch = menu.Append(wx.NewId(), "Stitch Scans", "Reconstruct a vertical stack of scans into one volume")
         menu_exit = menu.Append(wx.NewId(),"Exit", "Terminate the program")
         ## Adding buttons to the File menu button of the bar.
         menuBar.Append(menu, "File");
@@ -80,6 +189,7 @@ class APS_13BM(wx.Frame):
         self.Bind(wx.EVT_MENU, self.client_read_nc, menu_open)
         self.Bind(wx.EVT_MENU, self.change_dir, menu_chdr)
         self.Bind(wx.EVT_MENU, self.client_free_mem, menu_free)
+        self.Bind(wx.EVT_MENU, self.OnStitch, menu_stitch)
         self.Bind(wx.EVT_MENU, self.OnExit, menu_exit)
         self.Bind(wx.EVT_CLOSE, self.OnExit)
         self.panel = wx.Panel(self)
@@ -95,6 +205,20 @@ class APS_13BM(wx.Frame):
         self.path_ID = wx.StaticText(self.panel, 1, label = '')
         status_label = wx.StaticText(self.panel, -1, label = 'Status: ')
         self.status_ID = wx.StaticText(self.panel, -1, label = '')
+        ## Beamline picks the reader when a file extension is shared (e.g. .h5).
+        beamline_label = wx.StaticText(self.panel, -1, label = 'Beamline: ')
+        self.beamline = 'APS 13-BM'
+        self.beamline_menu = wx.ComboBox(self.panel, value = self.beamline, choices = BEAMLINES)
+        self.beamline_menu.Bind(wx.EVT_COMBOBOX, self.OnBeamlineCombo)
+        ## Lazy dataset from the reader registry. Pixel data are read into
+        ## self.data by load_data() the first time a processing step needs them.
+        self.dataset = None
+        self.flat = None
+        self.dark = None
+        ## Other open datasets. Picking one swaps it with the active dataset.
+        session_label = wx.StaticText(self.panel, -1, label = 'Session: ')
+        self.session_menu = wx.ComboBox(self.panel, value = '', choices = [], style = wx.CB_READONLY, size = (200,-1))
+        self.session_menu.Bind(wx.EVT_COMBOBOX, self.OnSessionCombo)
 
         '''
         Preprocessing Panel
@@ -104,22 +228,30 @@ class APS_13BM(wx.Frame):
         dark_label = wx.StaticText(self.panel, -1, label = 'Dark Current:', size = (100,-1))
         self.dark_ID = wx.TextCtrl(self.panel, -1, value ='', size = (-1,-1))
         pad_size_opt = [
+                'Auto Pad',
                 'No Padding',
                 '1024',
                 '2048',
                 '4096']
         ## Setting default pad size to 2048 because 13BM NX is 1920 and typically uses gridrec.
         self.pad_size = 2048
+        ## Auto Pad (opt-in) benchmarks FFT friendly widths the first time a
+        ## detector width is seen on this machine and reuses the cached choice after.
+        self.auto_pad = False
         ## Setting default npad to 0 allows the user to save without processing. This immediately gets changed
         ## during normalization or when pad size is changed on the GUI.
         self.npad = 0
-        self.pad_size_combo = wx.ComboBox(self.panel, value = 'Auto Pad', choices = pad_size_opt)
+        self.pad_size_combo = wx.ComboBox(self.panel, value = '2048', choices = pad_size_opt)
         self.pad_size_combo.Bind(wx.EVT_COMBOBOX, self.pad_size_combo_recall)
         ## If value pixel value near edge is NOT air, need to turn off normalizing with those values.
         self.cb = True
         self.bg_cb = wx.CheckBox(self.panel, label = 'Additional Air Normalization', size = (-1,-1))
         self.bg_cb.Bind(wx.EVT_CHECKBOX, self.onChecked)
         self.bg_cb.SetValue(True)
+        ## Convert to sinogram order once after normalization so centering and
+        ## reconstruction work on contiguous sinograms.
+        self.sino_cb = wx.CheckBox(self.panel, label = 'Sinogram Order', size = (-1,-1))
+        self.sino_cb.SetValue(False)
         ## Allow user to specify kernel size for ring removal, default will be 9 until changed by user.
         ring_width_label = wx.StaticText(self.panel, label = 'Ring Kernel Width: ', size = (-1,-1))
         self.ring_width_blank = wx.TextCtrl(self.panel, value = '9')
@@ -133,6 +265,17 @@ class APS_13BM(wx.Frame):
         zinger_button.Bind(wx.EVT_BUTTON, self.zinger_removal)
         preprocess_button = wx.Button(self.panel, -1, label ='Preprocess', size = (-1,-1))  # this is normalizing step.
         preprocess_button.Bind(wx.EVT_BUTTON, self.normalization)
+        ## Paganin phase retrieval, run on normalized data before reconstruction.
+        energy_label = wx.StaticText(self.panel, label = 'keV: ')
+        self.energy_blank = wx.TextCtrl(self.panel, value = '20', size = (50,-1))
+        distance_label = wx.StaticText(self.panel, label = 'Dist. (cm): ')
+        self.distance_blank = wx.TextCtrl(self.panel, value = '10', size = (50,-1))
+        pixel_label = wx.StaticText(self.panel, label = 'Pixel (um): ')
+        self.pixel_blank = wx.TextCtrl(self.panel, value = '1.0', size = (50,-1))
+        alpha_label = wx.StaticText(self.panel, label = 'Alpha: ')
+        self.alpha_blank = wx.TextCtrl(self.panel, value = '0.001', size = (60,-1))
+        phase_button = wx.Button(self.panel, -1, label = 'Phase Retrieval', size = (-1,-1))
+        phase_button.Bind(wx.EVT_BUTTON, self.phase_retrieval)
 
 
         '''
@@ -159,11 +302,17 @@ class APS_13BM(wx.Frame):
         find_center_list = [
                 'Entropy',
 				'Nghia Vo',
-                '0-180']
+                '0-180',
+                '0-180 (tilt fit)',
+                'Nghia Vo (multi-slice)',
+                'Entropy (multi-slice)']
         self.find_center_menu = wx.ComboBox(self.panel, value = 'Nghia Vo', choices = find_center_list)
         self.find_center_menu.Bind(wx.EVT_COMBOBOX, self.find_center_algo_type)
         tol_title = wx.StaticText(self.panel, -1, label = '       Tolerance: ')
         self.tol_blank = wx.TextCtrl(self.panel, value = '0.25', size = (100,-1))
+        ## Number of slices used by the multi-slice centering methods.
+        n_center_slices_title = wx.StaticText(self.panel, -1, label = 'Multi-slice count: ')
+        self.n_center_slices_blank = wx.TextCtrl(self.panel, value = '9', size = (100,-1))
 
 
         '''
@@ -178,6 +327,7 @@ class APS_13BM(wx.Frame):
                 'Algebraic',
                 'Block Algebraic',
                 'Filtered Back-projection',
+                'FBP (NumPy)',
                 'Gridrec',
                 'Max-likelihood Expectation',
                 'Ordered-subset Expectation',
@@ -208,11 +358,38 @@ class APS_13BM(wx.Frame):
         self.filter_menu = wx.ComboBox(self.panel, value = 'hann', choices = filter_list)
         self.filter_menu.Bind(wx.EVT_COMBOBOX, self.OnFilterCombo)
 
+        ## Iterative algorithms run in batches and stop once converged; warm
+        ## start begins them from gridrec.
+        self.warm_start_cb = wx.CheckBox(self.panel, label = 'Warm Start', size = (-1,-1))
+        self.warm_start_cb.SetValue(True)
+        batch_iter_label = wx.StaticText(self.panel, -1, label = 'Iter/batch: ', size = (-1,-1))
+        self.batch_iter_blank = wx.TextCtrl(self.panel, value = '5', size = (50,-1))
+        max_iter_label = wx.StaticText(self.panel, -1, label = 'Max iter: ', size = (-1,-1))
+        self.max_iter_blank = wx.TextCtrl(self.panel, value = '100', size = (50,-1))
+        iter_tol_label = wx.StaticText(self.panel, -1, label = 'Stop at: ', size = (-1,-1))
+        self.iter_tol_blank = wx.TextCtrl(self.panel, value = '0.001', size = (60,-1))
+
+        ## Region of interest: only rows start to end are reconstructed, cropped
+        ## to the Y and X window. Blank boxes mean the whole range.
+        self.roi_cb = wx.CheckBox(self.panel, label = 'ROI', size = (-1,-1))
+        self.roi_cb.SetValue(False)
+        roi_rows_label = wx.StaticText(self.panel, -1, label = 'Rows: ', size = (-1,-1))
+        self.roi_row_start_blank = wx.TextCtrl(self.panel, value = '', size = (50,-1))
+        self.roi_row_end_blank = wx.TextCtrl(self.panel, value = '', size = (50,-1))
+        roi_y_label = wx.StaticText(self.panel, -1, label = 'Y: ', size = (-1,-1))
+        self.roi_y_start_blank = wx.TextCtrl(self.panel, value = '', size = (50,-1))
+        self.roi_y_end_blank = wx.TextCtrl(self.panel, value = '', size = (50,-1))
+        roi_x_label = wx.StaticText(self.panel, -1, label = 'X: ', size = (-1,-1))
+        self.roi_x_start_blank = wx.TextCtrl(self.panel, value = '', size = (50,-1))
+        self.roi_x_end_blank = wx.TextCtrl(self.panel, value = '', size = (50,-1))
+
         ## Buttons for tilting and reconstructing
         tilt_button = wx.Button(self.panel, -1, label = "Tilt Correction", size = (-1,-1))
         tilt_button.Bind(wx.EVT_BUTTON, self.tilt_correction)
         recon_button = wx.Button(self.panel, -1, label = "Reconstruct", size = (-1,-1))
         recon_button.Bind(wx.EVT_BUTTON, self.reconstruct)
+        sweep_button = wx.Button(self.panel, -1, label = "Parameter Sweep", size = (-1,-1))
+        sweep_button.Bind(wx.EVT_BUTTON, self.OnSweep)
 
 
         '''
@@ -281,6 +458,9 @@ class APS_13BM(wx.Frame):
         self.save_data_type_menu = wx.ComboBox(self.panel, value = '.vol', choices = self.save_data_list)
         self.save_data_type_menu.Bind(wx.EVT_COMBOBOX, self.OnSaveDataTypeCombo)
 
+        ## Crops exports to the sample's bounding box plus a margin.
+        self.crop_cb = wx.CheckBox(self.panel, label = 'Crop to Sample', size = (-1,-1))
+        self.crop_cb.SetValue(False)
         save_recon_button = wx.Button(self.panel, -1, label = "Save Reconstruction", size = (-1,-1))
         save_recon_button.Bind(wx.EVT_BUTTON, self.save_recon)
 
@@ -292,6 +472,34 @@ class APS_13BM(wx.Frame):
         nchunks_label = wx.StaticText(self.panel, -1, label = '  Number of Chunks: ', size = (-1,-1))
         self.nchunk_blank = wx.TextCtrl(self.panel, -1, value = '128')
         self.nchunk = 128
+        ## Worker processes for slab reconstruction. 1 keeps everything in this process.
+        nproc_label = wx.StaticText(self.panel, -1, label = '  Processes: ', size = (-1,-1))
+        self.nproc_blank = wx.TextCtrl(self.panel, -1, value = '1')
+        self.nproc = 1
+        ## Time a few settings on the loaded data and keep the fastest for this host.
+        autotune_button = wx.Button(self.panel, -1, label = 'Auto Tune', size = (-1,-1))
+        autotune_button.Bind(wx.EVT_BUTTON, self.auto_tune)
+        ## Pre-fill from a previous auto tune on this machine.
+        profile = load_profile()
+        if 'ncore' in profile:
+            self.ncore = int(profile['ncore'])
+            self.ncore_blank.SetValue(str(self.ncore))
+        if 'nchunk' in profile:
+            self.nchunk = int(profile['nchunk'])
+            self.nchunk_blank.SetValue(str(self.nchunk))
+        ## Opt-in status and metrics endpoint on localhost (/metrics, /status).
+        self.status_server_cb = wx.CheckBox(self.panel, label = 'Status Server', size = (-1,-1))
+        self.status_server_cb.SetValue(False)
+        self.status_server_cb.Bind(wx.EVT_CHECKBOX, self.OnStatusServer)
+        self.status_port_blank = wx.TextCtrl(self.panel, -1, value = '8765')
+        ## Opt-in JSON-RPC server so acquisition scripts can drive the session.
+        ## It has no authentication: anyone who can reach the port can load,
+        ## run and save, so it only binds to localhost.
+        self.remote_server = None
+        self.remote_cb = wx.CheckBox(self.panel, label = 'Remote Control', size = (-1,-1))
+        self.remote_cb.SetValue(False)
+        self.remote_cb.Bind(wx.EVT_CHECKBOX, self.OnRemoteServer)
+        self.remote_port_blank = wx.TextCtrl(self.panel, -1, value = '8766')
 
         '''
         Setting up the GUI Sizers for layout of initialized widgets.
@@ -322,6 +530,7 @@ class APS_13BM(wx.Frame):
         recon_algo_title_Sizer = wx.BoxSizer(wx.HORIZONTAL)
         recon_algo_Sizer = wx.BoxSizer(wx.HORIZONTAL)
         recon_filter_Sizer = wx.BoxSizer(wx.HORIZONTAL)
+        recon_roi_Sizer = wx.BoxSizer(wx.HORIZONTAL)
         recon_button_Sizer = wx.BoxSizer(wx.HORIZONTAL)
 
 
@@ -353,12 +562,17 @@ class APS_13BM(wx.Frame):
         info_path_Sizer.Add(self.path_ID, 0, wx.ALL|wx.EXPAND, 5)
         info_status_Sizer.Add(status_label, 0, wx.ALL|wx.EXPAND, 5)
         info_status_Sizer.Add(self.status_ID, 0, wx.ALL|wx.EXPAND, 5)
+        info_path_Sizer.Add(beamline_label, 0, wx.ALL|wx.EXPAND, 5)
+        info_path_Sizer.Add(self.beamline_menu, 0, wx.ALL|wx.EXPAND, 5)
+        info_path_Sizer.Add(session_label, 0, wx.ALL|wx.EXPAND, 5)
+        info_path_Sizer.Add(self.session_menu, 0, wx.ALL|wx.EXPAND, 5)
         ## Adding to Preprocessing panel.
         preprocessing_title_Sizer.Add(preprocess_label, wx.ALL, 5)
         preprocessing_panel_Sizer.Add(dark_label, -1, wx.ALL, 5)
         preprocessing_panel_Sizer.Add(self.dark_ID, wx.ALL, 5)
         preprocessing_panel_Sizer.Add(self.pad_size_combo, wx.ALL, 5)
         preprocessing_title_Sizer.Add(self.bg_cb, wx.ALL, 5)
+        preprocessing_title_Sizer.Add(self.sino_cb, wx.ALL, 5)
         preprocessing_ring_width_Sizer.Add(ring_width_label, -1, wx.ALL|wx.ALIGN_CENTER, 5)
         preprocessing_ring_width_Sizer.Add(self.ring_width_blank, -1, wx.ALL|wx.ALIGN_CENTER, 5)
         preprocessing_ring_width_Sizer.Add(ring_remove_button, -1, wx.ALL|wx.EXPAND|wx.ALIGN_CENTER, 5)
@@ -368,6 +582,15 @@ class APS_13BM(wx.Frame):
         preprocessing_zinger_Sizer.Add(self.zinger_kernel_size_blank, -1, wx.ALL|wx.ALIGN_CENTER, 5)
         preprocessing_preprocess_button_Sizer.Add(zinger_button, -1, wx.ALL, 5)
         preprocessing_preprocess_button_Sizer.Add(preprocess_button, -1, wx.ALL, 5)
+        preprocessing_pad_Sizer.Add(energy_label, 0, wx.ALL|wx.ALIGN_CENTER, 5)
+        preprocessing_pad_Sizer.Add(self.energy_blank, 0, wx.ALL, 5)
+        preprocessing_pad_Sizer.Add(distance_label, 0, wx.ALL|wx.ALIGN_CENTER, 5)
+        preprocessing_pad_Sizer.Add(self.distance_blank, 0, wx.ALL, 5)
+        preprocessing_pad_Sizer.Add(pixel_label, 0, wx.ALL|wx.ALIGN_CENTER, 5)
+        preprocessing_pad_Sizer.Add(self.pixel_blank, 0, wx.ALL, 5)
+        preprocessing_pad_Sizer.Add(alpha_label, 0, wx.ALL|wx.ALIGN_CENTER, 5)
+        preprocessing_pad_Sizer.Add(self.alpha_blank, 0, wx.ALL, 5)
+        preprocessing_pad_Sizer.Add(phase_button, 0, wx.ALL, 5)
         ## Adding to centering panel.
         centering_title_Sizer.Add(centering_label, 0, wx.ALL, 5)
         centering_title_Sizer.Add(rot_center_button, 0, wx.RIGHT|wx.EXPAND|wx.ALIGN_CENTER, 5)
@@ -383,6 +606,8 @@ class APS_13BM(wx.Frame):
         centering_method_Sizer.Add(self.find_center_menu, -1, wx.ALL, 5)
         centering_method_Sizer.Add(tol_title, -1, wx.ALL|wx.ALIGN_CENTER,5)
         centering_method_Sizer.Add(self.tol_blank, -1, wx.ALL, 5)
+        centering_button_Sizer.Add(n_center_slices_title, 0, wx.ALL|wx.ALIGN_CENTER, 5)
+        centering_button_Sizer.Add(self.n_center_slices_blank, 0, wx.ALL, 5)
 
         ## Adding to reconstruction panel.
         recon_algo_title_Sizer.Add(recon_algo_title, 0, wx.ALL, 5)
@@ -390,8 +615,26 @@ class APS_13BM(wx.Frame):
         recon_algo_Sizer.Add(self.recon_menu, 0, wx.ALL, 5)
         recon_algo_Sizer.Add(filter_label, 0, wx.ALL, 5)
         recon_algo_Sizer.Add(self.filter_menu, 0, wx.ALL, 5)
+        recon_filter_Sizer.Add(self.warm_start_cb, 0, wx.ALL|wx.ALIGN_CENTER, 5)
+        recon_filter_Sizer.Add(batch_iter_label, 0, wx.ALL|wx.ALIGN_CENTER, 5)
+        recon_filter_Sizer.Add(self.batch_iter_blank, 0, wx.ALL, 5)
+        recon_filter_Sizer.Add(max_iter_label, 0, wx.ALL|wx.ALIGN_CENTER, 5)
+        recon_filter_Sizer.Add(self.max_iter_blank, 0, wx.ALL, 5)
+        recon_filter_Sizer.Add(iter_tol_label, 0, wx.ALL|wx.ALIGN_CENTER, 5)
+        recon_filter_Sizer.Add(self.iter_tol_blank, 0, wx.ALL, 5)
+        recon_roi_Sizer.Add(self.roi_cb, 0, wx.ALL|wx.ALIGN_CENTER, 5)
+        recon_roi_Sizer.Add(roi_rows_label, 0, wx.ALL|wx.ALIGN_CENTER, 5)
+        recon_roi_Sizer.Add(self.roi_row_start_blank, 0, wx.ALL, 5)
+        recon_roi_Sizer.Add(self.roi_row_end_blank, 0, wx.ALL, 5)
+        recon_roi_Sizer.Add(roi_y_label, 0, wx.ALL|wx.ALIGN_CENTER, 5)
+        recon_roi_Sizer.Add(self.roi_y_start_blank, 0, wx.ALL, 5)
+        recon_roi_Sizer.Add(self.roi_y_end_blank, 0, wx.ALL, 5)
+        recon_roi_Sizer.Add(roi_x_label, 0, wx.ALL|wx.ALIGN_CENTER, 5)
+        recon_roi_Sizer.Add(self.roi_x_start_blank, 0, wx.ALL, 5)
+        recon_roi_Sizer.Add(self.roi_x_end_blank, 0, wx.ALL, 5)
         recon_button_Sizer.Add(tilt_button, -1, wx.ALL, 5)
         recon_button_Sizer.Add(recon_button, -1, wx.ALL, 5)
+        recon_button_Sizer.Add(sweep_button, -1, wx.ALL, 5)
 
         '''
         Adding all widgets to the RIGHT Sizer.
@@ -425,6 +668,7 @@ class APS_13BM(wx.Frame):
         save_title_Sizer.Add(save_title, wx.ALL|wx.EXPAND, 5)
         save_recon_Sizer.Add(self.save_dtype_menu, wx.ALL|wx.EXPAND,5)
         save_recon_Sizer.Add(self.save_data_type_menu, wx.ALL|wx.EXPAND, 5)
+        save_recon_Sizer.Add(self.crop_cb, wx.ALL|wx.EXPAND, 5)
         save_recon_Sizer.Add(save_recon_button, wx.ALL|wx.EXPAND, 5)
         ## Computation Options panel
         comp_opt_title_Sizer.Add(comp_opt_title, wx.ALL|wx.EXPAND, 5)
@@ -432,6 +676,13 @@ class APS_13BM(wx.Frame):
         comp_opt_cores_n_chunks_Sizer.Add(self.ncore_blank, wx.ALL|wx.EXPAND, 5)
         comp_opt_cores_n_chunks_Sizer.Add(nchunks_label, wx.ALL|wx.EXPAND, 5)
         comp_opt_cores_n_chunks_Sizer.Add(self.nchunk_blank, wx.ALL|wx.EXPAND, 5)
+        comp_opt_cores_n_chunks_Sizer.Add(nproc_label, wx.ALL|wx.EXPAND, 5)
+        comp_opt_cores_n_chunks_Sizer.Add(self.nproc_blank, wx.ALL|wx.EXPAND, 5)
+        comp_opt_title_Sizer.Add(autotune_button, wx.ALL|wx.EXPAND, 5)
+        comp_opt_title_Sizer.Add(self.status_server_cb, wx.ALL|wx.EXPAND, 5)
+        comp_opt_title_Sizer.Add(self.status_port_blank, wx.ALL|wx.EXPAND, 5)
+        comp_opt_title_Sizer.Add(self.remote_cb, wx.ALL|wx.EXPAND, 5)
+        comp_opt_title_Sizer.Add(self.remote_port_blank, wx.ALL|wx.EXPAND, 5)
 
         '''
         Adding to leftSizer.
@@ -444,9 +695,9 @@ class APS_13BM(wx.Frame):
         leftSizer.Add(wx.StaticLine(self.panel),0,wx.ALL|wx.EXPAND, 5)
         leftSizer.Add(preprocessing_title_Sizer, 0, wx.ALL|wx.EXPAND,5)
         leftSizer.Add(preprocessing_panel_Sizer, 0, wx.EXPAND, 10)
-        leftSizer.Add(preprocessing_pad_Sizer, 0, wx.EXPAND,5)
         leftSizer.Add(preprocessing_zinger_Sizer, 0, wx.EXPAND, 5)
         leftSizer.Add(preprocessing_preprocess_button_Sizer, 0, wx.EXPAND, 5)
+        leftSizer.Add(preprocessing_pad_Sizer, 0, wx.EXPAND,5)
         leftSizer.Add(preprocessing_ring_width_Sizer, 0, wx.EXPAND, 5)
         leftSizer.Add(wx.StaticLine(self.panel),0,wx.ALL|wx.EXPAND, 5)
         leftSizer.Add(centering_title_Sizer, 0, wx.ALL|wx.EXPAND, 5)
@@ -458,6 +709,7 @@ class APS_13BM(wx.Frame):
         leftSizer.Add(recon_algo_title_Sizer, 0, wx.ALL|wx.EXPAND,5)
         leftSizer.Add(recon_algo_Sizer, 0, wx.ALL|wx.EXPAND, 5)
         leftSizer.Add(recon_filter_Sizer, 0, wx.ALL|wx.EXPAND, 5)
+        leftSizer.Add(recon_roi_Sizer, 0, wx.ALL|wx.EXPAND, 5)
         leftSizer.Add(recon_button_Sizer, 0, wx.ALL|wx.EXPAND, 5)
 
         '''
@@ -494,51 +746,176 @@ class APS_13BM(wx.Frame):
     '''
     def client_read_nc(self, event):
           '''
-          Reads in tomography data.
+          Opens tomography data. Only the file header is read here; pixel data
+          are read by load_data() when a processing step first needs them.
           '''
-          with wx.FileDialog(self, "Select Data File", wildcard="Data files (*.nc; *.volume)|*.nc;*.volume",
+          with wx.FileDialog(self, "Select Data File", wildcard="Data files (*.nc; *.h5; *.volume)|*.nc;*.h5;*.volume",
                          style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST|wx.FD_CHANGE_DIR) as fileDialog:
               if fileDialog.ShowModal() == wx.ID_CANCEL:
                   return     # for if the user changed their mind
-              ## Setting up timestamp.
-              t0 = time.time()
-              ## Loading path and updating status label on GUI.
               path = fileDialog.GetPath()
-              ## Opening text file to save parameters for batch reconstruction.
-              self.logfile = open('logfile.txt','w')
-              self.logfile.write('import tomopy\nimport dxchange\nimport numpy as np\n')
-              ## Loading in file that was just chosen by user.
               try:
-                  with open(path, 'r') as file:
-                      fname = file
-                      _path, _fname = os.path.split(path)
-                      os.chdir(_path)
-                      self.fname1 = file
-                      self.status_ID.SetLabel('Please wait. Reading in the data.')
-                      _path, self._fname, self.sx, self.sy, self.sz, self.data_max, self.data_min, self.data, self.flat, self.dark, self.theta = import_data(_fname,_path)
-                      # If dark field current is not uniform, this will still only show the first value.
-                      dark = self.dark[0,0,0]
-                      self.update_info(path=_path,
-                                       fname=self._fname,
-                                       sx=self.sx,
-                                       sy=self.sy,
-                                       sz=self.sz,
-                                       dark=dark,
-                                       data_max=self.data_max,
-                                       data_min=self.data_min)
-                      ## Updating the Centering Parameters Defaults for the dataset.
-                      self.lower_rot_slice_blank.SetValue(str(int(self.sz-(self.sz/4))))
-                      self.upper_rot_center_blank.SetValue(str(self.sx/2))
-                      self.upper_rot_slice_blank.SetValue(str(int(self.sz-3*(self.sz/4))))
-                      self.lower_rot_center_blank.SetValue(str(self.sx/2))
-                      self.status_ID.SetLabel('Data Imported')
-                      ## Time stamping.
-                      t1 = time.time()
-                      total = t1-t0
-                      print('Time reading in files ', total)
-
+                  self.open_file(path)
               except IOError:
-                  wx.LogError("Cannot open file '%s'." % newfile)
+                  wx.LogError("Cannot open file '%s'." % path)
+
+    def open_file(self, path):
+        '''
+        Opens the data file at path, as chosen in the file dialog or sent by
+        a remote script. Raises IOError if the file cannot be opened.
+        '''
+        ## Setting up timestamp.
+        t0 = time.time()
+        ## The current dataset stays open in the session. Reopening a file
+        ## that is already in the session switches to it without re-reading.
+        if path in self.session:
+            self.stash_dataset()
+            self.restore_dataset(path)
+            return
+        ## Loading in file that was just chosen by user. It is opened before
+        ## the current dataset is stashed, so a file that cannot be opened
+        ## leaves the current dataset active.
+        _path, _fname = os.path.split(path)
+        self.status_ID.SetLabel('Please wait. Opening the data.')
+        cwd = os.getcwd()
+        os.chdir(_path)
+        try:
+            dataset = open_data(_fname, self.beamline)
+        finally:
+            os.chdir(cwd)
+        self.stash_dataset()
+        os.chdir(_path)
+        ## Opening text file to save parameters for batch reconstruction,
+        ## next to the data.
+        self.logfile = open('logfile.txt','w')
+        self.logfile.write('import tomopy\nimport dxchange\nimport numpy as np\n')
+        self.dataset = dataset
+        self.data_path = path
+        self._fname = self.dataset.name
+        self.theta = self.dataset.theta
+        self.sz, self.sy, self.sx = self.dataset.shape
+        self.data = None
+        self.flat = None
+        self.dark = None
+        self.data_slice = None
+        self.sino_order = False
+        self.npad = 0
+        self.data_min = None
+        self.data_max = None
+        self.data_changed()
+        self.update_info(path=_path,
+                         fname=self._fname,
+                         sx=self.sx,
+                         sy=self.sy,
+                         sz=self.sz)
+        ## Updating the Centering Parameters Defaults for the dataset.
+        self.lower_rot_slice_blank.SetValue(str(int(self.sz-(self.sz/4))))
+        self.upper_rot_center_blank.SetValue(str(self.sx/2))
+        self.upper_rot_slice_blank.SetValue(str(int(self.sz-3*(self.sz/4))))
+        self.lower_rot_center_blank.SetValue(str(self.sx/2))
+        self.status_ID.SetLabel('Data Opened')
+        ## Time stamping.
+        t1 = time.time()
+        total = t1-t0
+        print('Time opening files ', total)
+
+    def load_data(self):
+        '''
+        Reads the opened dataset into self.data if it has not been read yet.
+        Called at the start of every step that works on the whole volume.
+        '''
+        if self.data is not None or self.dataset is None:
+            return
+        t0 = time.time()
+        self.status_ID.SetLabel('Please wait. Reading in the data.')
+        wx.Yield()
+        self.data, self.data_min, self.data_max = self.dataset.load()
+        self.flat = self.dataset.flat
+        self.dark = self.dataset.dark
+        ## Min and max were found while reading, no need for another pass.
+        self.data_changed()
+        self.stats.record(self.data, self.data_min, self.data_max)
+        # If dark field current is not uniform, this will still only show the first value.
+        dark = None
+        if self.dark is not None:
+            dark = self.dark.flat[0]
+        self.update_info(dark=dark,
+                         data_max=self.data_max,
+                         data_min=self.data_min)
+        self.status_ID.SetLabel('Data Imported')
+        t1 = time.time()
+        print('Time reading in files ', t1-t0)
+
+    def stash_dataset(self):
+        '''
+        Hands the active dataset, its arrays and its settings over to the
+        session, leaving the frame without an active dataset.
+        '''
+        if self.dataset is None or self.data_path is None:
+            return
+        name = self.data_path
+        for key in self.SESSION_ARRAYS:
+            array = getattr(self, key, None)
+            if array is not None:
+                self.session.put(name, key, array)
+            setattr(self, key, None)
+        meta = dict((key, getattr(self, key, None)) for key in self.SESSION_ATTRS)
+        meta['cwd'] = os.getcwd()
+        meta['widgets'] = dict((key, getattr(self, key).GetValue()) for key in self.SESSION_WIDGETS)
+        self.session.set_meta(name, meta)
+        self.dataset = None
+        self.data_path = None
+        self.data_changed()
+        self.session_changed()
+
+    def restore_dataset(self, name):
+        '''
+        Makes a dataset from the session the active one. Spilled arrays are
+        read back into memory.
+        '''
+        arrays, meta = self.session.pop(name)
+        for key in self.SESSION_ARRAYS:
+            setattr(self, key, arrays.get(key))
+        for key in self.SESSION_ATTRS:
+            setattr(self, key, meta.get(key))
+        for key, value in meta['widgets'].items():
+            getattr(self, key).SetValue(value)
+        os.chdir(meta['cwd'])
+        self.data_changed()
+        if self.data is not None and self.data_min is not None:
+            self.stats.record(self.data, self.data_min, self.data_max)
+        self.data_min_ID.SetLabel('' if self.data_min is None else str(self.data_min))
+        self.data_max_ID.SetLabel('' if self.data_max is None else str(self.data_max))
+        self.dark_ID.SetLabel('' if self.dark is None else str(self.dark.flat[0]))
+        self.update_info(path=meta['cwd'],
+                         fname=self._fname,
+                         sx=self.sx,
+                         sy=self.sy,
+                         sz=self.sz)
+        self.session_changed()
+        self.status_ID.SetLabel('Switched to '+os.path.basename(name))
+
+    def session_changed(self):
+        '''
+        Refreshes the session menu and the session memory gauges.
+        '''
+        self.session_menu.SetItems(self.session.names())
+        self.session_menu.SetValue('')
+        self.run_status.set_gauge('session_bytes', self.session.resident_bytes())
+        self.run_status.set_gauge('session_spilled_bytes', self.session.spilled_bytes())
+        for name, arrays in self.session.report().items():
+            print('session ', name, ', '.join(key+' '+str(nbytes // 2**20)+' MB'+(' (spilled)' if spilled else '')
+                                              for key, (nbytes, spilled) in sorted(arrays.items())))
+
+    def OnSessionCombo(self, event):
+        '''
+        Swaps the chosen dataset from the session with the active one.
+        '''
+        name = self.session_menu.GetStringSelection()
+        if not name or name not in self.session:
+            return
+        self.stash_dataset()
+        self.restore_dataset(name)
 
     def update_info(self, path=None, fname=None, sx=None, sy=None, sz=None, dark=None, data_max=None, data_min=None):
         '''
@@ -562,6 +939,218 @@ class APS_13BM(wx.Frame):
         if data_min is not None:
             self.data_min_ID.SetLabel(str(self.data_min))
 
+    def report_threads(self, stage):
+        '''
+        Prints and logs the thread counts a stage ran with.
+        '''
+        line = self.governor.describe(stage)
+        print('threads ', line)
+        self.logfile.write('threads '+line+'\n')
+
+    def OnStatusServer(self, event=None):
+        '''
+        Starts or stops the localhost status endpoint.
+        '''
+        if self.status_server is not None:
+            self.status_server.stop()
+            self.status_server = None
+        if self.status_server_cb.GetValue():
+            try:
+                port = int(self.status_port_blank.GetValue())
+                self.status_server = StatusServer(self.run_status, port = port).start()
+            except (ValueError, OSError) as err:
+                self.status_server_cb.SetValue(False)
+                self.status_ID.SetLabel('Status server not started: '+str(err))
+                return
+            print('status server at ', self.status_server.url)
+            self.status_ID.SetLabel('Status at '+self.status_server.url+'/metrics')
+
+    def OnRemoteServer(self, event=None):
+        '''
+        Starts or stops the localhost remote-control server. The server has
+        no authentication; any local user or process can connect to it.
+        '''
+        if self.remote_server is not None:
+            self.remote_server.stop()
+            self.remote_server = None
+        if self.remote_cb.GetValue():
+            try:
+                port = int(self.remote_port_blank.GetValue())
+                self.remote_server = RemoteServer(self.remote_methods(),
+                                                  port = port,
+                                                  dispatch = self.remote_dispatch).start()
+            except (ValueError, OSError) as err:
+                self.remote_cb.SetValue(False)
+                self.status_ID.SetLabel('Remote control not started: '+str(err))
+                return
+            print('remote control on port ', self.remote_server.port)
+            self.status_ID.SetLabel('Remote control on port '+str(self.remote_server.port))
+
+    def remote_dispatch(self, func, args, kwargs):
+        '''
+        Runs a remote request on the wx main thread and waits for it.
+        '''
+        if wx.IsMainThread():
+            return func(*args, **kwargs)
+        done = threading.Event()
+        result = {}
+        def run():
+            try:
+                result['value'] = func(*args, **kwargs)
+            except Exception as err:
+                result['error'] = err
+            finally:
+                done.set()
+        wx.CallAfter(run)
+        done.wait()
+        if 'error' in result:
+            raise result['error']
+        return result['value']
+
+    def remote_methods(self):
+        '''
+        Methods served to remote scripts.
+        '''
+        return {'load': self.remote_load,
+                'set': self.remote_set,
+                'get': self.remote_get,
+                'run': self.remote_run,
+                'stats': self.remote_stats,
+                'export': self.remote_export,
+                'stitch': self.remote_stitch,
+                'sweep': self.sweep,
+                'status': self.run_status.snapshot}
+
+    def remote_load(self, path, beamline=None):
+        '''
+        Opens a data file without the file dialog.
+        '''
+        if beamline is not None:
+            self.remote_set(beamline = beamline)
+        self.open_file(os.path.abspath(path))
+        return self.remote_stats()
+
+    def remote_set(self, **params):
+        '''
+        Sets GUI parameters by name (see REMOTE_PARAMS).
+        '''
+        for name in params:
+            if name not in self.REMOTE_PARAMS:
+                raise KeyError('Unknown parameter '+name)
+        for name, value in params.items():
+            widget_name, handler = self.REMOTE_PARAMS[name]
+            widget = getattr(self, widget_name)
+            if isinstance(widget, wx.CheckBox):
+                widget.SetValue(bool(value))
+            elif isinstance(widget, wx.ComboBox):
+                if not widget.SetStringSelection(str(value)):
+                    raise ValueError(name+' must be one of '+str(widget.GetStrings()))
+            else:
+                widget.SetValue(str(value))
+            if handler is not None:
+                getattr(self, handler)(None)
+        return self.remote_get()
+
+    def remote_get(self):
+        '''
+        Current value of every remote parameter.
+        '''
+        return dict((name, getattr(self, widget).GetValue())
+                    for name, (widget, handler) in self.REMOTE_PARAMS.items())
+
+    def remote_run(self, step, **params):
+        '''
+        Sets any given parameters, then runs one pipeline step as if its
+        button had been pressed.
+        '''
+        if step not in self.REMOTE_STEPS:
+            raise KeyError('Unknown step '+str(step)+'. Steps are '+str(sorted(self.REMOTE_STEPS)))
+        if params:
+            self.remote_set(**params)
+        t0 = time.time()
+        getattr(self, self.REMOTE_STEPS[step])(None)
+        return {'step': step,
+                'status': self.status_ID.GetLabel(),
+                'seconds': time.time() - t0}
+
+    def remote_stats(self):
+        '''
+        Shape, layout and intensity statistics of the working volume.
+        '''
+        info = {'fname': getattr(self, '_fname', None),
+                'loaded': self.data is not None,
+                'shape': None if self.dataset is None else list(self.dataset.shape),
+                'sino_order': self.sino_order,
+                'status': self.status_ID.GetLabel()}
+        if self.data is not None:
+            data_min, data_max, data_mean = self.stats.compute(self.data)
+            info.update({'shape': list(self.data.shape),
+                         'dtype': str(self.data.dtype),
+                         'min': float(data_min),
+                         'max': float(data_max),
+                         'mean': float(data_mean)})
+        return info
+
+    def remote_export(self, fname=None, **params):
+        '''
+        Sets any export parameters (save_dtype, save_data_type, crop), then
+        saves. fname replaces the dataset name used for the output file; it
+        must be a bare file name, so output stays in the data directory.
+        '''
+        if fname is not None:
+            fname = self.remote_fname(fname)
+        if params:
+            self.remote_set(**params)
+        if fname is not None:
+            self._fname = fname
+        return self.remote_run('save')
+
+    def remote_stitch(self, paths, overlap, fname):
+        '''
+        stitch() for remote scripts. fname must be a bare file name, so the
+        stitched volume is written in the data directory.
+        '''
+        return self.stitch(paths, overlap, self.remote_fname(fname))
+
+    @staticmethod
+    def remote_fname(fname):
+        '''
+        Checks that a file name sent by a remote script has no directory
+        part. The remote server has no authentication, so scripts may only
+        write in the current data directory.
+        '''
+        fname = str(fname)
+        if fname in ('', '.', '..') or os.path.basename(fname) != fname or \
+           (os.altsep and os.altsep in fname):
+            raise ValueError('fname must be a file name without a directory: '+fname)
+        return fname
+
+    def data_changed(self):
+        '''
+        Must be called whenever self.data is replaced or modified in place.
+        Drops cached statistics and view copies so they are rebuilt on the
+        next request.
+        '''
+        self.stats.invalidate()
+        self.run_status.set_gauge('data_bytes', 0 if self.data is None else self.data.nbytes)
+        self.views.invalidate()
+        ## Room for the active arrays comes out of the session's budget.
+        active = sum(a.nbytes for a in (self.data, self.flat, self.dark, self.data_slice) if a is not None)
+        if self.session.enforce(reserve = active):
+            self.session_changed()
+
+    def update_stats(self):
+        '''
+        Refreshes data_max and data_min from the statistics cache.
+        '''
+        self.data_min, self.data_max, _ = self.stats.compute(self.data)
+
+    def OnBeamlineCombo(self, event):
+        '''
+        Sets the beamline used to pick a reader for the next import.
+        '''
+        self.beamline = self.beamline_menu.GetStringSelection()
+
     def change_dir(self, event):
         '''
         Allows user to change directory where files will be saved.
@@ -587,17 +1176,285 @@ class APS_13BM(wx.Frame):
     def client_free_mem(self, event):
         '''
         Deletes stored variables from memory, and resets labels on GUI.
+        Datasets kept in the session are not touched.
         '''
-        if self.data is None:
+        if self.data is None and self.dataset is None:
             return
         else:
-            del self.data
+            self.data = None
+            self.flat = None
+            self.dark = None
+            self.data_slice = None
+            if self.dataset is not None:
+                self.dataset.close()
+                self.dataset = None
+            self.data_path = None
+            ## Plot windows hold their own copies of the images.
+            for frame in [self.image_frame] + self.plot_frames:
+                if frame is None:
+                    continue
+                try:
+                    frame.Destroy()
+                except PyDeadObjectError:
+                    pass
+            self.image_frame = None
+            self.plot_frames = []
+            self.data_changed()
             self.path_ID.SetLabel('')
             self.file_ID.SetLabel('')
             self.status_ID.SetLabel('Memory Cleared')
             gc.collect()
             print('fname and path released')
 
+    def OnStitch(self, event):
+        '''
+        Asks for the scans of a vertical stack, their overlap and the output
+        file, then stitches them (see stitch).
+        '''
+        with wx.FileDialog(self, "Select Scans (top to bottom by name)",
+                           wildcard="Data files (*.nc; *.h5)|*.nc;*.h5",
+                           style=wx.FD_OPEN|wx.FD_FILE_MUST_EXIST|wx.FD_MULTIPLE) as fileDialog:
+            if fileDialog.ShowModal() == wx.ID_CANCEL:
+                return
+            paths = sorted(fileDialog.GetPaths())
+        if len(paths) < 2:
+            self.status_ID.SetLabel('Select at least two scans to stitch.')
+            return
+        with wx.TextEntryDialog(self, 'Rows shared by neighbouring scans\n'
+                                'Scans are flat/dark and air normalized only; zinger, ring\n'
+                                'and phase steps are not applied.', 'Overlap', '0') as dlg:
+            if dlg.ShowModal() == wx.ID_CANCEL:
+                return
+            try:
+                overlap = [int(v) for v in dlg.GetValue().replace(',', ' ').split()]
+            except ValueError:
+                self.status_ID.SetLabel('Overlap must be a number of rows.')
+                return
+        with wx.FileDialog(self, "Save Stitched Volume",
+                           wildcard="netCDF volume (*.volume)|*.volume|HDF5 (*.h5)|*.h5",
+                           style=wx.FD_SAVE|wx.FD_OVERWRITE_PROMPT) as fileDialog:
+            if fileDialog.ShowModal() == wx.ID_CANCEL:
+                return
+            fname = fileDialog.GetPath()
+        try:
+            self.stitch(paths, overlap[0] if len(overlap) == 1 else overlap, fname)
+        except (IOError, ValueError) as err:
+            wx.LogError('Stitching failed: '+str(err))
+            self.status_ID.SetLabel('Stitching failed.')
+
+    def scan_centers(self, path, n_rows):
+        '''
+        Per-row rotation centers for a scan. Scans that are open or kept in
+        the session use their own centering boxes, others the current ones.
+        '''
+        values = dict((key, getattr(self, key).GetValue()) for key in self.SESSION_WIDGETS)
+        if path != self.data_path and path in self.session:
+            values = self.session.meta(path)['widgets']
+        return interpolate_centers(float(values['upper_rot_slice_blank']),
+                                   float(values['upper_rot_center_blank']),
+                                   float(values['lower_rot_slice_blank']),
+                                   float(values['lower_rot_center_blank']),
+                                   n_rows)
+
+    def stitch(self, paths, overlap, fname):
+        '''
+        Reconstructs the scans at paths, top to bottom, with the current
+        reconstruction settings and writes one stitched .volume or .h5 file.
+        Scans are read, reconstructed and written one slab at a time, so the
+        stitched volume is never held in memory. Each slab is flat/dark
+        corrected, air normalized if checked and minus logged (see
+        preprocess_slab); zinger removal, ring removal and phase retrieval
+        work on the loaded data only and are not applied here.
+
+        Parameters
+        -------
+        paths : list of str
+                Scan files, top to bottom.
+        overlap : int or list of int
+                Rows shared by each pair of neighbouring scans.
+        fname : str
+                Output file.
+        '''
+        t0 = time.time()
+        self.status_ID.SetLabel('Stitching.')
+        self.ncore = int(self.ncore_blank.GetValue())
+        datasets = [open_data(os.path.abspath(path), self.beamline) for path in paths]
+        try:
+            centers = [self.scan_centers(os.path.abspath(path), d.shape[1])
+                       for path, d in zip(paths, datasets)]
+            air = self.bg_cb.GetValue()
+            ## Auto Pad is benchmarked on a few normalized rows of the first scan.
+            pad_size = self.pad_size
+            if self.auto_pad:
+                r0 = datasets[0].shape[1] // 2
+                pad_size = auto_pad(read_slab(datasets[0], r0, r0+8, air, self.ncore),
+                                    datasets[0].theta,
+                                    ncore = self.ncore)
+            npad = pad_width(pad_size, datasets[0].shape[2])
+            def progress(done, total):
+                self.status_ID.SetLabel('Stitching. '+str(int(100*done/total))+'% done.')
+                self.run_status.progress(done, total, unit = 'rows')
+                wx.Yield()
+            if np.ndim(overlap) == 0:
+                n_rows = sum(d.shape[1] for d in datasets) - overlap * (len(datasets) - 1)
+            else:
+                n_rows = sum(d.shape[1] for d in datasets) - sum(overlap)
+            with self.governor.stage('stitch', self.ncore) as threads:
+                ## The governor ends the stage when the block exits.
+                self.run_status.begin('stitch', n_rows, unit = 'rows')
+                shape = stitch_scans(datasets,
+                                     centers,
+                                     overlap,
+                                     fname,
+                                     npad = npad,
+                                     air = air,
+                                     ncore = threads['tomopy'],
+                                     callback = progress,
+                                     algorithm = self.recon_type,
+                                     filter_name = self.filter_type)
+        finally:
+            for d in datasets:
+                d.close()
+        self.report_threads('stitch')
+        t1 = time.time()
+        print('Stitched ', len(paths), ' scans into ', fname, shape, ' in ', t1-t0)
+        self.status_ID.SetLabel('Stitching complete.')
+        return {'fname': fname, 'shape': list(shape), 'seconds': t1-t0}
+
+    def OnSweep(self, event):
+        '''
+        Asks for the algorithms, filters and iteration counts to compare on
+        the upper slice, then runs the sweep (see sweep).
+        '''
+        if self.data is None and self.dataset is None:
+            self.status_ID.SetLabel('Import data before running a sweep.')
+            return
+        names = self.recon_menu.GetItems()
+        current = [i for i, name in enumerate(names)
+                   if self.RECON_ALGORITHMS.get(name, name) == self.recon_type]
+        with wx.MultiChoiceDialog(self, 'Algorithms to compare', 'Parameter Sweep', names) as dlg:
+            dlg.SetSelections(current)
+            if dlg.ShowModal() == wx.ID_CANCEL:
+                return
+            algorithms = [self.RECON_ALGORITHMS.get(names[i], names[i]) for i in dlg.GetSelections()]
+        if not algorithms:
+            return
+        filters = [self.filter_type]
+        if any(a in FILTERED_ALGORITHMS for a in algorithms):
+            choices = self.filter_menu.GetItems()
+            with wx.MultiChoiceDialog(self, 'Filters to compare', 'Parameter Sweep', choices) as dlg:
+                dlg.SetSelections([choices.index(self.filter_type)] if self.filter_type in choices else [])
+                if dlg.ShowModal() == wx.ID_CANCEL:
+                    return
+                filters = [choices[i] for i in dlg.GetSelections()] or filters
+        iterations = [10]
+        if any(a in ITERATIVE_ALGORITHMS for a in algorithms):
+            with wx.TextEntryDialog(self, 'Iteration counts', 'Parameter Sweep', '10, 50, 100') as dlg:
+                if dlg.ShowModal() == wx.ID_CANCEL:
+                    return
+                try:
+                    iterations = [int(v) for v in dlg.GetValue().replace(',', ' ').split()]
+                except ValueError:
+                    self.status_ID.SetLabel('Iteration counts must be whole numbers.')
+                    return
+        self.sweep(algorithms, filters, iterations)
+
+    def sweep(self, algorithms, filters=None, iterations=(10,), row=None, center=None):
+        '''
+        Reconstructs one slice with every combination of algorithm, filter and
+        iteration count in worker processes, and shows the results side by
+        side with the time each took. Runs are timed while the other
+        workers are busy; set the process count to 1 for serial timings.
+
+        Parameters
+        -------
+        algorithms : list of str
+                TomoPy algorithm names (or 'numpy_fbp').
+        filters : list of str, optional
+                Filters for gridrec and the FBP algorithms. Defaults to the
+                current filter.
+        iterations : list of int, optional
+                num_iter values for the iterative algorithms.
+        row, center : optional
+                Sinogram row and its center. Default to the upper slice boxes.
+
+        Returns
+        -------
+        runs : list of dict
+                'label', 'algorithm', 'filter_name', 'num_iter' and 'seconds'
+                of each run, fastest first.
+        '''
+        self.load_data()
+        t0 = time.time()
+        if filters is None:
+            filters = [self.filter_type]
+        if row is None:
+            row = int(self.upper_rot_slice_blank.GetValue())
+        if center is None:
+            center = float(self.upper_rot_center_blank.GetValue())
+        self.ncore = int(self.ncore_blank.GetValue())
+        self.nproc = int(self.nproc_blank.GetValue())
+        combos = sweep_grid(algorithms, filters, iterations)
+        npad = self.get_npad()
+        def progress(done, total, result):
+            print('sweep ', result['label'], ' ', round(result['seconds'], 3), ' s')
+            self.status_ID.SetLabel('Sweep. '+str(done)+' of '+str(total)+' runs done.')
+            self.run_status.progress(done, total, unit = 'runs')
+            wx.Yield()
+        ## Each worker gets its share of ncore, so the runs time fairly.
+        nproc = max(1, min(self.nproc, len(combos)))
+        with self.governor.stage('sweep', self.ncore, nproc) as threads:
+            results = sweep_slice(sinogram(self.data, row, self.sino_order),
+                            self.theta,
+                            center,
+                            combos,
+                            npad = npad,
+                            nproc = nproc,
+                            ncore = threads['tomopy'],
+                            callback = progress)
+        self.report_threads('sweep')
+        self.logfile.write("sweep_slice(sinogram(data, "+str(row)+"), theta, "+str(center)+", "+str(combos)+")\n")
+        self.show_sweep(results, row, nproc)
+        t1 = time.time()
+        fastest = min(results, key=lambda r: r['seconds'])
+        print('Sweep time ', t1-t0)
+        self.status_ID.SetLabel('Sweep complete. Fastest was '+fastest['label']+' ('+str(round(fastest['seconds'], 3))+' s).')
+        return [dict((k, v) for k, v in r.items() if k != 'image')
+                for r in sorted(results, key=lambda r: r['seconds'])]
+
+    def show_sweep(self, results, row, nproc=1):
+        '''
+        Shows sweep results as one tiled image plus a table of run times in
+        tile order (left to right, top to bottom). The title says how many
+        runs shared the machine while they were timed.
+        '''
+        tiled, origins = mosaic([r['image'][::-1, :] for r in results])
+        image_frame = ImageFrame(self)
+        self.plot_frames.append(image_frame)
+        image_frame.panel.conf.interp = 'hanning'
+        image_frame.display(tiled, title='Parameter sweep, slice '+str(row),
+                            auto_contrast=False, colormap='gist_gray_r')
+        image_frame.Show()
+        image_frame.Raise()
+        if nproc > 1:
+            timing = ', '+str(nproc)+' runs timed concurrently'
+        else:
+            timing = ', runs timed serially'
+        table = wx.Frame(self, title = 'Sweep timings, slice '+str(row)+timing, size = (420, 400))
+        self.plot_frames.append(table)
+        runs = wx.ListCtrl(table, style = wx.LC_REPORT)
+        for i, heading in enumerate(('Tile', 'Run', 'Seconds', 'x fastest')):
+            runs.InsertColumn(i, heading)
+        fastest = min(r['seconds'] for r in results) or 1e-9
+        for i, r in enumerate(results):
+            runs.InsertItem(i, str(i + 1))
+            runs.SetItem(i, 1, r['label'])
+            runs.SetItem(i, 2, str(round(r['seconds'], 3)))
+            runs.SetItem(i, 3, str(round(r['seconds'] / fastest, 1)))
+        runs.SetColumnWidth(1, 200)
+        table.Show()
+        table.Raise()
+
     def OnExit(self, event):
         '''
         Closes the GUI program.
@@ -606,6 +1463,11 @@ class APS_13BM(wx.Frame):
             if self.plotframe != None:  self.plotframe.onExit()
         except:
             pass
+        if self.status_server is not None:
+            self.status_server.stop()
+        if self.remote_server is not None:
+            self.remote_server.stop()
+        self.session.close()
         self.Destroy()
 
 
@@ -617,8 +1479,7 @@ class APS_13BM(wx.Frame):
         Allows user to not normalize to air at edge if sample takes up entire
         field of view.
         '''
-        self.cb = event.GetEventObject()
-        self.cb = self.cb.GetValue()
+        self.cb = self.bg_cb.GetValue()
         print('Box checked ', self.cb)
 
     def pad_size_combo_recall (self, event = None):
@@ -626,16 +1487,66 @@ class APS_13BM(wx.Frame):
         Sets sinogram pad size if user adjusts from default.
         '''
         new_pad = self.pad_size_combo.GetStringSelection()
+        self.auto_pad = new_pad == 'Auto Pad'
         if new_pad == 'No Padding':
             self.pad_size = int(0)
             self.npad = int(0)
-        else:
+        elif not self.auto_pad:
             self.pad_size = int(new_pad)
 
+    def sinogram_volume(self):
+        '''
+        Empty array for the working volume in sinogram order. With more than
+        one process it is put in shared memory, so slab_recon hands it to
+        its workers without a copy.
+        '''
+        shape = (self.data.shape[1], self.data.shape[0], self.data.shape[2])
+        if int(self.nproc_blank.GetValue()) > 1:
+            return shared_empty(shape, self.data.dtype)
+        return np.empty(shape, dtype=self.data.dtype)
+
+    def get_npad(self, data=None, sino_order=None):
+        '''
+        Columns of virtual padding per side for the loaded data, or for
+        data in layout sino_order. Resolves Auto Pad from the host profile,
+        benchmarking on a cache miss.
+        '''
+        if data is None:
+            data = self.data
+            sino_order = self.sino_order
+        if self.auto_pad:
+            def report(message):
+                print('auto pad ', message)
+                self.status_ID.SetLabel('Choosing pad size. '+message)
+                wx.Yield()
+            self.pad_size = auto_pad(data,
+                                     self.theta,
+                                     sino_order = sino_order,
+                                     ncore = int(self.ncore_blank.GetValue()),
+                                     callback = report)
+            self.logfile.write('auto pad size = '+str(self.pad_size)+'\n')
+        return pad_width(self.pad_size, data.shape[2])
+
+    def get_roi(self):
+        '''
+        Sinogram rows (start, end) and in-plane window (y0, y1, x0, x1) from
+        the ROI boxes. Blank boxes give the whole range.
+        '''
+        def bounds(start_blank, end_blank, n):
+            start = start_blank.GetValue().strip()
+            end = end_blank.GetValue().strip()
+            return (int(start) if start else 0, int(end) if end else n)
+        ncols = self.data.shape[2]
+        rows = bounds(self.roi_row_start_blank, self.roi_row_end_blank, nrows(self.data, self.sino_order))
+        window = (bounds(self.roi_y_start_blank, self.roi_y_end_blank, ncols)
+                  + bounds(self.roi_x_start_blank, self.roi_x_end_blank, ncols))
+        return rows, window
+
     def remove_ring(self, event=None):
         '''
         Removes ring artifact from reconstructed data.
         '''
+        self.load_data()
         self.status_ID.SetLabel('Deringing')
         ## Setting up timestamp.
         t0 = time.time()
@@ -648,17 +1559,64 @@ class APS_13BM(wx.Frame):
             ring_width = ring_width + 1
         ## Remove Ring
         print('kernel size is ', ring_width)
-        self.data = tp.prep.stripe.remove_stripe_sf(self.data,
-                                                    size = ring_width)
+        with self.governor.stage('remove_ring', self.ncore) as threads:
+            if self.sino_order:
+                ## Stripe removal expects projection order. Both transposes are
+                ## blocked parallel passes, and the sinogram copy is released
+                ## before stripe removal allocates its result.
+                self.data = to_projection_order(self.data, threads['tomopy'])
+                self.data = tp.prep.stripe.remove_stripe_sf(self.data,
+                                                            size = ring_width,
+                                                            ncore = threads['tomopy'])
+                self.data = to_sinogram_order(self.data, threads['tomopy'], out = self.sinogram_volume())
+            else:
+                self.data = tp.prep.stripe.remove_stripe_sf(self.data,
+                                                            size = ring_width,
+                                                            ncore = threads['tomopy'])
+        self.report_threads('remove_ring')
+        self.data_changed()
         self.logfile.write("tp.prep.stripe.remove_stripe_sf(data, size='ring_width')\n")
         t1 = time.time()
         print('made it through ring removal.', t1-t0)
         self.status_ID.SetLabel('Ring removed.')
 
+    def auto_tune(self, event=None):
+        '''
+        Runs short calibration reconstructions on the loaded data, fills in the
+        fastest ncore and nchunk, and saves them as this machine's profile.
+        '''
+        self.load_data()
+        if self.data is None:
+            self.status_ID.SetLabel('Import data before auto tuning.')
+            return
+        self.status_ID.SetLabel('Auto tuning.')
+        t0 = time.time()
+        def report(message):
+            print('auto tune ', message)
+            self.status_ID.SetLabel('Auto tuning. '+message)
+            wx.Yield()
+        flat = getattr(self, 'flat', None)
+        dark = getattr(self, 'dark', None)
+        result = autotune(self.data,
+                          self.theta,
+                          flat = flat,
+                          dark = dark,
+                          sino_order = self.sino_order,
+                          callback = report)
+        self.ncore = result['ncore']
+        self.nchunk = result['nchunk']
+        self.ncore_blank.SetValue(str(self.ncore))
+        self.nchunk_blank.SetValue(str(self.nchunk))
+        save_profile({'ncore': self.ncore, 'nchunk': self.nchunk})
+        t1 = time.time()
+        print('Auto tune time ', t1-t0, ' ncore ', self.ncore, ' nchunk ', self.nchunk)
+        self.status_ID.SetLabel('Auto tune: ncore '+str(self.ncore)+', nchunk '+str(self.nchunk))
+
     def zinger_removal(self, event):
         '''
         Remove zingers from raw data.
         '''
+        self.load_data()
         self.status_ID.SetLabel('Correcting Zingers')
         t0 = time.time()
         ## Pull user specified processing power.
@@ -673,10 +1631,15 @@ class APS_13BM(wx.Frame):
             self.status_ID.SetLabel('Provide expected difference b/n zinger and median data value')
             return
         size = int(self.ring_width_blank.GetValue())
-        self.data = tp.remove_outlier(self.data,
-                                      dif = self.zinger,
-                                      size = size,
-                                      ncore = self.ncore,)
+        ## Median filter within projections, which are axis 1 in sinogram order.
+        with self.governor.stage('zinger', self.ncore) as threads:
+            self.data = tp.remove_outlier(self.data,
+                                          dif = self.zinger,
+                                          size = size,
+                                          axis = 1 if self.sino_order else 0,
+                                          ncore = threads['tomopy'],)
+        self.report_threads('zinger')
+        self.data_changed()
         self.logfile.write("tp.remove_outlier(data, dif = zinger, size = size, ncore = ncore)\n")
         t1 = time.time()
         print('Zingers removed: ', t1-t0)
@@ -690,6 +1653,7 @@ class APS_13BM(wx.Frame):
         In the works is to have this all done externally. That script is already written, but needs a method
         for passing the UI info updates.
         '''
+        self.load_data()
         self.status_ID.SetLabel('Preprocessing')
         ## Setting up timestamp.
         t0 = time.time()
@@ -699,52 +1663,52 @@ class APS_13BM(wx.Frame):
         # self.data, self.npad, self.status_ID = normalize_data(self.data, self.flat, self.dark, self.ncore, self.cb, self.pad_size)
         self.logfile.write('nchunk ='+str(self.nchunk)+'\n')
         self.logfile.write('ncore = '+str(self.ncore)+'\n')
-        print('uint16 data are ', self.data.shape, self.data.max(), self.data.min())
+        print('uint16 data are ', self.data.shape, self.stats.max(self.data), self.stats.min(self.data))
         ## Normalize via flats and darks.
         ## First normalization using flats and dark current.
-        self.data = tp.normalize(self.data,
-                     flat=self.flat,
-                     dark=self.dark,
-                     ncore = self.ncore)
-        self.logfile.write("tp.normalize(data, flat = flat, dark = dark, ncore = ncore, out = data)\n")
-        print('post tp-normalization data are ', self.data.shape, self.data.max(), self.data.min())
-        ## Additional normalization using the 10 outter most air pixels.
-        if self.cb == True:
-            self.data = tp.normalize_bg(self.data,
-                                        air = 10)
-            self.logfile.write("tp.normalize_bg(data, air = 10)\n")
-            print('post background norm data are ', self.data.shape, self.data.max(), self.data.min())
-        ## Allows user to pad sinogram.
-        if self.pad_size != 0:
-            self.npad = 0
-            if int(self.pad_size) < self.data.shape[2]:
+        with self.governor.stage('normalize', self.ncore) as threads:
+            self.data = tp.normalize(self.data,
+                         flat=self.flat,
+                         dark=self.dark,
+                         ncore = threads['tomopy'])
+            self.logfile.write("tp.normalize(data, flat = flat, dark = dark, ncore = ncore, out = data)\n")
+            self.data_changed()
+            print('post tp-normalization data are ', self.data.shape, self.data.dtype)
+            ## Additional normalization using the 10 outter most air pixels.
+            if self.cb == True:
+                self.data = tp.normalize_bg(self.data,
+                                            air = 10,
+                                            ncore = threads['tomopy'],
+                                            nchunk = self.nchunk)
+                self.logfile.write("tp.normalize_bg(data, air = 10, ncore = ncore, nchunk = nchunk)\n")
+                print('post background norm data are ', self.data.shape, self.data.dtype)
+            ## Sinogram padding is virtual: the data stay at native width and each
+            ## chunk is padded only inside reconstruction (see padding.py).
+            if self.pad_size != 0 and int(self.pad_size) < self.data.shape[2]:
                 self.status_ID.SetLabel('Pad Size too small for dataset. Normalized but no padding.')
-                return
-            else:
-                self.npad = int( (int(self.pad_size) - self.data.shape[2] ) / 2)
-                self.logfile.write('npad = '+str(self.npad))
-                self.data = tp.misc.morph.pad(self.data,
-                                              axis = 2,
-                                              npad =self.npad,
-                                              mode = 'edge')
-                self.logfile.write("tp.misc.morph(data, axis = 2, npad = npad, mode = 'edge')\n")
-        ## Delete dark field array as we no longer need it.
-        del self.dark
-        ## Scale data for I0 should be 0. This is done to not take minus_log of 0.
-        self.data[np.where(self.data < 0)] = 1**-6
-        self.logfile.write("data[np.where(data < 0)] = 1**-6\n")
-        print('just before minus_logged data are ', self.data.shape, self.data.max(), self.data.min())
-        tp.minus_log(self.data, out = self.data)
-        self.logfile.write("tp.minus_log(data, out = data)\n")
-        print('minus_logged data are ', self.data.shape, self.data.max(), self.data.min())
-        self.data = tp.remove_nan(self.data,
-                                  val = 0.,
-                                  ncore = self.ncore)
-        self.logfile.write("tp.remove_nan(data, val = 0., ncore = ncore)\n")
-        print('removed nan data are ', self.data.shape, self.data.max(), self.data.min())
+            self.npad = self.get_npad()
+            self.logfile.write('npad = '+str(self.npad)+' (applied per chunk during reconstruction)\n')
+            ## Delete dark field array as we no longer need it.
+            self.dark = None
+            ## Scale data for I0 should be 0. This is done to not take minus_log of 0.
+            self.data[np.where(self.data < 0)] = 1**-6
+            self.logfile.write("data[np.where(data < 0)] = 1**-6\n")
+            tp.minus_log(self.data, out = self.data)
+            self.logfile.write("tp.minus_log(data, out = data)\n")
+            self.data = tp.remove_nan(self.data,
+                                      val = 0.,
+                                      ncore = threads['tomopy'])
+            self.logfile.write("tp.remove_nan(data, val = 0., ncore = ncore)\n")
+            ## Optional one-time conversion to sinogram order.
+            if self.sino_cb.GetValue():
+                self.data = to_sinogram_order(self.data, threads['tomopy'], out = self.sinogram_volume())
+                self.sino_order = True
+                self.logfile.write("data = np.ascontiguousarray(data.swapaxes(0,1))\nsino_order = True\n")
+        self.report_threads('normalize')
+        self.data_changed()
         ## Updates GUI. Variables set to None don't update in self.update_info method.
-        self.data_max = self.data.max()
-        self.data_min = self.data.min()
+        ## Single fused pass for min and max, reused by every print below.
+        self.update_stats()
         path = None
         dark = None
         fname = None
@@ -761,14 +1725,105 @@ class APS_13BM(wx.Frame):
         ## Timestamping.
         t1 = time.time()
         total = t1-t0
-        print('data dimensions ',self.data.shape, self.data.dtype, 'max', self.data.max(),'min ', self.data.min())
+        print('data dimensions ',self.data.shape, self.data.dtype, 'max', self.data_max,'min ', self.data_min)
         print('Normalization time was ', total)
 
+    def phase_retrieval(self, event=None):
+        '''
+        Paganin phase retrieval on the normalized data, in place. The filter
+        is cached for the current energy, distance, pixel size and alpha, and
+        the column padding follows the reconstruction pad size.
+        '''
+        self.load_data()
+        if self.data is None or self.data.dtype != np.float32:
+            self.status_ID.SetLabel('Preprocess the data before phase retrieval.')
+            return
+        try:
+            energy = float(self.energy_blank.GetValue())
+            dist = float(self.distance_blank.GetValue())
+            ## Pixel size is entered in microns; the filter works in cm.
+            pixel_size = float(self.pixel_blank.GetValue()) * 1e-4
+            alpha = float(self.alpha_blank.GetValue())
+        except ValueError:
+            self.status_ID.SetLabel('Enter energy, distance, pixel size and alpha as numbers.')
+            return
+        self.status_ID.SetLabel('Retrieving phase.')
+        t0 = time.time()
+        self.ncore = int(self.ncore_blank.GetValue())
+        def progress(done, total):
+            self.status_ID.SetLabel('Retrieving phase. '+str(int(100*done/total))+'% done.')
+            self.run_status.progress(done, total, unit = 'projections')
+            wx.Yield()
+        with self.governor.stage('phase', self.ncore) as threads:
+            retrieve_phase(self.data,
+                           pixel_size,
+                           dist,
+                           energy,
+                           alpha,
+                           sino_order = self.sino_order,
+                           pad_size = self.pad_size,
+                           ncore = threads['tomopy'],
+                           callback = progress)
+        self.report_threads('phase')
+        self.logfile.write("tomopy.retrieve_phase(exp(-data), pixel_size = "+str(pixel_size)+", dist = "+str(dist)+", energy = "+str(energy)+", alpha = "+str(alpha)+"), then minus_log\n")
+        self.data_changed()
+        self.update_stats()
+        self.update_info(data_max=self.data_max,
+                         data_min=self.data_min)
+        t1 = time.time()
+        print('Phase retrieval time ', t1-t0)
+        self.status_ID.SetLabel('Phase Retrieval Complete')
+
+    def lazy_rows(self):
+        '''
+        True when single rows and projections can be read and normalized
+        straight from the file: the volume has not been read in and the
+        dataset has flat fields to normalize with.
+        '''
+        return self.data is None and self.dataset is not None and self.dataset.flat is not None
+
+    def read_rows(self, r0, r1):
+        '''
+        Normalized sinogram rows r0:r1 and their layout (sino_order). Before
+        the volume is read in only these rows are read from the file and
+        normalized (see stitch.read_slab), so previews and centering do not
+        load the whole dataset.
+        '''
+        if self.lazy_rows():
+            return read_slab(self.dataset, r0, r1,
+                             air = self.bg_cb.GetValue(),
+                             ncore = int(self.ncore_blank.GetValue())), False
+        self.load_data()
+        return sino_slab(self.data, r0, r1, self.sino_order), self.sino_order
+
+    def read_sinogram(self, row):
+        '''
+        One normalized sinogram (angle, column), read like read_rows().
+        '''
+        data, sino_order = self.read_rows(row, row+1)
+        return sinogram(data, 0, sino_order)
+
+    def read_projection(self, index):
+        '''
+        One normalized projection, read like read_rows().
+        '''
+        if self.lazy_rows():
+            return preprocess_slab(self.dataset.read(proj=(index, index+1)),
+                                   self.dataset.flat,
+                                   self.dataset.dark,
+                                   air = self.bg_cb.GetValue(),
+                                   ncore = int(self.ncore_blank.GetValue()))[0]
+        self.load_data()
+        return projection(self.data, index, self.sino_order)
+
     def find_rot_center(self, event=None):
         '''
         Allows user to find rotation centers of two slices. Then displays the
-        average of those centers.
+        average of those centers. Only the rows and projections a method
+        needs are read if the volume has not been read in yet.
         '''
+        if self.data is None and self.dataset is None:
+            return
         self.status_ID.SetLabel('Centering')
         print('Begin centering')
         ## Setting up timestamp.
@@ -785,89 +1840,166 @@ class APS_13BM(wx.Frame):
         self.logfile.write('lower_slice = '+str(lower_slice)+'\n')
         self.logfile.write('upper_center= '+str(upper_center)+'\n')
         self.logfile.write('lower_center= '+str(lower_center)+'\n')
+        ## Axis tilt, for the methods that fit one.
+        tilt = None
 
         '''
         TomoPy uses three possible centering methods. The Nghia Vo by far seems to
         perform best.
         '''
         if self.find_center_type == 'Entropy':
-            self.upper_rot_center = float(tp.find_center(self.data[upper_slice:upper_slice+1,:,:],
-                                                   self.theta,
-                                                   ind = upper_slice,
-                                                   init=upper_center,
-                                                   tol=tol,
-                                                   sinogram_order = False))
-            self.logfile.write("float(tp.find_center(data[upper_slice:upper_slice+1,:,:], theta, ind = upper_slice, init = upper_center, tol = tol, sinogram_order = False))\n")
-            self.lower_rot_center = float(tp.find_center(self.data[lower_slice:lower_slice+1,:,:],
-                                                   self.theta,
-                                                   ind = upper_slice,
-                                                   init = lower_center,
-                                                   tol = tol,
-                                                   sinogram_order = False))
-            self.logfile.write("float(tp.find_center(data[lower_slice:lower_slice+1,:,:], theta, ind = lower_slice, init = lower_center, tol = tol, sinogram_order = False))\n")
+            ## Coarse search over a wide range on a binned, angle-decimated
+            ## sinogram, then refined at full resolution (see centering.py).
+            self.ncore = int(self.ncore_blank.GetValue())
+            with self.governor.stage('center', self.ncore) as threads:
+                self.upper_rot_center = entropy_center(self.read_sinogram(upper_slice),
+                                                       self.theta,
+                                                       init = upper_center,
+                                                       tol = tol,
+                                                       ncore = threads['tomopy'])
+                self.lower_rot_center = entropy_center(self.read_sinogram(lower_slice),
+                                                       self.theta,
+                                                       init = lower_center,
+                                                       tol = tol,
+                                                       ncore = threads['tomopy'])
+            self.report_threads('center')
+            self.logfile.write("entropy_center(data[:,upper_slice,:], theta, init = upper_center, tol = tol)\n")
+            self.logfile.write("entropy_center(data[:,lower_slice,:], theta, init = lower_center, tol = tol)\n")
             self.rot_center = (self.upper_rot_center + self.lower_rot_center) / 2
         if self.find_center_type == '0-180':
-            if upper_slice > self.data.shape[2]:
+            n_proj = len(self.theta)
+            ncols = (self.dataset if self.data is None else self.data).shape[2]
+            if upper_slice > ncols:
                 self.status_ID.SetLabel('Upper slice out of range.')
                 return
-            if lower_slice > self.data.shape[2]:
+            if lower_slice > ncols:
                 self.status_ID.SetLabel('Lower slice out of range.')
                 return
-            upper_proj1 = self.data[upper_slice,:,:]
+            upper_proj1 = self.read_projection(upper_slice)
 
             ## This finds the slice at 180 from the input slice.
-            u_slice2 = (upper_slice + int(self.data.shape[0]/2)) % self.data.shape[0]
+            u_slice2 = (upper_slice + int(n_proj/2)) % n_proj
 
-            upper_proj2 = self.data[u_slice2,:,:]
+            upper_proj2 = self.read_projection(u_slice2)
             self.upper_rot_center = tp.find_center_pc(upper_proj1,
                                                       upper_proj2,
                                                       tol = tol)
             self.logfile.write("tp.find_center_pc(upper_proj1, upper_proj2, tol = tol)\n")
-            lower_proj1 = self.data[lower_slice,:,:]
-            l_slice2 = (lower_slice + int(self.data.shape[0]/2)) % self.data.shape[0]
-            lower_proj2 = self.data[l_slice2,:,:]
+            lower_proj1 = self.read_projection(lower_slice)
+            l_slice2 = (lower_slice + int(n_proj/2)) % n_proj
+            lower_proj2 = self.read_projection(l_slice2)
             self.lower_rot_center = tp.find_center_pc(lower_proj1,
                                                       lower_proj2,
                                                       tol = tol)
             self.logfile.write("tp.find_center_pc(lower_proj1, lower_proj2, tol = tol)\n")
             self.rot_center = (self.upper_rot_center + self.lower_rot_center) / 2
 
+        if self.find_center_type == '0-180 (tilt fit)':
+            ## Center and tilt in one pass from the first projection and the
+            ## one 180 degrees from it, phase correlated band by band (see
+            ## centering.py). The centers are read off the fitted line.
+            proj0 = self.read_projection(0)
+            proj180 = self.read_projection(opposite_projection(self.theta, 0))
+            rows, centers, slope, intercept, inliers, tilt = pair_axis(proj0, proj180)
+            self.logfile.write("pair_axis(projection 0, projection at 180 deg)\n")
+            print('bands used ', int(inliers.sum()), ' of ', rows.size)
+            print('center fit slope ', slope, ' intercept ', intercept, ' tilt (deg) ', tilt)
+            self.upper_rot_center = intercept + slope * upper_slice
+            self.lower_rot_center = intercept + slope * lower_slice
+            self.rot_center = (self.upper_rot_center + self.lower_rot_center) / 2
+
         if self.find_center_type == 'Nghia Vo':
-            self.upper_rot_center = tp.find_center_vo(self.data[:,upper_slice:upper_slice+1,:])
-            self.logfile.write("tp.find_center_vo(data[:,upper_slice:upper_slice+1,:])\n")
-            self.lower_rot_center = tp.find_center_vo(self.data[:,lower_slice:lower_slice+1,:])
-            self.logfile.write("tp.find_center_vo(data[:,lower_slice:lower_slice+1,:])\n")
+            ## find_center_vo wants (angle, row, column); a sinogram with a new
+            ## row axis is a free view in either layout.
+            self.ncore = int(self.ncore_blank.GetValue())
+            with self.governor.stage('center', self.ncore) as threads:
+                self.upper_rot_center = tp.find_center_vo(self.read_sinogram(upper_slice)[:,None,:],
+                                                          ncore = threads['tomopy'])
+                self.lower_rot_center = tp.find_center_vo(self.read_sinogram(lower_slice)[:,None,:],
+                                                          ncore = threads['tomopy'])
+            self.report_threads('center')
+            self.logfile.write("tp.find_center_vo(data[:,upper_slice:upper_slice+1,:], ncore = ncore)\n")
+            self.logfile.write("tp.find_center_vo(data[:,lower_slice:lower_slice+1,:], ncore = ncore)\n")
+            self.rot_center = (self.upper_rot_center + self.lower_rot_center) / 2
+
+        if self.find_center_type.endswith('(multi-slice)'):
+            ## Center N evenly spaced slices at once and fit a line through them.
+            ## The upper and lower centers are read off the fitted line, so the
+            ## per-row interpolation in reconstruct follows the fit.
+            self.nchunk = int(self.nchunk_blank.GetValue())
+            self.ncore = int(self.ncore_blank.GetValue())
+            nslices = int(self.n_center_slices_blank.GetValue())
+            method = self.find_center_type.split(' (')[0]
+            if self.lazy_rows():
+                ## Only the slices to center are read from the file.
+                rows = center_slices(self.dataset.shape[1], nslices)
+                data = np.concatenate([self.read_rows(r, r+1)[0] for r in rows], axis=1)
+                sino_order = False
+            else:
+                self.load_data()
+                rows = None
+                data = self.data
+                sino_order = self.sino_order
+            with self.governor.stage('center', self.ncore) as threads:
+                rows, centers, slope, intercept, inliers, tilt = multi_slice_centers(data,
+                                                                     self.theta,
+                                                                     nslices,
+                                                                     sino_order = sino_order,
+                                                                     method = method,
+                                                                     init = (upper_center + lower_center) / 2,
+                                                                     tol = tol,
+                                                                     ncore = threads['tomopy'],
+                                                                     rows = rows)
+            self.report_threads('center')
+            self.logfile.write("multi_slice_centers(data, theta, "+str(nslices)+", method = '"+method+"')\n")
+            for row, center, keep in zip(rows, centers, inliers):
+                print('slice ', row, ' center ', center, '' if keep else '(rejected)')
+            print('center fit slope ', slope, ' intercept ', intercept, ' tilt (deg) ', tilt)
+            self.upper_rot_center = intercept + slope * upper_slice
+            self.lower_rot_center = intercept + slope * lower_slice
             self.rot_center = (self.upper_rot_center + self.lower_rot_center) / 2
 
         ## Timestamping.
         t1 = time.time()
         total = t1-t0
         print('Time to find center was ', total)
+        ## A fit through fewer than two good slices or bands has no line.
+        if not (np.isfinite(self.upper_rot_center) and np.isfinite(self.lower_rot_center)):
+            print('centering failed, centers are ', self.upper_rot_center, self.lower_rot_center)
+            self.status_ID.SetLabel('Centering failed: too few slices gave a center. Centers unchanged.')
+            return
         self.status_ID.SetLabel('Rotation Center found.')
+        if tilt is not None:
+            self.status_ID.SetLabel('Rotation Center found. Tilt is '+str(round(tilt, 3))+' deg.')
         print('success, rot center is ', self.rot_center)
 
         ## Updating the GUI for the calculated values.
-        self.upper_rot_center_blank.SetLabel(str((self.upper_rot_center-self.npad)))
-        self.lower_rot_center_blank.SetLabel(str((self.lower_rot_center-self.npad)))
+        self.upper_rot_center_blank.SetLabel(str(self.upper_rot_center))
+        self.lower_rot_center_blank.SetLabel(str(self.lower_rot_center))
 
     def up_recon_slice (self, event):
         '''
         Upper slice reconstruction method. Any adjustment to the recon method will
         likely also need to be done to the single slice reocon methods.
         '''
+        if self.data is None and self.dataset is None:
+            return
         self.status_ID.SetLabel('Reconstructing slice.')
         t0 = time.time()
         upper_rot_center = float(self.upper_rot_center_blank.GetValue())
-        ## Remember to remove this before syncing.
-        if self.npad != 0:
-            upper_rot_center = float(upper_rot_center+self.npad)
         start = int(self.upper_rot_slice_blank.GetValue())
-        self.data_slice = self.data[:,start:start+1,:]
-        self.data_slice = tp.recon(self.data_slice,
-                                   self.theta,
-                                   center = upper_rot_center,
-                                   sinogram_order = False,
-                                   algorithm = self.recon_type)
+        ## Only this row is read if the volume has not been read in.
+        self.data_slice, sino_order = self.read_rows(start, start+1)
+        npad = self.get_npad(self.data_slice, sino_order)
+        self.ncore = int(self.ncore_blank.GetValue())
+        with self.governor.stage('slice', self.ncore) as threads:
+            self.data_slice = padded_recon(self.data_slice,
+                                           self.theta,
+                                           upper_rot_center,
+                                           npad,
+                                           sino_order = sino_order,
+                                           algorithm = self.recon_type,
+                                           ncore = threads['tomopy'])
         t1 = time.time()
         print('Slice recon time ', t1-t0)
         self.status_ID.SetLabel('Slice Reconstructed.')
@@ -878,18 +2010,24 @@ class APS_13BM(wx.Frame):
         Lower slice reconstruction method. Any adjustment to the recon method will
         likely also need to be done to the single slice reocon methods.
         '''
+        if self.data is None and self.dataset is None:
+            return
         self.status_ID.SetLabel('Reconstructing slice.')
         t0 = time.time()
         lower_rot_center = float(self.lower_rot_center_blank.GetValue())
-        if self.npad != 0:
-            lower_rot_center = float(lower_rot_center+self.npad)
         start = int(self.lower_rot_slice_blank.GetValue())
-        self.data_slice = self.data[:,start:start+1,:]
-        self.data_slice = tp.recon(self.data_slice,
-                                   self.theta,
-                                   center = lower_rot_center,
-                                   sinogram_order = False,
-                                   algorithm = self.recon_type)
+        ## Only this row is read if the volume has not been read in.
+        self.data_slice, sino_order = self.read_rows(start, start+1)
+        npad = self.get_npad(self.data_slice, sino_order)
+        self.ncore = int(self.ncore_blank.GetValue())
+        with self.governor.stage('slice', self.ncore) as threads:
+            self.data_slice = padded_recon(self.data_slice,
+                                           self.theta,
+                                           lower_rot_center,
+                                           npad,
+                                           sino_order = sino_order,
+                                           algorithm = self.recon_type,
+                                           ncore = threads['tomopy'])
         t1 = time.time()
         print('Slice recon time ', t1-t0)
         self.status_ID.SetLabel('Slice Reconstructed.')
@@ -907,32 +2045,7 @@ class APS_13BM(wx.Frame):
         are very computationally intensive and quite slow.
         '''
         self.recon_type = self.recon_menu.GetStringSelection()
-        if self.recon_type == 'Algebraic':
-            self.recon_type = 'art'
-        if self.recon_type == 'Block Algebraic':
-            self.recon_type = 'bart'
-        if self.recon_type == 'Filtered Back-projection':
-            self.recon_type = 'fbp'
-        if self.recon_type == 'Gridrec':
-            self.recon_type = 'gridrec'
-        if self.recon_type == 'Max-likelihood Expectation':
-            self.recon_type = 'mlem'
-        if self.recon_type == 'Ordered-subset Expectation':
-            self.recon_type = 'osem'
-        if self.recon_type == 'ospml_hybrid':
-            self.recon_type = 'ospml_hybrid'
-        if self.recon_type == 'ospml_quad':
-            self.recon_type = 'ospml_quad'
-        if self.recon_type == 'pml_hybrid':
-            self.recon_type = 'pml_hybrid'
-        if self.recon_type == 'pml_quad':
-            self.recon_type = 'pml_quad'
-        if self.recon_type == 'Simultaneous Algebraic':
-            self.recon_type = 'sirt'
-        if self.recon_type == 'Total Variation':
-            self.recon_type = 'tv',
-        if self.recon_type == 'Gradient Descent':
-            self.recon_type = 'grad'
+        self.recon_type = self.RECON_ALGORITHMS.get(self.recon_type, self.recon_type)
         print('Recon algorithm is ', self.recon_type)
 
     def OnFilterCombo(self, event):
@@ -946,21 +2059,31 @@ class APS_13BM(wx.Frame):
         This will need to be updated in the future once TomoPy implements their own
         version. For now this is a temporary solution.
         '''
+        self.load_data()
         ## This did not come from TomoPy because TomoPy has yet to implement.
         self.status_ID.SetLabel('Correcting Tilt')
         ## Setting up timestamp.
         t0 = time.time()
-        nangles = self.data.shape[0]
+        n_proj = nangles(self.data, self.sino_order)
         top_center = float(self.upper_rot_center_blank.GetValue())
         bottom_center = float(self.lower_rot_center_blank.GetValue())
         top_slice = float(self.upper_rot_slice_blank.GetValue())
         bottom_slice = float(self.lower_rot_slice_blank.GetValue())
-        angle = (top_center - bottom_center)/(bottom_slice - top_slice)
+        ## Tilt in degrees of the line through the two centers, as found by
+        ## the (tilt fit) and (multi-slice) centering methods. Rotating by it
+        ## makes the axis vertical.
+        angle = np.degrees(np.arctan((top_center - bottom_center)/(bottom_slice - top_slice)))
         print('angle is ', angle)
-        for i in range(nangles-1):
-            projection = self.data[i,:,:]
-            r = scipy.ndimage.rotate(projection, angle)
-            self.data[i,:,:] = r
+        for i in range(n_proj):
+            proj = projection(self.data, i, self.sino_order)
+            proj[:] = scipy.ndimage.rotate(proj, angle, reshape=False)
+        ## The rotation is about the middle of the projection, so the axis
+        ## ends up at the center the fit gives for the middle row.
+        n_rows = nrows(self.data, self.sino_order)
+        middle = top_center + (bottom_center - top_center) * ((n_rows - 1) / 2. - top_slice) / (bottom_slice - top_slice)
+        self.upper_rot_center_blank.SetLabel(str(middle))
+        self.lower_rot_center_blank.SetLabel(str(middle))
+        self.data_changed()
         t1 = time.time()
         print('Time to tilt ', t1-t0)
         print('New dimnsions are ', self.data.shape, 'Data type is', type(self.data), 'dtype is ', self.data.dtype)
@@ -970,48 +2093,122 @@ class APS_13BM(wx.Frame):
         '''
         Whole volume reconstruction method.
         '''
+        self.load_data()
         self.status_ID.SetLabel('Reconstructing.')
         ## Setting up timestamp.
         t0 = time.time()
         ## Pull user specified processing power.
         self.nchunk = int(self.nchunk_blank.GetValue())
         self.ncore = int(self.ncore_blank.GetValue())
+        self.nproc = int(self.nproc_blank.GetValue())
         print('original data dimensions are ', self.data.shape, type(self.data), self.data.dtype)
         ## Get rotation centers
         upper_rot_center = float(self.upper_rot_center_blank.GetValue())
         lower_rot_center = float(self.lower_rot_center_blank.GetValue())
-        ## Need to add padding to center if padded.
-        if self.npad != 0:
-            upper_rot_center = float(upper_rot_center+self.npad)
-            lower_rot_center = float(lower_rot_center+self.npad)
+        ## Padding is added per chunk inside reconstruction; centers stay in
+        ## native column coordinates.
+        self.npad = self.get_npad()
         ## Make array of centers to reduce artifacts during reconstruction.
-        ## This works by calculating the slope between centers and interpolates.
-        center_slope = (lower_rot_center - upper_rot_center) / float(self.data.shape[0])
-        center_array = upper_rot_center + (np.arange(self.data.shape[0])*center_slope)
-
-        ## Reconstruct the data. Using nchunk causes aritfacts within the reconstruction.
-        self.data = tp.recon(self.data,
-                             self.theta,
-                             center = center_array,
-                             sinogram_order = False,
-                             algorithm = self.recon_type,
-                             filter_name = self.filter_type,
-                             ncore = self.ncore)
-                            # nchunk = self.nchunk)
-        self.logfile.write("tp.recon(data, theta, center = center_array, sinogram_order = False, algorithm, recon_type, filterName = filter_type, ncore = ncore, nchunk = nchunk)\n")
+        ## This works by calculating the slope between centers and interpolates
+        ## one center per sinogram row.
+        upper_slice = float(self.upper_rot_slice_blank.GetValue())
+        lower_slice = float(self.lower_rot_slice_blank.GetValue())
+        center_array = interpolate_centers(upper_slice,
+                                           upper_rot_center,
+                                           lower_slice,
+                                           lower_rot_center,
+                                           nrows(self.data, self.sino_order))
+
+        roi = self.roi_cb.GetValue()
+        iterative = self.recon_type in ITERATIVE_ALGORITHMS and not roi
+        ## Worker processes split ncore between them.
+        nproc = 1 if iterative or roi else self.nproc
+        with self.governor.stage('reconstruct', self.ncore, nproc) as threads:
+            if roi:
+                ## Only the chosen rows, each with its own interpolated center,
+                ## cropped chunk by chunk so the full volume is never allocated.
+                try:
+                    rows, window = self.get_roi()
+                    self.data = roi_recon(self.data,
+                                          self.theta,
+                                          center_array,
+                                          self.npad,
+                                          rows = rows,
+                                          window = window,
+                                          sino_order = self.sino_order,
+                                          callback = self.recon_progress,
+                                          algorithm = self.recon_type,
+                                          filter_name = self.filter_type,
+                                          ncore = threads['tomopy'])
+                except ValueError as err:
+                    print(err)
+                    self.status_ID.SetLabel('ROI not valid: '+str(err))
+                    return
+                self.logfile.write("roi_recon(data, theta, center_array, npad, rows = "+str(rows)+", window = "+str(window)+", algorithm = recon_type, filter_name = filter_type)\n")
+            elif iterative:
+                ## Iterate in batches, from gridrec if warm start is on, and
+                ## preview after each one.
+                batch_iter = int(self.batch_iter_blank.GetValue())
+                max_iter = int(self.max_iter_blank.GetValue())
+                iter_tol = float(self.iter_tol_blank.GetValue())
+                self.data, history = iterative_recon(self.data,
+                                                     self.theta,
+                                                     center_array,
+                                                     self.recon_type,
+                                                     sino_order = self.sino_order,
+                                                     batch_iter = batch_iter,
+                                                     max_iter = max_iter,
+                                                     tol = iter_tol,
+                                                     filter_name = self.filter_type,
+                                                     ncore = threads['tomopy'],
+                                                     callback = self.preview_iteration,
+                                                     npad = self.npad,
+                                                     warm_start = self.warm_start_cb.GetValue())
+                self.logfile.write("iterative_recon(data, theta, center_array, recon_type, batch_iter = "+str(batch_iter)+", max_iter = "+str(max_iter)+", tol = "+str(iter_tol)+", warm_start = "+str(self.warm_start_cb.GetValue())+")\n")
+                print('iterations run ', len(history)*batch_iter, ' change per batch ', history)
+            elif self.nproc > 1:
+                ## Sinogram slabs are shared with worker processes through shared
+                ## memory, each slab with its own slice of center_array.
+                self.data = slab_recon(self.data,
+                                       self.theta,
+                                       center_array,
+                                       self.nproc,
+                                       sino_order = self.sino_order,
+                                       npad = self.npad,
+                                       callback = self.recon_progress,
+                                       algorithm = self.recon_type,
+                                       filter_name = self.filter_type,
+                                       ncore = threads['tomopy'])
+                self.logfile.write("slab_recon(data, theta, center_array, nproc = "+str(self.nproc)+", algorithm = recon_type, filter_name = filter_type)\n")
+            else:
+                ## Reconstruct the data. Using nchunk causes aritfacts within the reconstruction.
+                ## Chunks of sinograms are padded, reconstructed and cropped one at a time.
+                self.data = padded_recon(self.data,
+                                         self.theta,
+                                         center_array,
+                                         self.npad,
+                                         sino_order = self.sino_order,
+                                         callback = self.recon_progress,
+                                         algorithm = self.recon_type,
+                                         filter_name = self.filter_type,
+                                         ncore = threads['tomopy'])
+                self.logfile.write("padded_recon(data, theta, center_array, npad, sinogram_order = False, algorithm, recon_type, filterName = filter_type, ncore = ncore)\n")
+        self.report_threads('reconstruct')
         self.data = tp.remove_nan(self.data)
         self.logfile.write("tp.remove_nan(data)\n")
+        ## Reconstructed volume is (z, y, x) whatever the input layout was.
+        self.sino_order = False
+        self.data_changed()
         print('made it through recon.', self.data.shape, type(self.data), self.data.dtype)
         self.status_ID.SetLabel('Reconstruction Complete')
         t1 = time.time()
         total = t1-t0
         print('Reconstruction time was ', total)
         ## Updates new dimensions.
-        self.sx = self.data.shape[2]-2*self.npad
-        self.sy = self.data.shape[1]-2*self.npad
+        self.sx = self.data.shape[2]
+        self.sy = self.data.shape[1]
         self.sz = self.data.shape[0]
-        self.data_max = self.data.max()
-        self.data_min = self.data.min()
+        self.update_stats()
         ## Updates GUI. Variables set to None don't update in self.update_info methods
         path = None
         dark = None
@@ -1025,6 +2222,46 @@ class APS_13BM(wx.Frame):
                          data_max=self.data_max,
                          data_min=self.data_min)
 
+    def recon_progress(self, done, total):
+        '''
+        Reports slab reconstruction progress on the status line.
+        '''
+        self.status_ID.SetLabel('Reconstructing. '+str(int(100*done/total))+'% done.')
+        self.run_status.progress(done, total, unit = 'rows')
+        wx.Yield()
+
+    def save_progress(self, done, total):
+        '''
+        Reports export progress on the status line.
+        '''
+        self.status_ID.SetLabel('Saving. '+str(int(100*done/total))+'% done.')
+        self.run_status.progress(done, total, unit = 'slices')
+        wx.Yield()
+
+    def preview_iteration(self, rec, n_iter, change):
+        '''
+        Shows the slice from the 'Slice to view' box (or the middle slice)
+        after each batch of an iterative reconstruction.
+        '''
+        try:
+            z = int(self.z_dlg.GetValue())
+        except ValueError:
+            z = rec.shape[0] // 2
+        z = min(max(z, 0), rec.shape[0]-1)
+        d_data = self.display_window(rec[z, ::-1, :], sample_bounds(rec[z]))
+        if self.image_frame is None:
+            self.create_ImageFrame()
+            self.image_frame.panel.conf.interp = 'hanning'
+            self.image_frame.display(d_data, auto_contrast=False, colormap='gist_gray_r')
+        else:
+            self.image_frame.panel.update_image(d_data)
+        self.status_ID.SetLabel('Iteration '+str(n_iter)+', change '+str(round(change, 5)))
+        self.run_status.progress(n_iter, unit = 'iterations')
+        print('iteration ', n_iter, ' relative change ', change)
+        ## Let the window repaint while the reconstruction is still running.
+        wx.Yield()
+        return True
+
     def OnRadiobox(self, event):
         '''
         Adjusts what view the user wishes to see in plotting window.
@@ -1049,22 +2286,27 @@ class APS_13BM(wx.Frame):
         filter type selection. This is a secondary filter separate from the
         filtering during reconstruction.
         '''
+        self.load_data()
         self.status_ID.SetLabel('Filtering')
-        if self.pp_filter_type == 'gaussian_filter':
-            print('gaussian')
-            self.data = tp.misc.corr.gaussian_filter(self.data, sigma = 3)
-            self.logfile.write('data = tp.misc.corr.gaussian_filter(data, sigma = 3)')
-            print('gaussian done')
-        if self.pp_filter_type == 'median_filter':
-            print('median')
-            self.data = tp.misc.corr.median_filter(self.data)
-            self.logfile.write('data = tp.misc.corr.median_filter(data)')
-            print('median done')
-        if self.pp_filter_type == 'sobel_filter':
-            print('sobel')
-            self.data = tp.misc.corr.sobel_filter(self.data)
-            self.logfile.write('data = tp.misc.corr.sobel_filter(data)')
-            print('sobel done')
+        self.ncore = int(self.ncore_blank.GetValue())
+        with self.governor.stage('filter', self.ncore) as threads:
+            if self.pp_filter_type == 'gaussian_filter':
+                print('gaussian')
+                self.data = tp.misc.corr.gaussian_filter(self.data, sigma = 3, ncore = threads['tomopy'])
+                self.logfile.write('data = tp.misc.corr.gaussian_filter(data, sigma = 3)')
+                print('gaussian done')
+            if self.pp_filter_type == 'median_filter':
+                print('median')
+                self.data = tp.misc.corr.median_filter(self.data, ncore = threads['tomopy'])
+                self.logfile.write('data = tp.misc.corr.median_filter(data)')
+                print('median done')
+            if self.pp_filter_type == 'sobel_filter':
+                print('sobel')
+                self.data = tp.misc.corr.sobel_filter(self.data, ncore = threads['tomopy'])
+                self.logfile.write('data = tp.misc.corr.sobel_filter(data)')
+                print('sobel done')
+        self.report_threads('filter')
+        self.data_changed()
         self.status_ID.SetLabel('Data Filtered')
 
     def OnSaveDtypeCombo (self, event):
@@ -1098,6 +2340,7 @@ class APS_13BM(wx.Frame):
         are very slow. Raw data usually saves quickly, but data that has been
         changed to float format is slow.
         '''
+        self.load_data()
         self.status_ID.SetLabel('Saving')
         ## Setting up timestamp.
         t0 = time.time()
@@ -1108,12 +2351,16 @@ class APS_13BM(wx.Frame):
             return
         self.logfile.write('npad = '+str(self.npad)+'\nsave_data_type ='+str(self.save_data_type)+'\n')
         self.logfile.write('fname = '+str(self._fname)+'\n')
-        save_recon(data_type = self.save_data_type,
-                save_dtype = self.save_dtype,
-                npad = self.npad,
-                data = self.data,
-                fname = self._fname)
-        self.logfile.write('save_data(data_type = save_data_type, save_dtype = save_dtype, npad = npad, data = data, fname = _fname)')
+        with self.governor.stage('save', 1):
+            save_recon(data_type = self.save_data_type,
+                    save_dtype = self.save_dtype,
+                    npad = 0, # padding is never stored in the working volume.
+                    data = self.data.swapaxes(0,1) if self.sino_order else self.data,
+                    fname = self._fname,
+                    bounds = self.stats.bounds(self.data),
+                    crop = self.crop_cb.GetValue(),
+                    callback = self.save_progress)
+        self.logfile.write('save_data(data_type = save_data_type, save_dtype = save_dtype, npad = npad, data = data, fname = _fname, crop = '+str(self.crop_cb.GetValue())+')')
         self.logfile.close()
         self.status_ID.SetLabel('Saving completed.')
         t1 = time.time()
@@ -1131,11 +2378,21 @@ class APS_13BM(wx.Frame):
             self.image_frame = ImageFrame(self)
             self.image_frame.Show()
 
+    def display_window(self, d_data, bounds=None):
+        '''
+        Clips an image to the shared intensity window so display, movie and
+        export agree. Defaults to the histogram bounds of the whole volume.
+        '''
+        if bounds is None:
+            bounds = self.stats.bounds(self.data)
+        return scale_to_bounds(d_data, bounds[0], bounds[1], np.float32)
+
     def plot_slice_data (self,event=None):
 
         if self.data_slice is None: # user forgot to enter a slice.
             return
         image_frame = ImageFrame(self)
+        self.plot_frames.append(image_frame)
         try:
             z = 0
         except ValueError:  # user forgot to enter slice or entered bad slice.
@@ -1145,7 +2402,8 @@ class APS_13BM(wx.Frame):
         ## Setting up parameters and plotting.
         if d_data is not None:
             image_frame.panel.conf.interp = 'hanning'
-            image_frame.display(1.0*d_data, auto_contrast=True, colormap='gist_gray_r')
+            image_frame.display(self.display_window(d_data, sample_bounds(d_data)),
+                                auto_contrast=False, colormap='gist_gray_r')
             image_frame.Show()
             image_frame.Raise()
         else:
@@ -1159,10 +2417,11 @@ class APS_13BM(wx.Frame):
         Defaults to gray scale reversed so that bright corresponds to higher
         density. Temp object d_data is created so that slice view can be accomplished.
         '''
-        if self.data is None:   # no data loaded by user.
+        if self.data is None and self.dataset is None:   # no data loaded by user.
             return
         ## Calls plotting frame.
         image_frame = ImageFrame(self)
+        self.plot_frames.append(image_frame)
         try:
             ## Look for slice (self.z) to display.
             self.z = self.z_dlg.GetValue()
@@ -1175,23 +2434,29 @@ class APS_13BM(wx.Frame):
             print(" cannot read plot_type from Entry ", self.plot_type)
         ## Plotting data
         d_data = None
-        ## Plot an mask if reconstruction is not gridrec.
-        if self.recon_type != 'gridrec':
-                d_data = tp.circ_mask(d_data, axis = 0, ratio = 0.95)
+        bounds = None
+        ## Before the data are read in, projections and sinograms are read
+        ## straight from the file as single slabs. X views need everything.
+        if self.data is None and self.plot_type[0] == 'X':
+            self.load_data()
+        if self.data is None:
+            if self.plot_type.startswith('Z'):
+                d_data = self.dataset.read(proj=(z, z+1))[0, ::-1, :]
+            if self.plot_type.startswith('Y'):
+                d_data = self.dataset.read(sino=(z, z+1))[::-1, 0, :]
+            bounds = sample_bounds(d_data)
         ## Plot according to the users input. Default is slice view.
-        if self.plot_type.startswith('Z'): #  Slice':
-            d_data = self.data[z, ::-1, :]
-            print(d_data.shape)
-        if self.plot_type.startswith('Y'): #  Sinogram':
-            d_data = self.data[::-1,  z, :]
-            print(d_data.shape)
-        if self.plot_type.startswith('X'): #  Sinogram':
-            d_data = self.data[:, ::-1, z]
+        ## Y and X views come from cached transposed copies (see views.py).
+        elif self.plot_type[0] in 'ZYX':
+            d_data = self.views.get(self.data, self.plot_type, z, self.sino_order)
             print(d_data.shape)
+        ## Plot an mask if reconstruction is not gridrec.
+        if self.recon_type != 'gridrec' and d_data is not None and d_data.shape[0] == d_data.shape[1]:
+                d_data = tp.circ_mask(d_data[None], axis = 0, ratio = 0.95)[0]
         ## Setting up parameters and plotting.
         if d_data is not None:
             image_frame.panel.conf.interp = 'hanning'
-            image_frame.display(1.0*d_data, auto_contrast=True, colormap='gist_gray_r')
+            image_frame.display(self.display_window(d_data, bounds), auto_contrast=False, colormap='gist_gray_r')
             image_frame.Show()
             image_frame.Raise()
         else:
@@ -1203,24 +2468,32 @@ class APS_13BM(wx.Frame):
         Updates the image from to allow user to view movie.
         '''
         self.movie_index += 1
-        nframes = self.data.shape[0]
+        nframes = nangles(self.data, self.sino_order)
         if self.movie_index >= nframes-1:
             self.movie_timer.Stop()
             print("Stop timer")
             return
-        self.movie_iframe.panel.update_image(self.data[self.movie_index, ::-1, :])
+        lo, hi = self.movie_bounds
+        frame = self.views.get(self.data, 'Z', self.movie_index, self.sino_order)
+        self.movie_iframe.panel.update_image(scale_to_bounds(frame, lo, hi, np.uint8))
 
     def movie_maker (self, event):
         '''
         Currently this is super slow.
         '''
+        self.load_data()
         self.status_ID.SetLabel('Movie started.')
         self.stop_movie.Enable()
         self.movie_iframe = ImageFrame(self)
         d_data = self.data
         if d_data is not None:
             self.movie_iframe.panel.conf.interp = 'hanning'
-            self.movie_iframe.display(1.0*d_data[0,::-1,:], contrast_level=0.5, colormap='gist_gray_r')
+            ## Frames are quantized to 8 bit with the same window as the plots.
+            self.movie_bounds = self.stats.bounds(self.data)
+            lo, hi = self.movie_bounds
+            frame = self.views.get(d_data, 'Z', 0, self.sino_order)
+            self.movie_iframe.display(scale_to_bounds(frame, lo, hi, np.uint8),
+                                      auto_contrast=False, colormap='gist_gray_r')
             self.movie_iframe.Show()
             self.movie_iframe.Raise()
             self.movie_index = 0
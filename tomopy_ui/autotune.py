@@ -0,0 +1,238 @@
+'''
+Module for per-machine tuning of TomoPy core, chunk and pad settings in the TomoPy_GUI app.
+
+Settings are stored in a small JSON profile per host under ~/.tomopy_gui so
+the Computation Options are pre-filled on the next start.
+'''
+import os
+import json
+import time
+import socket
+import numpy as np
+import tomopy as tp
+from .layout import sino_slab, nrows, nangles
+from .padding import smooth_widths, pad_slab
+
+__author__ = 'Brandt M. Gibson'
+__credits__ = 'Matt Newville, Doga Gursoy'
+__all__ = ['load_profile',
+           'save_profile',
+           'candidate_cores',
+           'autotune',
+           'auto_pad']
+
+PROFILE_DIR = os.path.join(os.path.expanduser('~'), '.tomopy_gui')
+
+
+def profile_path(host=None):
+    '''
+    Location of the profile for this (or the given) host.
+    '''
+    if host is None:
+        host = socket.gethostname()
+    return os.path.join(PROFILE_DIR, 'profile_' + host + '.json')
+
+
+def load_profile(host=None):
+    '''
+    Returns the saved profile for this host, or an empty dict.
+    '''
+    try:
+        with open(profile_path(host), 'r') as fh:
+            return json.load(fh)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def save_profile(values, host=None):
+    '''
+    Merges values into the saved profile for this host.
+    '''
+    profile = load_profile(host)
+    profile.update(values)
+    if not os.path.isdir(PROFILE_DIR):
+        os.makedirs(PROFILE_DIR)
+    with open(profile_path(host), 'w') as fh:
+        json.dump(profile, fh, indent=2, sort_keys=True)
+    return profile
+
+
+def candidate_cores(max_cores=None):
+    '''
+    Powers of two up to the core count, plus the core count itself.
+    '''
+    if max_cores is None:
+        max_cores = os.cpu_count() or 1
+    cores = set([max_cores])
+    n = 1
+    while n < max_cores:
+        cores.add(n)
+        n *= 2
+    return sorted(cores)
+
+
+def _time(func, *args, **kwargs):
+    ## Median of repeat runs, so one noisy run cannot pick the winner.
+    repeat = kwargs.pop('repeat', 3)
+    times = []
+    for i in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        func(*args, **kwargs)
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times))
+
+
+def autotune(data, theta, flat=None, dark=None, sino_order=False, nproj=64, slab_rows=16,
+             cores=None, chunks=(8, 16, 32, 64, 128), repeat=3, callback=None):
+    '''
+    Times short normalization and gridrec runs on slabs of the loaded data
+    at several core and chunk settings and returns the fastest.
+
+    ncore is chosen on the summed time of tp.normalize (raw data only) and
+    gridrec. Slabs are at least as many rows and projections as the largest
+    core count, so every thread has work. nchunk is then chosen on
+    tp.normalize_bg at that ncore, the only step in this app that takes it.
+    It is timed on every projection but only the gridrec band of rows; the
+    chunks split projections, so the chunk count per thread is the same as
+    in the full run.
+
+    Parameters
+    -------
+    data : ndarray
+            Loaded data, raw or normalized.
+    theta : ndarray
+            Projection angles in radians.
+    flat, dark : ndarray, optional
+            Flat and dark fields. Normalization is only timed when both are
+            given and data are still raw.
+    sino_order : bool, optional
+            Layout of data (see layout.py).
+    nproj : int, optional
+            Projections used for normalization runs, raised to max(cores).
+    slab_rows : int, optional
+            Sinogram rows used for gridrec runs, rounded up to a multiple
+            of max(cores).
+    cores : list of int, optional
+            ncore values to try. Defaults to candidate_cores().
+    chunks : list of int, optional
+            nchunk values to try.
+    repeat : int, optional
+            Runs per setting; the median time is used.
+    callback : callable, optional
+            Called as callback(message) after each run.
+
+    Returns
+    -------
+    result : dict
+            'ncore', 'nchunk' and 'timings' (list of (stage, ncore, nchunk, seconds)).
+    '''
+    if cores is None:
+        cores = candidate_cores()
+    max_core = max(cores)
+    n_rows = nrows(data, sino_order)
+    slab_rows = min(n_rows, max_core * -(-slab_rows // max_core))
+    r0 = max(0, n_rows // 2 - slab_rows // 2)
+    sino = np.ascontiguousarray(sino_slab(data, r0, r0 + slab_rows, sino_order), dtype=np.float32)
+    center = data.shape[2] / 2.
+    raw = flat is not None and dark is not None and data.dtype != np.float32
+    if raw:
+        n_proj = min(max(nproj, max_core), nangles(data, sino_order))
+        if sino_order:
+            proj = np.ascontiguousarray(data[:, :n_proj, :].swapaxes(0, 1))
+        else:
+            proj = np.ascontiguousarray(data[:n_proj])
+    timings = []
+    ## Warm-up so the first setting does not pay for library start-up.
+    tp.recon(sino, theta, center=center, sinogram_order=sino_order, algorithm='gridrec', ncore=1)
+    best_core = None
+    best_time = None
+    for ncore in cores:
+        t = _time(tp.recon, sino, theta, center=center, sinogram_order=sino_order,
+                  algorithm='gridrec', ncore=ncore, repeat=repeat)
+        timings.append(('gridrec', ncore, None, t))
+        if raw:
+            t_norm = _time(tp.normalize, proj, flat, dark, ncore=ncore, repeat=repeat)
+            timings.append(('normalize', ncore, None, t_norm))
+            t += t_norm
+        if callback is not None:
+            callback('ncore '+str(ncore)+': '+str(round(t, 3))+' s')
+        if best_time is None or t < best_time:
+            best_core, best_time = ncore, t
+    ## normalize_bg works on projections.
+    norm_sino = np.ascontiguousarray(sino.swapaxes(0, 1) if sino_order else sino)
+    best_chunk = None
+    best_time = None
+    for nchunk in chunks:
+        t = _time(tp.normalize_bg, norm_sino, air=10, ncore=best_core, nchunk=nchunk,
+                  repeat=repeat)
+        timings.append(('normalize_bg', best_core, nchunk, t))
+        if callback is not None:
+            callback('nchunk '+str(nchunk)+': '+str(round(t, 3))+' s')
+        if best_time is None or t < best_time:
+            best_chunk, best_time = nchunk, t
+    return {'ncore': best_core, 'nchunk': best_chunk, 'timings': timings}
+
+
+def auto_pad(data, theta, sino_order=False, widths=None, slab_rows=8, ncore=None,
+             host=None, refresh=False, repeat=3, callback=None):
+    '''
+    Picks the fastest gridrec pad size for the width of data on this host.
+
+    Each candidate width (smooth_widths() by default) is timed on one
+    padded slab of sinograms, scored by the median of repeat runs. The winner and the timings are cached in the
+    host profile under the detector width, so later calls for the same
+    width return without running anything.
+
+    Parameters
+    -------
+    data : ndarray
+            Normalized data at native width.
+    theta : ndarray
+            Projection angles in radians.
+    sino_order : bool, optional
+            Layout of data (see layout.py).
+    widths : list of int, optional
+            Padded widths to try.
+    slab_rows : int, optional
+            Sinogram rows used for each run.
+    ncore : int, optional
+            Number of cores for tomopy.
+    host : str, optional
+            Profile to use. Defaults to this machine.
+    refresh : bool, optional
+            Ignore a cached result and benchmark again.
+    repeat : int, optional
+            Runs per width; the median time is used.
+    callback : callable, optional
+            Called as callback(message) after each run.
+
+    Returns
+    -------
+    pad_size : int
+    '''
+    ncols = data.shape[2]
+    key = str(ncols)
+    cache = load_profile(host).get('pad_size', {})
+    if key in cache and not refresh:
+        return cache[key]['pad_size']
+    if widths is None:
+        widths = smooth_widths(ncols)
+    n_rows = nrows(data, sino_order)
+    r0 = max(0, n_rows // 2 - slab_rows // 2)
+    sino = np.ascontiguousarray(sino_slab(data, r0, r0 + slab_rows, sino_order), dtype=np.float32)
+    center = ncols / 2.
+    ## Warm-up so the first width does not pay for library start-up.
+    tp.recon(sino, theta, center=center, sinogram_order=sino_order, algorithm='gridrec', ncore=ncore)
+    timings = {}
+    for width in widths:
+        npad = (width - ncols) // 2
+        slab = pad_slab(sino, npad)
+        timings[str(width)] = _time(tp.recon, slab, theta, center=center + npad,
+                                    sinogram_order=sino_order, algorithm='gridrec', ncore=ncore,
+                                    repeat=repeat)
+        if callback is not None:
+            callback('width '+str(width)+': '+str(round(timings[str(width)], 3))+' s')
+    best = int(min(timings, key=timings.get))
+    cache[key] = {'pad_size': best, 'timings': timings}
+    save_profile({'pad_size': cache}, host)
+    return best
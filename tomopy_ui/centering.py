@@ -0,0 +1,340 @@
+'''
+Module for finding rotation centers in the TomoPy_GUI app.
+'''
+import os
+import numpy as np
+import tomopy as tp
+from concurrent.futures import ThreadPoolExecutor
+from .layout import sinogram, projection, nrows
+from .fbp import engine
+
+__author__ = 'Brandt M. Gibson'
+__credits__ = 'Matt Newville, Doga Gursoy'
+__all__ = ['interpolate_centers',
+           'robust_line_fit',
+           'entropy_center',
+           'opposite_projection',
+           'pair_axis',
+           'find_axis',
+           'center_slices',
+           'multi_slice_centers']
+
+
+def interpolate_centers(upper_slice, upper_center, lower_slice, lower_center, n_rows):
+    '''
+    Per-row rotation centers on the line through two (slice, center) pairs.
+
+    Parameters
+    -------
+    upper_slice, lower_slice : float
+            Rows at which the centers were measured.
+    upper_center, lower_center : float
+            Measured centers.
+    n_rows : int
+            Number of sinogram rows in the data.
+
+    Returns
+    -------
+    center_array : ndarray
+            One center per row.
+    '''
+    rows = np.arange(n_rows, dtype=np.float64)
+    if lower_slice == upper_slice:
+        return np.full(n_rows, (upper_center + lower_center) / 2.)
+    slope = (lower_center - upper_center) / float(lower_slice - upper_slice)
+    return upper_center + (rows - upper_slice) * slope
+
+
+def robust_line_fit(rows, centers, threshold=3.0, min_spread=0.5):
+    '''
+    Fits center = intercept + slope * row while ignoring outliers.
+
+    A Theil-Sen estimate (median of pairwise slopes) gives a starting line.
+    Points further than threshold robust standard deviations (1.4826 * MAD,
+    but at least min_spread pixels) from it are rejected, and the remaining
+    points are refit by least squares.
+
+    Returns
+    -------
+    slope, intercept : float
+    inliers : ndarray of bool
+    '''
+    rows = np.asarray(rows, dtype=np.float64)
+    centers = np.asarray(centers, dtype=np.float64)
+    good = np.isfinite(centers)
+    if good.sum() < 2:
+        return 0., float(np.nanmedian(centers)), good
+    r = rows[good]
+    c = centers[good]
+    i, j = np.triu_indices(r.size, 1)
+    keep = r[j] != r[i]
+    slope = float(np.median((c[j] - c[i])[keep] / (r[j] - r[i])[keep]))
+    intercept = float(np.median(c - slope * r))
+    resid = centers - (intercept + slope * rows)
+    spread = max(1.4826 * np.median(np.abs(resid[good])), min_spread)
+    inliers = good & (np.abs(resid) <= threshold * spread)
+    if inliers.sum() >= 2:
+        slope, intercept = np.polyfit(rows[inliers], centers[inliers], 1)
+    return float(slope), float(intercept), inliers
+
+
+def _bin_columns(sino, factor):
+    ## Averages groups of factor columns; trailing columns are dropped.
+    n = sino.shape[1] // factor * factor
+    return sino[:, :n].reshape(sino.shape[0], -1, factor).mean(axis=2, dtype=np.float32)
+
+
+def _entropies(sino, theta, centers, bounds=None, group=16, ncore=None, algorithm='gridrec'):
+    ## Reconstructs the sinogram once per candidate center, as the slices of
+    ## one recon call so they run in parallel, and returns the histogram
+    ## entropy of each inside the reconstruction circle (tp.find_center's
+    ## cost). bounds fixes the histogram range so costs are comparable.
+    n = sino.shape[1]
+    y, x = np.ogrid[:n, :n]
+    mask = (x - (n - 1) / 2.)**2 + (y - (n - 1) / 2.)**2 <= (n / 2.)**2
+    reconstruct = engine(algorithm)
+    costs = []
+    for g0 in range(0, len(centers), group):
+        cand = np.asarray(centers[g0:g0+group], dtype=np.float32)
+        tomo = np.ascontiguousarray(np.broadcast_to(sino[:, None, :], (sino.shape[0], cand.size, n)))
+        rec = reconstruct(tomo, theta, center=cand, algorithm=algorithm, ncore=ncore)
+        for r in rec:
+            values = r[mask]
+            ## Percentiles rather than min and max, so a few noisy pixels do
+            ## not squeeze the sample into a handful of bins.
+            if bounds is None:
+                bounds = tuple(float(v) for v in np.percentile(values, (0.5, 99.5)))
+            hist, _ = np.histogram(np.clip(values, *bounds), bins=64, range=bounds)
+            p = hist.astype(np.float64) / values.size + 1e-12
+            costs.append(float(-np.dot(p, np.log2(p))))
+    return np.array(costs), bounds
+
+
+def entropy_center(sino, theta, init=None, search=None, tol=0.25, factor=4, angle_step=4,
+                   ncore=None, algorithm='gridrec'):
+    '''
+    Finds the rotation center of one sinogram by minimizing the entropy of
+    its reconstruction, coarse to fine.
+
+    A grid of centers covering the whole search range is scored on a
+    sinogram binned by factor in columns and using every angle_step-th
+    angle. The best coarse center is then refined at full resolution, one
+    pixel apart over the coarse step, and by halving steps down to tol.
+    Candidates at each stage are reconstructed together in one call.
+
+    Parameters
+    -------
+    sino : ndarray
+            2D sinogram (angle, column) of normalized data.
+    theta : ndarray
+            Projection angles in radians.
+    init : float, optional
+            Middle of the search range. Defaults to the middle of the detector.
+    search : float, optional
+            Half width of the search range. Defaults to a quarter of the width.
+    tol : float, optional
+            Final step in pixels.
+    factor, angle_step : int, optional
+            Column binning and angle decimation of the coarse stage.
+    ncore : int, optional
+            Threads for the reconstructions.
+
+    Returns
+    -------
+    center : float
+    '''
+    sino = np.asarray(sino, dtype=np.float32)
+    ncols = sino.shape[1]
+    if init is None:
+        init = ncols / 2.
+    if search is None:
+        search = ncols / 4.
+    theta = np.asarray(theta)
+    ## Coarse: every binned pixel over the whole range.
+    coarse = _bin_columns(sino[::angle_step], factor)
+    offset = (factor - 1) / 2.
+    lo = max(0., (init - search - offset) / factor)
+    hi = min(coarse.shape[1] - 1., (init + search - offset) / factor)
+    cand = np.arange(np.floor(lo), np.ceil(hi) + 1)
+    ## The first candidate sets the histogram range, so start nearest init.
+    cand = cand[np.argsort(np.abs(cand * factor + offset - init), kind='stable')]
+    costs, _ = _entropies(coarse, theta[::angle_step], cand, ncore=ncore, algorithm=algorithm)
+    best = cand[np.argmin(costs)] * factor + offset
+    ## Fine: full resolution around the coarse winner.
+    step = 1.
+    cand = best + np.array(sorted(range(-factor, factor + 1), key=abs)) * step
+    bounds = None
+    while True:
+        costs, bounds = _entropies(sino, theta, cand, bounds, ncore=ncore, algorithm=algorithm)
+        best = float(cand[np.argmin(costs)])
+        if step <= tol:
+            return best
+        step /= 2.
+        cand = best + np.array([0., -step, step])
+
+
+def opposite_projection(theta, index=0):
+    '''
+    Index of the projection closest to 180 degrees from projection index.
+    '''
+    theta = np.asarray(theta, dtype=np.float64)
+    diff = np.angle(np.exp(1j * (theta - theta[index] - np.pi)))
+    return int(np.argmin(np.abs(diff)))
+
+
+def pair_axis(proj0, proj180, band=16, min_peak=5.0):
+    '''
+    Rotation center of every band of detector rows, and the tilt of the
+    axis, from a projection and the one taken 180 degrees later.
+
+    The second projection is mirrored left-right, which turns it into the
+    first shifted by twice the distance of the axis from the detector
+    middle. All bands are phase correlated at once: the cross-power spectra
+    of the rows in a band are summed, normalized, and transformed back in
+    one batched FFT, and each peak is refined to sub-pixel by a parabola.
+    A robust line through the band centers gives the center offset and the
+    tilt together.
+
+    Parameters
+    -------
+    proj0, proj180 : ndarray
+            2D projections (row, column), normalized.
+    band : int, optional
+            Detector rows per band.
+    min_peak : float, optional
+            Bands whose correlation peak is less than this many standard
+            deviations above the mean (air, blank rows) are left out.
+
+    Returns
+    -------
+    rows, centers : ndarray
+            Middle row of each band and the center found on it (NaN for
+            bands left out).
+    slope, intercept : float
+            Fitted line, center = intercept + slope * row.
+    inliers : ndarray of bool
+            Bands kept by the fit.
+    tilt : float
+            Tilt of the rotation axis in degrees, with the same sign
+            convention as multi_slice_centers.
+    '''
+    proj0 = np.asarray(proj0, dtype=np.float32)
+    flipped = np.asarray(proj180, dtype=np.float32)[:, ::-1]
+    n_rows, ncols = proj0.shape
+    band = max(1, min(int(band), n_rows // 2))
+    nbands = n_rows // band
+    used = nbands * band
+    ## Zero padding to twice the width keeps shifts up to a detector width
+    ## from wrapping round; the taper stops the detector edges correlating.
+    width = 2 * ncols
+    window = np.hanning(ncols).astype(np.float32)
+    def spectrum(p):
+        p = p[:used] - p[:used].mean(axis=1, keepdims=True)
+        return np.fft.rfft(p * window, n=width, axis=1)
+    cross = (spectrum(proj0) * np.conj(spectrum(flipped))).reshape(nbands, band, -1).sum(axis=1)
+    cross /= np.abs(cross) + 1e-12
+    corr = np.fft.irfft(cross, n=width, axis=1)
+    peak = np.argmax(corr, axis=1)
+    i = np.arange(nbands)
+    c0 = corr[i, peak]
+    cm = corr[i, (peak - 1) % width]
+    cp = corr[i, (peak + 1) % width]
+    denom = cm - 2 * c0 + cp
+    delta = np.where(denom < 0, 0.5 * (cm - cp) / np.where(denom < 0, denom, 1.), 0.)
+    shift = peak + delta
+    shift = np.where(shift > width / 2., shift - width, shift)
+    ## flipped(x) = proj0(x + shift), so the axis sits at (ncols - 1 + shift) / 2.
+    centers = (ncols - 1 + shift) / 2.
+    strength = (c0 - corr.mean(axis=1)) / (corr.std(axis=1) + 1e-12)
+    centers[strength < min_peak] = np.nan
+    rows = np.arange(nbands) * band + (band - 1) / 2.
+    slope, intercept, inliers = robust_line_fit(rows, centers)
+    tilt = -np.degrees(np.arctan(slope))
+    return rows, centers, slope, intercept, inliers, tilt
+
+
+def find_axis(data, theta, sino_order=False, index=0, band=16):
+    '''
+    pair_axis() on projection index of the data and the projection closest
+    to 180 degrees from it.
+    '''
+    other = opposite_projection(theta, index)
+    return pair_axis(projection(data, index, sino_order),
+                     projection(data, other, sino_order),
+                     band = band)
+
+
+def center_slices(n_rows, nslices):
+    '''
+    Evenly spaced rows used by multi_slice_centers(), a few rows in from
+    the edges, where the detector is often dim.
+    '''
+    margin = min(n_rows // 20, 16)
+    return np.unique(np.linspace(margin, n_rows - 1 - margin, max(2, int(nslices))).astype(int))
+
+
+def multi_slice_centers(data, theta, nslices, sino_order=False, method='Nghia Vo',
+                        init=None, tol=0.5, ncore=None, rows=None):
+    '''
+    Finds the rotation center on evenly spaced slices in parallel and fits a
+    robust line through them.
+
+    Parameters
+    -------
+    data : ndarray
+            Normalized data in projection or sinogram order.
+    theta : ndarray
+            Projection angles in radians.
+    nslices : int
+            Number of slices to center.
+    sino_order : bool, optional
+            Layout of data (see layout.py).
+    method : str, optional
+            'Nghia Vo' or 'Entropy'.
+    init : float, optional
+            Starting guess for Entropy. Defaults to the middle of the detector.
+    tol : float, optional
+            Tolerance for Entropy.
+    ncore : int, optional
+            Total threads: slices centered at once, times the threads each
+            slice's search runs with.
+    rows : ndarray, optional
+            Detector row of each sinogram in data, when data hold only the
+            center_slices() rows (e.g. read from file one by one). nslices is
+            then ignored.
+
+    Returns
+    -------
+    rows, centers : ndarray
+            Slices used and the center found on each.
+    slope, intercept : float
+            Fitted line, center = intercept + slope * row.
+    inliers : ndarray of bool
+            Slices kept by the fit.
+    tilt : float
+            Tilt of the rotation axis in degrees implied by the slope, with
+            the same sign convention as tilt correction.
+    '''
+    if rows is None:
+        rows = center_slices(nrows(data, sino_order), nslices)
+        index = rows
+    else:
+        rows = np.asarray(rows)
+        index = np.arange(rows.size)
+    if init is None:
+        init = data.shape[2] / 2.
+    if ncore is None:
+        ncore = os.cpu_count() or 1
+    workers = max(1, min(int(ncore), rows.size))
+    ## Threads left over when there are fewer slices than ncore go to each slice.
+    per_slice = max(1, int(ncore) // workers)
+    def work(i):
+        sino = sinogram(data, i, sino_order)[:, None, :]
+        if method == 'Entropy':
+            return entropy_center(sino[:, 0, :], theta, init=init, tol=tol, ncore=per_slice)
+        return float(tp.find_center_vo(sino, ncore=per_slice))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        centers = np.array(list(pool.map(work, index)))
+    slope, intercept, inliers = robust_line_fit(rows, centers)
+    tilt = -np.degrees(np.arctan(slope))
+    return rows, centers, slope, intercept, inliers, tilt
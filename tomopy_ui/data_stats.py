@@ -0,0 +1,324 @@
+'''
+Module for tracking intensity statistics of the working volume in the TomoPy_GUI app.
+'''
+import numpy as np
+
+__author__ = 'Brandt M. Gibson'
+__credits__ = 'Matt Newville, Doga Gursoy'
+__all__ = ['VolumeStats', 'sample_bounds', 'scale_to_bounds', 'otsu_threshold', 'sample_bbox']
+
+## Default percentiles used for display windowing and integer export.
+## Clipping the outer 0.1% keeps single hot pixels from setting the range.
+LOWER_PERCENTILE = 0.1
+UPPER_PERCENTILE = 99.9
+
+
+def _sample_step(data, max_samples):
+    ## Same stride on every axis so about max_samples voxels are read.
+    if data.size <= max_samples:
+        return 1
+    return int(np.ceil((data.size / float(max_samples)) ** (1. / data.ndim)))
+
+
+def sample_bounds(data, lower=LOWER_PERCENTILE, upper=UPPER_PERCENTILE, max_samples=2**20):
+    '''
+    Estimates percentile bounds from a strided sample of the data.
+
+    The same stride is used along every axis, chosen so that roughly
+    max_samples voxels are read. This is a small fraction of a full pass
+    and is accurate enough for windowing and scaling.
+
+    Parameters
+    -------
+    data : ndarray
+            Array to sample. Works with memory-mapped arrays.
+    lower, upper : float, optional
+            Percentiles (0-100) of the returned bounds.
+    max_samples : int, optional
+            Approximate number of voxels to read.
+
+    Returns
+    -------
+    lo, hi : float
+    '''
+    step = _sample_step(data, max_samples)
+    sample = np.asarray(data[(slice(None, None, step),) * data.ndim], dtype=np.float32)
+    sample = sample[np.isfinite(sample)]
+    if sample.size == 0:
+        return 0., 1.
+    lo, hi = np.percentile(sample, [lower, upper])
+    if hi <= lo:
+        hi = lo + 1.
+    return float(lo), float(hi)
+
+
+def scale_to_bounds(data, lo, hi, dtype=np.float32):
+    '''
+    Clips data to [lo, hi] and rescales. Integer dtypes are stretched over
+    their full range (e.g. 0-255 for uint8); float dtypes are left in data
+    units so the image keeps its values but loses the outliers.
+
+    Parameters
+    -------
+    data : ndarray
+            Array to scale. Not modified.
+    lo, hi : float
+            Window bounds, usually from sample_bounds().
+    dtype : numpy dtype, optional
+            Output type.
+
+    Returns
+    -------
+    ndarray of dtype
+    '''
+    dtype = np.dtype(dtype)
+    out = np.array(data, dtype=np.float32)
+    np.clip(out, lo, hi, out=out)
+    if dtype.kind == 'f':
+        return out.astype(dtype, copy=False)
+    span = float(hi - lo) if hi > lo else 1.
+    out -= lo
+    out *= np.iinfo(dtype).max / span
+    np.rint(out, out=out)
+    return out.astype(dtype)
+
+
+def otsu_threshold(values, nbins=256):
+    '''
+    Otsu threshold of a set of values: the level that maximizes the
+    between-class variance of the two classes it separates.
+    '''
+    values = values[np.isfinite(values)]
+    if values.size == 0:
+        return 0.
+    counts, edges = np.histogram(values, bins=nbins)
+    centers = (edges[:-1] + edges[1:]) / 2.
+    w0 = np.cumsum(counts).astype(np.float64)
+    w1 = w0[-1] - w0
+    m0 = np.cumsum(counts * centers) / np.maximum(w0, 1)
+    m1 = (np.sum(counts * centers) - np.cumsum(counts * centers)) / np.maximum(w1, 1)
+    between = w0 * w1 * (m0 - m1) ** 2
+    return float(edges[np.argmax(between) + 1])
+
+
+def sample_bbox(data, margin=16, max_samples=2**22, threshold=None, min_fraction=1e-3):
+    '''
+    Bounding box of the sample in a reconstructed volume.
+
+    A strided sample of the volume is thresholded (Otsu by default) and the
+    box is the range of every axis that holds more than min_fraction of the
+    voxels above threshold, so isolated noise voxels in the air do not
+    widen it. The box is grown by margin voxels and clipped to the volume.
+
+    Parameters
+    -------
+    data : ndarray
+            Volume (z, y, x). Works with memory-mapped arrays.
+    margin : int, optional
+            Voxels added on every side.
+    max_samples : int, optional
+            Approximate number of voxels read.
+    threshold : float, optional
+            Intensity separating sample from air. Defaults to Otsu.
+    min_fraction : float, optional
+            Fraction of the sample voxels a plane must hold to count.
+
+    Returns
+    -------
+    box : tuple of (start, end)
+            One pair per axis, usable as data[z0:z1, y0:y1, x0:x1].
+    '''
+    step = _sample_step(data, max_samples)
+    sample = np.asarray(data[(slice(None, None, step),) * data.ndim], dtype=np.float32)
+    if threshold is None:
+        threshold = otsu_threshold(sample.ravel())
+    mask = sample > threshold
+    total = mask.sum()
+    if total == 0:
+        return tuple((0, n) for n in data.shape)
+    box = []
+    for axis, n in enumerate(data.shape):
+        other = tuple(i for i in range(data.ndim) if i != axis)
+        profile = mask.sum(axis=other)
+        idx = np.nonzero(profile > min_fraction * total)[0]
+        if idx.size == 0:
+            idx = np.nonzero(profile)[0]
+        start = max(0, int(idx[0]) * step - margin)
+        end = min(n, (int(idx[-1]) + 1) * step + margin)
+        box.append((start, end))
+    return tuple(box)
+
+
+class VolumeStats(object):
+    '''
+    Caches min, max, mean and histogram of the working volume.
+
+    Statistics are computed in a single blocked pass over the data and are
+    kept until the data change. Every method that replaces or modifies the
+    working array must call invalidate() so the next request recomputes.
+    Stages that already know the values (e.g. a fused conversion loop) can
+    hand them over with record() and skip the pass for min, max and mean.
+
+    Parameters
+    -------
+    nbins : int, optional
+            Number of histogram bins. Percentile bounds are interpolated
+            within a bin, so this sets their resolution.
+    block_bytes : int, optional
+            Approximate size of the block read per step of the fused pass.
+            Small enough to stay in cache while every statistic is taken.
+    '''
+    def __init__(self, nbins=4096, block_bytes=2**20):
+        self.nbins = nbins
+        self.block_bytes = block_bytes
+        self.generation = 0
+        self._key = None
+        self._cache = {}
+
+    def invalidate(self):
+        '''
+        Marks the cached values as stale. Called whenever the data change.
+        '''
+        self.generation += 1
+        self._key = None
+        self._cache = {}
+
+    def _check(self, data):
+        ## Identity of the array plus the generation counter. Shape and dtype
+        ## are included so a forgotten invalidate() after a reshape or
+        ## conversion still triggers a recompute.
+        key = (id(data), data.shape, data.dtype.str, self.generation)
+        if key != self._key:
+            self._key = key
+            self._cache = {}
+
+    def _blocks(self, data):
+        ## Yields blocks of about block_bytes: whole planes along axis 0, or
+        ## runs of rows when one plane is larger than that.
+        nbytes = max(1, int(np.prod(data.shape[1:])) * data.dtype.itemsize)
+        if nbytes <= self.block_bytes or data.ndim < 3:
+            step = max(1, int(self.block_bytes // nbytes))
+            for i in range(0, data.shape[0], step):
+                yield data[i:i+step]
+            return
+        row_bytes = max(1, int(np.prod(data.shape[2:])) * data.dtype.itemsize)
+        step = max(1, int(self.block_bytes // row_bytes))
+        for i in range(data.shape[0]):
+            for j in range(0, data.shape[1], step):
+                yield data[i, j:j+step]
+
+    def record(self, data, data_min, data_max, data_mean=None):
+        '''
+        Stores statistics that a processing stage computed on the fly.
+        '''
+        self._check(data)
+        self._cache['min'] = data_min
+        self._cache['max'] = data_max
+        if data_mean is not None:
+            self._cache['mean'] = data_mean
+
+    def _pass(self, data):
+        ## The fused pass. Each block is read from memory once and min, max,
+        ## sum and histogram counts are taken while it is in cache. The
+        ## histogram range comes from a strided sample, leaving out its
+        ## extremes so a few hot pixels do not coarsen the bins. Bins are
+        ## counted with bincount on clipped bin indices, whose first and
+        ## last entries hold the values below and above the range.
+        lo, hi = sample_bounds(data, 0.01, 99.99)
+        if hi <= lo:
+            hi = lo + 1.
+        nbins = self.nbins
+        scale = np.float32(nbins / (hi - lo))
+        counts = np.zeros(nbins + 2, dtype=np.int64)
+        data_min = None
+        data_max = None
+        total = 0.
+        for block in self._blocks(data):
+            b_min = block.min()
+            b_max = block.max()
+            total += float(block.sum(dtype=np.float64))
+            data_min = b_min if data_min is None else min(data_min, b_min)
+            data_max = b_max if data_max is None else max(data_max, b_max)
+            index = np.subtract(block.ravel(), lo, dtype=np.float32)
+            index *= scale
+            np.clip(index, -1, nbins, out=index)
+            if np.isnan(b_min) or np.isnan(b_max):
+                index = index[~np.isnan(index)]
+            counts += np.bincount(index.astype(np.intp) + 1, minlength=nbins + 2)
+        self._cache['min'] = data_min
+        self._cache['max'] = data_max
+        self._cache['mean'] = total / max(1, data.size)
+        self._cache['hist'] = (counts[1:-1], np.linspace(lo, hi, nbins + 1), counts[0], counts[-1])
+
+    def compute(self, data):
+        '''
+        Fused pass over the data (min, max, mean and histogram). The volume
+        is read in cache-sized blocks and each block is visited once, so it
+        is only streamed from memory once.
+
+        Returns
+        -------
+        data_min, data_max, data_mean
+        '''
+        self._check(data)
+        if not all(k in self._cache for k in ('min', 'max', 'mean')):
+            self._pass(data)
+        return self._cache['min'], self._cache['max'], self._cache['mean']
+
+    def min(self, data):
+        self._check(data)
+        if 'min' not in self._cache:
+            self.compute(data)
+        return self._cache['min']
+
+    def max(self, data):
+        self._check(data)
+        if 'max' not in self._cache:
+            self.compute(data)
+        return self._cache['max']
+
+    def mean(self, data):
+        self._check(data)
+        if 'mean' not in self._cache:
+            self.compute(data)
+        return self._cache['mean']
+
+    def histogram(self, data):
+        '''
+        Histogram from the fused pass, which is run if it has not been.
+
+        Returns
+        -------
+        counts, edges : ndarray
+                self.nbins counts over the sampled range. Values outside
+                it are not in counts.
+        '''
+        self._check(data)
+        if 'hist' not in self._cache:
+            self._pass(data)
+        counts, edges, _, _ = self._cache['hist']
+        return counts, edges
+
+    def bounds(self, data, lower=LOWER_PERCENTILE, upper=UPPER_PERCENTILE):
+        '''
+        Percentile bounds of the data from the histogram, cached like the
+        other values. Display windowing, the movie and u1/u2 export all use
+        these so that they agree with each other.
+
+        Returns
+        -------
+        lo, hi : float
+        '''
+        self._check(data)
+        key = ('bounds', lower, upper)
+        if key not in self._cache:
+            self.histogram(data)
+            counts, edges, below, above = self._cache['hist']
+            ## Cumulative counts at each bin edge, starting below the range.
+            cum = below + np.concatenate(([0], np.cumsum(counts)))
+            n = cum[-1] + above
+            lo, hi = (float(np.interp(q / 100. * n, cum, edges)) for q in (lower, upper))
+            if hi <= lo:
+                hi = lo + 1.
+            self._cache[key] = (lo, hi)
+        return self._cache[key]
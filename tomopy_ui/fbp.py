@@ -0,0 +1,218 @@
+'''
+Module for the built-in filtered back-projection engine of the TomoPy_GUI app.
+
+A NumPy implementation of parallel beam FBP with the same call signature
+as tp.recon, selected with algorithm='numpy_fbp'. It does not depend on how
+the installed tomopy was built, and gives a reference to benchmark tomopy
+against. Filter spectra are cached per FFT width and sin/cos tables per set
+of angles, so repeated calls (slabs, slices, centering) only filter and
+back-project. Back-projection works on a batch of slices at once and
+splits the output rows over a thread pool.
+'''
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+try:
+    from scipy import fft as _fft
+except ImportError:
+    _fft = None
+## scipy < 1.4 has scipy.fft as a function, not a module.
+if _fft is None or not hasattr(_fft, 'rfft'):
+    _fft = np.fft
+
+__author__ = 'Brandt M. Gibson'
+__credits__ = 'Matt Newville, Doga Gursoy'
+__all__ = ['ALGORITHM', 'FILTERS', 'filter_spectrum', 'angle_tables', 'recon', 'engine']
+
+## Name used for this engine in the algorithm menu and recon kwargs.
+ALGORITHM = 'numpy_fbp'
+FILTERS = ('none', 'ramlak', 'shepp', 'cosine', 'hann', 'hamming', 'parzen', 'butterworth')
+
+## Cached filter spectra keyed by (name, width) and sin/cos tables keyed
+## by the bytes of theta.
+_FILTERS = {}
+_TABLES = {}
+
+
+def filter_spectrum(name, width):
+    '''
+    Real FFT spectrum (width//2 + 1 values) of the ramp filter times the
+    named window. The ramp comes from the band-limited spatial kernel, so
+    the zero frequency term is right for a finite detector.
+
+    Returns
+    -------
+    spectrum : ndarray
+            float32, cached; do not modify.
+    '''
+    if name not in FILTERS:
+        raise ValueError('Unknown filter '+str(name)+'. Filters are '+str(FILTERS))
+    key = (name, int(width))
+    spectrum = _FILTERS.get(key)
+    if spectrum is None:
+        ## Circular distance from sample 0; the kernel is nonzero at odd ones.
+        d = np.minimum(np.arange(width), width - np.arange(width))
+        kernel = np.zeros(width)
+        kernel[0] = 0.25
+        odd = d % 2 == 1
+        kernel[odd] = -1. / (np.pi * d[odd])**2
+        ramp = 2 * np.real(np.fft.rfft(kernel))
+        ## Frequency in cycles per pixel, 0 to 0.5.
+        f = np.fft.rfftfreq(width)
+        if name == 'shepp':
+            window = np.sinc(f)
+        elif name == 'cosine':
+            window = np.cos(np.pi * f)
+        elif name == 'hann':
+            window = 0.5 + 0.5 * np.cos(2 * np.pi * f)
+        elif name == 'hamming':
+            window = 0.54 + 0.46 * np.cos(2 * np.pi * f)
+        elif name == 'parzen':
+            q = f / 0.5
+            window = np.where(q <= 0.5, 1 - 6 * q**2 + 6 * q**3, 2 * (1 - q)**3)
+        elif name == 'butterworth':
+            ## Second order, cut off at half the Nyquist frequency.
+            window = 1. / (1. + (f / 0.25)**4)
+        else:
+            window = 1.
+        spectrum = (ramp * window).astype(np.float32)
+        spectrum.flags.writeable = False
+        _FILTERS[key] = spectrum
+    return spectrum
+
+
+def _fft_width(n):
+    ## Fast real FFT size of at least n.
+    if hasattr(_fft, 'next_fast_len'):
+        return _fft.next_fast_len(int(n), real=True)
+    return 2**int(np.ceil(np.log2(n)))
+
+
+def angle_tables(theta):
+    '''
+    cos and sin of every projection angle as float32, cached per theta.
+    '''
+    theta = np.asarray(theta, dtype=np.float32)
+    key = theta.tobytes()
+    tables = _TABLES.get(key)
+    if tables is None:
+        tables = (np.cos(theta), np.sin(theta))
+        _TABLES[key] = tables
+    return tables
+
+
+def _backproject(q, cos_t, sin_t, origin, out, xs, ys, rows, ncore):
+    ## q: (slices, angles, samples) filtered and centered sinograms, with
+    ## the rotation axis at sample `origin`. Adds every angle into out
+    ## (slices, len(ys), len(xs)), the pixels at coordinates xs, ys from
+    ## the middle of the grid, one band of output rows per task.
+    n = out.shape[1]
+    def work(y0):
+        y1 = min(n, y0 + rows)
+        y = ys[y0:y1, None]
+        band = out[:, y0:y1]
+        for a in range(q.shape[1]):
+            t = origin + xs[None, :] * cos_t[a] - y * sin_t[a]
+            idx = t.astype(np.intp)
+            w = (t - idx).astype(np.float32)
+            qa = q[:, a]
+            lo = qa[:, idx]
+            band += lo
+            band += (qa[:, idx + 1] - lo) * w
+    with ThreadPoolExecutor(max_workers=max(1, int(ncore))) as pool:
+        list(pool.map(work, range(0, n, rows)))
+
+
+def recon(tomo, theta, center=None, sinogram_order=False, algorithm=ALGORITHM,
+          filter_name='shepp', ncore=None, batch=8, window=None, **kwargs):
+    '''
+    Filtered back-projection with the tp.recon call signature.
+
+    Parameters
+    -------
+    tomo : ndarray
+            Normalized data, (angle, row, column) or (row, angle, column).
+    theta : ndarray
+            Projection angles in radians.
+    center : float or ndarray, optional
+            Rotation center(s) in column coordinates. Defaults to the
+            middle of the detector.
+    sinogram_order : bool, optional
+            Layout of tomo.
+    filter_name : str, optional
+            One of FILTERS.
+    ncore : int, optional
+            Threads. Defaults to all cores.
+    batch : int, optional
+            Slices back-projected together.
+    window : tuple, optional
+            (y0, y1, x0, x1) part of the (column, column) slice grid to
+            reconstruct. Only those pixels are back-projected.
+    kwargs
+            Other tp.recon options (nchunk, ...) are accepted and ignored.
+
+    Returns
+    -------
+    rec : ndarray
+            float32 (row, column, column) slices, or (row, y1-y0, x1-x0)
+            with a window.
+    '''
+    if sinogram_order:
+        n_rows, n_ang, ncols = tomo.shape
+    else:
+        n_ang, n_rows, ncols = tomo.shape
+    if center is None:
+        center = ncols / 2.
+    centers = np.broadcast_to(np.asarray(center, dtype=np.float32), (n_rows,))
+    if ncore is None:
+        ncore = os.cpu_count() or 1
+    if filter_name is None:
+        filter_name = 'none'
+    cos_t, sin_t = angle_tables(theta)
+    y0, y1, x0, x1 = window if window is not None else (0, ncols, 0, ncols)
+    grid = np.arange(ncols, dtype=np.float32) + 0.5 - ncols / 2.
+    xs = grid[x0:x1]
+    ys = grid[y0:y1]
+    out = np.zeros((n_rows, ys.size, xs.size), dtype=np.float32)
+    ## Enough margin that every ray through the square grid lands inside
+    ## the filtered row, however far the center is from the middle.
+    spread = int(np.ceil(ncols / np.sqrt(2) + np.abs(centers - ncols / 2.).max())) + 2
+    width = _fft_width(ncols + 2 * spread)
+    spectrum = filter_spectrum(filter_name, width)
+    k = np.fft.rfftfreq(width).astype(np.float32)
+    ## Output rows per task keep a batch's working arrays around 4M values.
+    rows = max(1, min(ys.size, 2**22 // max(1, batch * xs.size)))
+    for r0 in range(0, n_rows, batch):
+        r1 = min(n_rows, r0 + batch)
+        if sinogram_order:
+            sino = tomo[r0:r1]
+        else:
+            sino = tomo[:, r0:r1].transpose(1, 0, 2)
+        padded = np.zeros((r1 - r0, n_ang, width), dtype=np.float32)
+        padded[:, :, :ncols] = sino
+        spec = _fft.rfft(padded, axis=2)
+        spec *= spectrum
+        ## Slices in the batch are shifted in the same FFT to share the
+        ## first slice's center, so they share the geometry. A Fourier
+        ## shift is exact for band-limited detector data.
+        shift = centers[r0:r1] - centers[r0]
+        if np.any(shift):
+            spec *= np.exp(2j * np.pi * k[None, :] * shift[:, None]).astype(np.complex64)[:, None, :]
+        filtered = _fft.irfft(spec, n=width, axis=2)
+        ## Samples -spread .. ncols+spread, wrapping round the padded row.
+        q = np.ascontiguousarray(filtered[:, :, np.arange(-spread, ncols + spread + 1) % width],
+                                 dtype=np.float32)
+        _backproject(q, cos_t, sin_t, centers[r0] + spread, out[r0:r1], xs, ys, rows, ncore)
+    out *= np.pi / (2 * n_ang)
+    return out
+
+
+def engine(algorithm):
+    '''
+    Function to reconstruct with: recon from this module for
+    algorithm='numpy_fbp', otherwise tp.recon.
+    '''
+    if algorithm == ALGORITHM:
+        return recon
+    import tomopy as tp
+    return tp.recon
@@ -1,121 +1,367 @@
 '''
-Module for saving data in the TomoPy_GUI app
+Module for importing data in the TomoPy_GUI app.
+
+Readers are registered by file extension and beamline. Each returns a lazy
+dataset: shape, dtype and theta are known as soon as the file is opened, and
+pixel data are only read for the projection or sinogram slabs requested.
 '''
+import os
+import glob
 import numpy as np
-import time
-import skimage
 import dxchange as dx
+import tomopy as tp
 from netCDF4 import Dataset
-import skimage
+from .volume_io import open_volume
 
 __author__ = 'Brandt M. Gibson'
 __credits__ = 'Matt Newville, Doga Gursoy'
-__all__ = ['import_data']
+__all__ = ['import_data',
+           'open_data',
+           'register_reader',
+           'READERS',
+           'BEAMLINES',
+           'LazyDataset']
+
+## Registered readers, keyed by (extension, beamline). A beamline of None
+## is the fallback for that extension.
+READERS = {}
+BEAMLINES = ['APS 13-BM', 'APS 2-BM or 32-ID', 'ALS 8.3.2']
+
+
+def register_reader(ext, beamline=None):
+    '''
+    Class decorator adding a LazyDataset subclass to the registry.
+    '''
+    def wrap(cls):
+        READERS[(ext, beamline)] = cls
+        return cls
+    return wrap
+
+
+def _slc(rng):
+    ## (start, end) tuple or None to a slice.
+    if rng is None:
+        return slice(None)
+    return slice(*rng)
+
+
+class LazyDataset(object):
+    '''
+    Base class for registered readers.
+
+    Subclasses set fname, name, shape, dtype and theta in __init__ without
+    reading pixel data, and implement read(). Flat and dark fields are read
+    the first time they are asked for.
+
+    Attributes
+    -------
+    fname : str
+            File that was opened.
+    name : str
+            Name used for exports.
+    shape : tuple
+            (angle, row, column).
+    dtype : numpy dtype
+            Type of the arrays returned by read().
+    theta : ndarray
+            Projection angles in radians.
+    '''
+    fname = None
+    name = None
+    shape = None
+    dtype = np.dtype(np.uint16)
+    theta = None
+
+    def read(self, proj=None, sino=None):
+        '''
+        Reads a slab of the data.
+
+        Parameters
+        -------
+        proj : tuple, optional
+                (start, end) of projections to read.
+        sino : tuple, optional
+                (start, end) of sinogram rows to read.
+
+        Returns
+        -------
+        ndarray (angle, row, column)
+        '''
+        raise NotImplementedError
+
+    def _read_flat_dark(self):
+        return None, None
+
+    @property
+    def flat(self):
+        if not hasattr(self, '_flat'):
+            self._flat, self._dark = self._read_flat_dark()
+        return self._flat
+
+    @property
+    def dark(self):
+        if not hasattr(self, '_dark'):
+            self._flat, self._dark = self._read_flat_dark()
+        return self._dark
+
+    def load(self, step=16, callback=None):
+        '''
+        Reads the whole dataset slab by slab, picking up min and max while
+        each slab is in cache.
+
+        Returns
+        -------
+        data : ndarray
+        data_min, data_max
+        '''
+        data = np.empty(self.shape, dtype=self.dtype)
+        data_min = None
+        data_max = None
+        for i in range(0, self.shape[0], step):
+            slab = data[i:i+step]
+            slab[:] = self.read(proj=(i, min(i+step, self.shape[0])))
+            s_min = slab.min()
+            s_max = slab.max()
+            data_min = s_min if data_min is None else min(data_min, s_min)
+            data_max = s_max if data_max is None else max(data_max, s_max)
+            if callback is not None:
+                callback(min(i+step, self.shape[0]), self.shape[0])
+        return data, data_min, data_max
+
+    def close(self):
+        pass
+
 
-def import_data(fname, path):
+@register_reader('.nc', 'APS 13-BM')
+@register_reader('.nc')
+class APS13BMDataset(LazyDataset):
+    '''
+    APS 13-BM netCDF scans: flats in *1.nc and *3.nc, projections in *2.nc,
+    dark current in the .setup file. File discovery follows dxchange.
+    '''
+    def __init__(self, fname):
+        self.fname = fname
+        self.name = fname[0:-5]
+        self._files = sorted(glob.glob(fname[0:-5] + '*[1-3].nc'))
+        ## Will break if missing a flat or setup file.
+        if len(self._files) < 3:
+            raise IOError('Expected flat and data .nc files next to ' + fname)
+        self._nc = Dataset(self._files[1], 'r')
+        self._var = self._images(self._nc)
+        self.shape = tuple(self._var.shape)
+        self.theta = np.linspace(0.0, np.pi, self.shape[0])
+
+    @staticmethod
+    def _images(nc):
+        ## The 3D image variable of a scan file.
+        return [v for v in nc.variables.values() if len(v.shape) == 3][0]
+
+    def read(self, proj=None, sino=None):
+        ## Data are unsigned 16 bit integers. Wrapped negative values from
+        ## signed storage come back correct from the cast.
+        return np.asarray(self._var[_slc(proj), _slc(sino), :]).astype(np.uint16)
+
+    def _read_flat_dark(self):
+        ## Every frame of both flat files, and the dark current from the
+        ## .setup file, as dxchange.exchange.read_aps_13bm reads them. The
+        ## projections are not read.
+        flats = []
+        for path in (self._files[0], self._files[2]):
+            with Dataset(path, 'r') as nc:
+                flats.append(np.asarray(self._images(nc)[:]))
+        flat = np.concatenate(flats, axis=0).astype(np.uint16)
+        setup = glob.glob(self.fname[0:-5] + '*.setup')
+        if not setup:
+            raise IOError('Expected a .setup file next to ' + self.fname)
+        values = {}
+        with open(setup[0], 'r') as fh:
+            for line in fh:
+                words = line.rstrip('\n').split(':', 1)
+                if len(words) == 2:
+                    values[words[0].lower()] = words[1]
+        dark = flat * 0 + float(values['dark_current'])
+        return flat, dark
+
+    def close(self):
+        self._nc.close()
+
+
+@register_reader('.h5', 'APS 2-BM or 32-ID')
+class APS32IDDataset(LazyDataset):
+    '''
+    APS 2-BM / 32-ID Data Exchange HDF5 files.
     '''
+    def __init__(self, fname):
+        import h5py
+        self.fname = fname
+        self.name = os.path.splitext(fname)[0]
+        ## Kept open so each slab is a single hyperslab read.
+        self._h5 = h5py.File(fname, 'r')
+        self._data = self._h5['/exchange/data']
+        self.shape = tuple(self._data.shape)
+        self.dtype = np.dtype(self._data.dtype)
+        if '/exchange/theta' in self._h5:
+            self.theta = np.radians(np.asarray(self._h5['/exchange/theta'], dtype=np.float32))
+        if self.theta is None:
+            self.theta = tp.angles(self.shape[0])
 
+    def read(self, proj=None, sino=None):
+        return self._data[_slc(proj), _slc(sino), :]
+
+    def _read_flat_dark(self):
+        ## Read once, on first use; the flat and dark properties keep them.
+        flat = dark = None
+        if '/exchange/data_white' in self._h5:
+            flat = np.asarray(self._h5['/exchange/data_white'])
+        if '/exchange/data_dark' in self._h5:
+            dark = np.asarray(self._h5['/exchange/data_dark'])
+        return flat, dark
+
+    def close(self):
+        self._h5.close()
+
+
+@register_reader('.h5', 'ALS 8.3.2')
+class ALS832Dataset(LazyDataset):
+    '''
+    ALS 8.3.2 HDF5 files, one 2D dataset per image.
+    '''
+    def __init__(self, fname):
+        import h5py
+        self.fname = fname
+        self.name = os.path.splitext(fname)[0]
+        ## Kept open so slabs are read straight from the image datasets.
+        self._h5 = h5py.File(fname, 'r')
+        self._group = self._find_group(self._h5)
+        ## Scan metadata live on the dataset group, as dxchange reads them.
+        nproj = int(self._group.attrs['nangles'])
+        arange = float(self._group.attrs.get('arange', 180))
+        ## Projection i is <group>_0000_<i>.tif, as dxchange names them.
+        self._tomo = self._group.name.split('/')[-1] + '_0000_%04d.tif'
+        frame = self._group[self._tomo % 0]
+        self.shape = (nproj,) + tuple(frame.shape[-2:])
+        self.theta = tp.angles(nproj, 0, arange)
+
+    @staticmethod
+    def _find_group(h5):
+        ## The group holding the image datasets: a chain of single groups
+        ## from the file root, as dxchange.utils.find_dataset_group walks it.
+        import h5py
+        group = h5
+        while True:
+            keys = list(group.keys())
+            if len(keys) != 1 or not isinstance(group[keys[0]], h5py.Group):
+                raise IOError('No ALS 8.3.2 dataset group in ' + h5.filename)
+            group = group[keys[0]]
+            names = list(group.keys())
+            if names and isinstance(group[names[0]], h5py.Dataset):
+                return group
+
+    def read(self, proj=None, sino=None):
+        index = range(self.shape[0])[_slc(proj)]
+        rows = range(self.shape[1])[_slc(sino)]
+        data = np.empty((len(index), len(rows), self.shape[2]), dtype=np.uint16)
+        for m, i in enumerate(index):
+            image = self._group[self._tomo % i][..., _slc(sino), :]
+            ## Fix any wrapped values from oversaturation or file saving.
+            data[m] = np.asarray(image).reshape(data.shape[1:]).astype(np.uint16)
+        return data
+
+    def _read_flat_dark(self):
+        ## dxchange sorts out the flat field collection scheme. Only one
+        ## projection is read with them, and only once: the flat and dark
+        ## properties keep the result.
+        _, flat, dark, _ = dx.read_als_832h5(fname=self.fname, proj=(0, 1))
+        return flat.astype(np.uint16), dark
+
+    def close(self):
+        self._h5.close()
+
+
+@register_reader('.volume')
+class VolumeDataset(LazyDataset):
+    '''
+    Reconstructed .volume files from tomoRecon or this app. netCDF3 files are
+    memory-mapped (see volume_io.py) and slabs are read from the mapping.
+    The file is big-endian, so every slab is returned in native byte order
+    and load() builds a native copy rather than handing out the mapping.
+    Other netCDF flavours fall back to slicing through netCDF4.
+    '''
+    def __init__(self, fname):
+        self.fname = fname
+        self.name = fname[0:-7]
+        self._nc = None
+        try:
+            self.array, _ = open_volume(fname)
+            self.shape = self.array.shape
+            self.dtype = self.array.dtype.newbyteorder('=')
+        except IOError:
+            self.array = None
+            self._nc = Dataset(fname, 'r')
+            self._var = self._nc.variables['VOLUME']
+            self.shape = tuple(self._var.shape)
+            self.dtype = np.dtype(self._var.dtype).newbyteorder('=')
+        self.theta = tp.angles(self.shape[0])
+
+    def read(self, proj=None, sino=None):
+        if self.array is not None:
+            return self.array[_slc(proj), _slc(sino), :].astype(self.dtype)
+        return np.asarray(self._var[_slc(proj), _slc(sino), :]).astype(self.dtype, copy=False)
+
+    def close(self):
+        if self._nc is not None:
+            self._nc.close()
+        self.array = None
+
+
+def open_data(fname, beamline=None):
+    '''
+    Opens a data file with the reader registered for its extension and
+    beamline. No pixel data are read.
 
     Parameters
     -------
     fname : str
             String that has file name.
-    path : str
-            String that has the working directory of the raw data.
+    beamline : str, optional
+            One of BEAMLINES. Falls back to the default reader for the extension.
 
     Returns
     -------
+    dataset : LazyDataset
+    '''
+    ext = os.path.splitext(fname)[1].lower()
+    reader = READERS.get((ext, beamline), READERS.get((ext, None)))
+    if reader is None:
+        raise IOError('No reader for ' + ext + ' files from ' + str(beamline))
+    return reader(fname)
+
 
+def import_data(fname, path, beamline=None):
     '''
+    Reads a whole dataset into memory.
 
-    if fname.endswith('.nc'): #and beamline == 'APS 13-BM': #this last part will need to be uncommented when incorporated into the multibeamline branch.
-        '''
-        Reading in .nc files. APS 13BM format.
-        Reads in 2 flats (.nc), .setup, and data (.nc).
-        '''
-        ## Entries 1 and 3 of fname list are flat fields. Dxchange knows how to properly handle this.
-        ## Will break if missing a flat or setup file.
-        open_data, flat, dark, theta = dx.exchange.read_aps_13bm(fname,format='netcdf4')
-        ## nc files don't properly close due to Python still pointing to the files.
-        ## Create array and replace contents to allow Python to close original file.
-        data = np.zeros(open_data.shape)
-        data[:] = open_data
-        del open_data
-        print('data / data max are ', data.shape, data.max(), data.min())
-
-        ## Let Python know data are unsigned 16 bit integers.
-        data = data.astype(np.uint16)
-        flat = flat.astype(np.uint16)
-
-        ## Storing the dimensions for updating GUI.
-        sx = data.shape[2]
-        sy = data.shape[1]
-        sz = data.shape[0]
-        data_min = data.min()
-        data_max = data.max()
-        ## Updating the GUI.
-        fname = fname[0:-5]
-        return path, fname, sx, sy, sz, data_max, data_min, data, flat, dark, theta
+    Parameters
+    -------
+    fname : str
+            String that has file name.
+    path : str
+            String that has the working directory of the raw data.
+    beamline : str, optional
+            One of BEAMLINES.
 
-        '''
-        Everything beneath here has not been implemented in the master branch or cmd branch.
-        '''
-    if _fname.endswith('.h5') and beamline == 'ALS 8.3.2':
-        start = 0
-        end = 16
-        data, flat, dark, grp_flat = dx.read_als_832h5(fname=_fname, sino=(start,stop))
-        theta = tp.angles(data.shape[0], 0, 180)
-        ## Fix any wrapped values from oversaturation or file saving.
-        flat[np.where(flat < 0)] = (2**16 + flat[np.where(flat < 0)])
-        data[np.where(data < 0)] = (2**16 + data[np.where(data < 0)])
-        ## Storing the dimensions for updating GUI.
-        sx = data.shape[2]
-        sy = data.shape[1]
-        sz = data.shape[0]
-        data_min = data.min()
-        data_max = data.max()
-        fname = fname[0:-5]
-        return path, fname, sx, sy, sz, data_max, data_min, data, flat, dark, theta
-
-    if _fname.endswith('.h5') and beamline == 'APS 2-BM or 32-ID':
-        start = 0
-        end = 16
-        data, flat, dark, theta = dx.read_aps_32id(fname=_fname, sino = (start,end))
-        if (theta is None):
-            theta = tp.angles(data[0])
-        else:
-            pass
-        ## Fix any wrapped values from oversaturation or file saving.
-        flat[np.where(flat < 0)] = (2**16 + flat[np.where(flat < 0)])
-        data[np.where(data < 0)] = (2**16 + data[np.where(data < 0)])
-        ## Storing the dimensions for updating GUI.
-        sx = data.shape[2]
-        sy = data.shape[1]
-        sz = data.shape[0]
-        data_min = data.min()
-        data_max = data.max()
-        fname = fname[0:-5]
-        return path, fname, sx, sy, sz, data_max, data_min, data, flat, dark, theta
-
-    if _fname.endswith('.volume'):
-        '''
-        Reads in .volume files generated from tomoRecon.
-        '''
-        data = Dataset(_fname,'r', format = 'NETCDF4')
-        data = data.variables['VOLUME'][:]
-        data.close()
-        # Storing angles.
-        theta = tp.angles(data.shape[0])
-        ## Fix any wrapped values from oversaturation or file saving.
-        flat[np.where(flat < 0)] = (2**16 + flat[np.where(flat < 0)])
-        data[np.where(data < 0)] = (2**16 + data[np.where(data < 0)])
-        ## Storing the dimensions for updating GUI.
-        sx = data.shape[2]
-        sy = data.shape[1]
-        sz = data.shape[0]
-        ## Updating the GUI.
-        _fname = _fname[0:-5]
-        dark = 'NA'
-        data_min = data.min()
-        data_max = data.max()
-        return
+    Returns
+    -------
+    path, fname, sx, sy, sz, data_max, data_min, data, flat, dark, theta
+    '''
+    dataset = open_data(fname, beamline)
+    data, data_min, data_max = dataset.load()
+    print('data / data max are ', data.shape, data_max, data_min)
+    flat = dataset.flat
+    dark = dataset.dark
+    dataset.close()
+    ## Storing the dimensions for updating GUI.
+    sx = data.shape[2]
+    sy = data.shape[1]
+    sz = data.shape[0]
+    return path, dataset.name, sx, sy, sz, data_max, data_min, data, flat, dark, dataset.theta
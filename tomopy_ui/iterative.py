@@ -0,0 +1,116 @@
+'''
+Module for warm-started iterative reconstruction in the TomoPy_GUI app.
+'''
+import numpy as np
+from .layout import nrows
+from .padding import padded_recon, crop_recon
+
+__author__ = 'Brandt M. Gibson'
+__credits__ = 'Matt Newville, Doga Gursoy'
+__all__ = ['ITERATIVE_ALGORITHMS', 'iterative_recon']
+
+## TomoPy algorithms that take num_iter and init_recon.
+ITERATIVE_ALGORITHMS = ('art', 'bart', 'mlem', 'osem', 'ospml_hybrid', 'ospml_quad',
+                        'pml_hybrid', 'pml_quad', 'sirt', 'tv', 'grad')
+## Expectation-maximization type algorithms multiply the current estimate,
+## so the starting volume has to be strictly positive.
+POSITIVE_ALGORITHMS = ('mlem', 'osem', 'ospml_hybrid', 'ospml_quad', 'pml_hybrid', 'pml_quad')
+
+
+def iterative_recon(data, theta, center, algorithm, sino_order=False, batch_iter=5,
+                    max_iter=100, tol=1e-3, patience=2, filter_name='hann', ncore=None,
+                    callback=None, nsample=8, npad=0, warm_start=True):
+    '''
+    Iterative reconstruction run in batches, by default started from a
+    gridrec result.
+
+    After every batch the relative change of a few evenly spaced slices is
+    measured. Once it stays below tol for patience batches in a row the
+    estimate has plateaued and iteration stops.
+
+    Parameters
+    -------
+    data : ndarray
+            Normalized data.
+    theta : ndarray
+            Projection angles in radians.
+    center : float or ndarray
+            Rotation center(s), as for tp.recon.
+    algorithm : str
+            One of ITERATIVE_ALGORITHMS.
+    sino_order : bool, optional
+            Layout of data (see layout.py).
+    batch_iter : int, optional
+            Iterations per batch.
+    max_iter : int, optional
+            Upper limit on the total number of iterations.
+    tol : float, optional
+            Relative change below which a batch counts as converged.
+    patience : int, optional
+            Converged batches in a row needed to stop.
+    filter_name : str, optional
+            Filter for the gridrec starting volume.
+    ncore : int, optional
+            Number of cores for tomopy.
+    callback : callable, optional
+            Called as callback(rec, n_iter, change) after each batch. Returning
+            False stops iteration early.
+    nsample : int, optional
+            Number of slices used for the convergence metric.
+    npad : int, optional
+            Columns of edge padding (see padding.py). Sinograms are padded a
+            chunk at a time; only the working estimate is kept at the padded
+            width. The callback and the result see the native width.
+    warm_start : bool, optional
+            Start from gridrec. With False the estimate starts flat, as
+            tp.recon starts it without init_recon.
+
+    Returns
+    -------
+    rec : ndarray
+            Reconstructed volume.
+    history : list of float
+            Relative change after each batch.
+    '''
+    ## The estimate stays at the padded width between batches, so each
+    ## batch starts exactly where the previous one stopped.
+    if warm_start:
+        rec = padded_recon(data, theta, center, npad,
+                           sino_order = sino_order,
+                           crop = False,
+                           algorithm = 'gridrec',
+                           filter_name = filter_name,
+                           ncore = ncore)
+    else:
+        width = data.shape[2] + 2 * npad
+        rec = np.full((nrows(data, sino_order), width, width), 1e-6, dtype=np.float32)
+    if algorithm in POSITIVE_ALGORITHMS:
+        np.clip(rec, 1e-6, None, out=rec)
+    ## Only a handful of slices are kept from the previous batch, so the
+    ## metric costs no extra volume-sized copy.
+    idx = np.unique(np.linspace(0, rec.shape[0] - 1, min(nsample, rec.shape[0])).astype(int))
+    prev = rec[idx].copy()
+    history = []
+    n_iter = 0
+    quiet = 0
+    while n_iter < max_iter:
+        n = min(batch_iter, max_iter - n_iter)
+        rec = padded_recon(data, theta, center, npad,
+                           sino_order = sino_order,
+                           out = rec,
+                           crop = False,
+                           algorithm = algorithm,
+                           init_recon = rec,
+                           num_iter = n,
+                           ncore = ncore)
+        n_iter += n
+        sample = rec[idx]
+        change = float(np.linalg.norm(sample - prev) / max(np.linalg.norm(prev), 1e-12))
+        prev = sample.copy()
+        history.append(change)
+        if callback is not None and callback(crop_recon(rec, npad), n_iter, change) is False:
+            break
+        quiet = quiet + 1 if change < tol else 0
+        if quiet >= patience:
+            break
+    return np.ascontiguousarray(crop_recon(rec, npad)), history
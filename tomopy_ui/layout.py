@@ -0,0 +1,99 @@
+'''
+Module for switching the working volume between projection and sinogram order in the TomoPy_GUI app.
+
+Projection order is (angle, row, column), as read from file.
+Sinogram order is (row, angle, column), which is what tomopy's recon and
+centering routines work on internally. Converting once after normalization
+saves tomopy from reordering the data on every call.
+'''
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+__author__ = 'Brandt M. Gibson'
+__credits__ = 'Matt Newville, Doga Gursoy'
+__all__ = ['to_sinogram_order',
+           'to_projection_order',
+           'sino_slab',
+           'sinogram',
+           'projection',
+           'nangles',
+           'nrows']
+
+
+def _swap_01(data, ncore, block, out=None):
+    ## Blocked transpose of the first two axes. Each task reads a band of
+    ## rows from every projection and writes one contiguous band of the
+    ## output, so the threads never touch the same pages.
+    if out is None:
+        out = np.empty((data.shape[1], data.shape[0], data.shape[2]), dtype=data.dtype)
+    def work(r0):
+        out[r0:r0+block] = data[:, r0:r0+block, :].transpose(1, 0, 2)
+    if ncore is None:
+        ncore = os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=max(1, int(ncore))) as pool:
+        list(pool.map(work, range(0, data.shape[1], block)))
+    return out
+
+
+def to_sinogram_order(data, ncore=None, block=8, out=None):
+    '''
+    Converts (angle, row, column) data to (row, angle, column) with a
+    parallel blocked transpose. Returns a new contiguous array, or out.
+
+    Parameters
+    -------
+    data : ndarray
+            Projection ordered data.
+    ncore : int, optional
+            Number of threads. Defaults to all cores.
+    block : int, optional
+            Number of rows moved per task.
+    out : ndarray, optional
+            Contiguous (row, angle, column) array to write into, e.g. one
+            from scheduler.shared_empty().
+    '''
+    return _swap_01(data, ncore, block, out)
+
+
+def to_projection_order(data, ncore=None, block=8):
+    '''
+    Inverse of to_sinogram_order.
+    '''
+    return _swap_01(data, ncore, block)
+
+
+def sino_slab(data, start, end, sino_order):
+    '''
+    Rows start:end of the data, kept in the same layout as data so it can be
+    passed to tomopy with sinogram_order = sino_order.
+    '''
+    if sino_order:
+        return data[start:end]
+    return data[:, start:end, :]
+
+
+def sinogram(data, row, sino_order):
+    '''
+    2D sinogram (angle, column) for one detector row.
+    '''
+    if sino_order:
+        return data[row]
+    return data[:, row, :]
+
+
+def projection(data, index, sino_order):
+    '''
+    2D projection (row, column) for one angle.
+    '''
+    if sino_order:
+        return data[:, index, :]
+    return data[index]
+
+
+def nangles(data, sino_order):
+    return data.shape[1] if sino_order else data.shape[0]
+
+
+def nrows(data, sino_order):
+    return data.shape[0] if sino_order else data.shape[1]
@@ -0,0 +1,228 @@
+'''
+Module for publishing run progress over HTTP in the TomoPy_GUI app.
+
+RunStatus holds the current stage, its progress and the throughput of
+finished stages. StatusServer serves it on localhost, as Prometheus text at
+/metrics and as JSON at /status, from a daemon thread so the wx main loop
+is never involved. Nothing is served unless the server is started.
+'''
+import os
+import json
+import time
+import threading
+try:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+except ImportError:
+    ## Python < 3.7.
+    from http.server import BaseHTTPRequestHandler, HTTPServer as ThreadingHTTPServer
+
+__author__ = 'Brandt M. Gibson'
+__credits__ = 'Matt Newville, Doga Gursoy'
+__all__ = ['RunStatus', 'StatusServer', 'memory_rss']
+
+
+def memory_rss():
+    '''
+    Resident memory of this process in bytes, or None if unknown.
+    '''
+    try:
+        with open('/proc/self/statm', 'r') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        ## Peak rather than current, in kB on Linux and bytes on macOS.
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if os.uname()[0] == 'Darwin' else rss * 1024
+    except (ImportError, AttributeError):
+        return None
+
+
+class RunStatus(object):
+    '''
+    Thread-safe record of what the app is doing.
+
+    Stages are started with begin() and finished with end(). Long stages
+    report progress() in whatever units they work in (rows, slabs,
+    iterations). Finished stages keep their duration and throughput.
+
+    Attributes
+    -------
+    gauges : dict
+            Extra numeric values (e.g. working volume bytes) exported as is.
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stage = 'idle'
+        self.unit = None
+        self.done = 0
+        self.total = None
+        self.queue = 0
+        self.started = None
+        self.history = {}
+        self.gauges = {}
+
+    def begin(self, stage, total=None, unit='items'):
+        with self._lock:
+            self.stage = stage
+            self.unit = unit
+            self.done = 0
+            self.total = total
+            self.queue = total or 0
+            self.started = time.time()
+
+    def progress(self, done, total=None, queue=None, unit=None):
+        with self._lock:
+            self.done = done
+            if total is not None:
+                self.total = total
+            if unit is not None:
+                self.unit = unit
+            if queue is not None:
+                self.queue = queue
+            elif self.total is not None:
+                self.queue = max(0, self.total - done)
+
+    def end(self):
+        with self._lock:
+            if self.started is None:
+                return
+            seconds = time.time() - self.started
+            done = self.done
+            self.history[self.stage] = {'seconds': seconds,
+                                        'units': done,
+                                        'unit': self.unit,
+                                        'throughput': done / seconds if seconds > 0 and done else None,
+                                        'finished': time.time()}
+            self.stage = 'idle'
+            self.done = 0
+            self.total = None
+            self.queue = 0
+            self.started = None
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+
+    def snapshot(self):
+        '''
+        Current state as a JSON-ready dict.
+        '''
+        with self._lock:
+            elapsed = time.time() - self.started if self.started is not None else 0.
+            percent = None
+            if self.total:
+                percent = 100. * self.done / self.total
+            return {'stage': self.stage,
+                    'unit': self.unit,
+                    'done': self.done,
+                    'total': self.total,
+                    'percent': percent,
+                    'elapsed': elapsed,
+                    'throughput': self.done / elapsed if elapsed > 0 and self.done else None,
+                    'queue_depth': self.queue,
+                    'memory_rss': memory_rss(),
+                    'gauges': dict(self.gauges),
+                    'stages': dict((k, dict(v)) for k, v in self.history.items())}
+
+    def prometheus(self):
+        '''
+        Current state in the Prometheus text exposition format.
+        '''
+        snap = self.snapshot()
+        lines = []
+        def metric(name, help_text, kind, samples):
+            lines.append('# HELP tomopy_gui_'+name+' '+help_text)
+            lines.append('# TYPE tomopy_gui_'+name+' '+kind)
+            for labels, value in samples:
+                if value is None:
+                    continue
+                label = ''
+                if labels:
+                    label = '{'+','.join(k+'="'+str(v)+'"' for k, v in sorted(labels.items()))+'}'
+                lines.append('tomopy_gui_'+name+label+' '+repr(float(value)))
+        metric('stage_active', 'Stage currently running (1).', 'gauge',
+               [({'stage': snap['stage']}, 1)])
+        metric('stage_percent', 'Percent complete of the running stage.', 'gauge',
+               [({'stage': snap['stage']}, snap['percent'])])
+        metric('stage_elapsed_seconds', 'Time spent in the running stage.', 'gauge',
+               [({'stage': snap['stage']}, snap['elapsed'])])
+        metric('stage_throughput', 'Units per second of the running stage.', 'gauge',
+               [({'stage': snap['stage'], 'unit': snap['unit']}, snap['throughput'])])
+        metric('queue_depth', 'Units of the running stage not yet finished.', 'gauge',
+               [({'stage': snap['stage']}, snap['queue_depth'])])
+        metric('memory_rss_bytes', 'Resident memory of the app.', 'gauge',
+               [({}, snap['memory_rss'])])
+        metric('last_stage_seconds', 'Duration of the last run of each stage.', 'gauge',
+               [({'stage': k}, v['seconds']) for k, v in sorted(snap['stages'].items())])
+        metric('last_stage_throughput', 'Units per second of the last run of each stage.', 'gauge',
+               [({'stage': k, 'unit': v['unit']}, v['throughput']) for k, v in sorted(snap['stages'].items())])
+        for name, value in sorted(snap['gauges'].items()):
+            metric(name, 'App gauge '+name+'.', 'gauge', [({}, value)])
+        return '\n'.join(lines) + '\n'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        status = self.server.status
+        if self.path.startswith('/metrics'):
+            body = status.prometheus().encode('utf-8')
+            ctype = 'text/plain; version=0.0.4; charset=utf-8'
+        elif self.path.startswith('/status') or self.path == '/':
+            body = json.dumps(status.snapshot(), indent=2).encode('utf-8')
+            ctype = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        ## Scrapes every few seconds would flood the terminal.
+        pass
+
+
+class StatusServer(object):
+    '''
+    Serves a RunStatus on localhost from a daemon thread.
+
+    Parameters
+    -------
+    status : RunStatus
+    port : int, optional
+            Port to listen on. 0 picks a free one.
+    host : str, optional
+            Interface to bind. Defaults to localhost only.
+    '''
+    def __init__(self, status, port=8765, host='127.0.0.1'):
+        self.status = status
+        self.host = host
+        self.port = port
+        self._httpd = None
+        self._thread = None
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.status = self.status
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='status-server')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd is None:
+            return
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://'+self.host+':'+str(self.port)
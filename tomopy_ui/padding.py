@@ -0,0 +1,199 @@
+'''
+Module for virtual sinogram padding in the TomoPy_GUI app.
+
+The working volume is kept at its native width. Padding is only applied to
+the sinogram slab being reconstructed, and the reconstructed slab is cropped
+back to the native width before it is stored. Preprocessing steps therefore
+never see the padded columns, and no padded copy of the volume is kept.
+'''
+import numpy as np
+from .layout import sino_slab, nrows
+from .fbp import ALGORITHM, engine
+
+__author__ = 'Brandt M. Gibson'
+__credits__ = 'Matt Newville, Doga Gursoy'
+__all__ = ['pad_width', 'smooth_widths', 'pad_slab', 'crop_recon', 'padded_recon', 'roi_recon']
+
+
+def pad_width(pad_size, ncols):
+    '''
+    Columns of padding on each side to reach pad_size. Zero when padding is
+    off (pad_size 0) or pad_size is not wider than the data.
+    '''
+    pad_size = int(pad_size)
+    if pad_size <= ncols:
+        return 0
+    return (pad_size - ncols) // 2
+
+
+def smooth_widths(ncols, min_pad=16):
+    '''
+    Candidate padded widths for FFT based reconstruction: the 5-smooth
+    numbers (only factors 2, 3 and 5) from ncols + 2*min_pad up to and
+    including the next power of two. Only widths reachable with the same
+    padding on both sides are kept, except the power of two itself, which is
+    always a candidate (one column narrower for odd ncols, as pad_width
+    rounds), so the list is never empty.
+    '''
+    lo = ncols + 2 * min_pad
+    hi = 1
+    while hi < lo:
+        hi *= 2
+    widths = []
+    for w in range(lo, hi + 1):
+        if (w - ncols) % 2:
+            continue
+        n = w
+        for p in (2, 3, 5):
+            while n % p == 0:
+                n //= p
+        if n == 1:
+            widths.append(w)
+    if hi not in widths:
+        widths.append(hi)
+    return widths
+
+
+def pad_slab(slab, npad):
+    '''
+    Edge-pads the column axis of a sinogram slab, in either layout.
+    Same result as tp.misc.morph.pad(slab, axis=2, npad=npad, mode='edge').
+    '''
+    if npad == 0:
+        return slab
+    return np.pad(slab, ((0, 0), (0, 0), (npad, npad)), mode='edge')
+
+
+def crop_recon(rec, npad, window=None):
+    '''
+    Crops reconstructed slices of a padded slab back to the native width,
+    or to window = (y0, y1, x0, x1) in native coordinates.
+    '''
+    if window is not None:
+        y0, y1, x0, x1 = window
+        return rec[:, npad+y0:npad+y1, npad+x0:npad+x1]
+    if npad == 0:
+        return rec
+    return rec[:, npad:rec.shape[1]-npad, npad:rec.shape[2]-npad]
+
+
+def padded_recon(data, theta, center, npad, sino_order=False, chunk_rows=64,
+                 out=None, callback=None, window=None, crop=True, **recon_kwargs):
+    '''
+    Reconstructs data chunk by chunk, padding each chunk of sinograms only
+    for its tp.recon call.
+
+    Parameters
+    -------
+    data : ndarray
+            Normalized data at native width.
+    theta : ndarray
+            Projection angles in radians.
+    center : float or ndarray
+            Rotation center(s) in native column coordinates, one per row if
+            an array.
+    npad : int
+            Columns of padding on each side (see pad_width).
+    sino_order : bool, optional
+            Layout of data (see layout.py).
+    chunk_rows : int, optional
+            Sinogram rows padded and reconstructed at a time.
+    out : ndarray, optional
+            (rows, columns, columns) float32 array to fill.
+    callback : callable, optional
+            Called as callback(rows_done, n_rows) after each chunk.
+    window : tuple, optional
+            (y0, y1, x0, x1) in native coordinates. Each chunk is cropped to
+            it as soon as it is reconstructed, and the NumPy FBP engine
+            only back-projects those pixels.
+    crop : bool, optional
+            Crop to the native width. With False the padded slices are kept,
+            e.g. as the starting volume of the next iterative batch.
+    recon_kwargs
+            Passed on to tp.recon (algorithm, filter_name, ncore, ...), or
+            to fbp.recon for algorithm='numpy_fbp'. An init_recon volume
+            must be at the padded width; it is passed on chunk by chunk and
+            may be the same array as out.
+
+    Returns
+    -------
+    rec : ndarray
+            Reconstructed volume (row, y, x) at native width, cropped to
+            window, or padded if crop is False.
+    '''
+    n_rows = nrows(data, sino_order)
+    ncols = data.shape[2]
+    centers = np.broadcast_to(np.asarray(center, dtype=np.float32), (n_rows,)) + npad
+    if not crop:
+        shape = (n_rows, ncols + 2 * npad, ncols + 2 * npad)
+    elif window is None:
+        shape = (n_rows, ncols, ncols)
+    else:
+        shape = (n_rows, window[1] - window[0], window[3] - window[2])
+    if out is None:
+        out = np.empty(shape, dtype=np.float32)
+    reconstruct = engine(recon_kwargs.get('algorithm'))
+    init = recon_kwargs.pop('init_recon', None)
+    inplace = crop and window is not None and recon_kwargs.get('algorithm') == ALGORITHM
+    if inplace:
+        recon_kwargs['window'] = tuple(w + npad for w in window)
+    for r0 in range(0, n_rows, chunk_rows):
+        r1 = min(n_rows, r0 + chunk_rows)
+        slab = pad_slab(sino_slab(data, r0, r1, sino_order), npad)
+        if init is not None:
+            recon_kwargs['init_recon'] = np.array(init[r0:r1], dtype=np.float32)
+        rec = reconstruct(slab, theta,
+                          center = np.array(centers[r0:r1]),
+                          sinogram_order = sino_order,
+                          **recon_kwargs)
+        if inplace or not crop:
+            out[r0:r1] = rec
+        else:
+            out[r0:r1] = crop_recon(rec, npad, window)
+        if callback is not None:
+            callback(r1, n_rows)
+    return out
+
+
+def roi_recon(data, theta, center, npad, rows=None, window=None, sino_order=False,
+              chunk_rows=64, callback=None, **recon_kwargs):
+    '''
+    Reconstructs only sinogram rows start:end, cropped to an in-plane
+    window, with the full volume never allocated.
+
+    Parameters
+    -------
+    center : float or ndarray
+            Rotation center, or one per row of the whole data; the centers
+            of the selected rows are used.
+    rows : tuple, optional
+            (start, end) sinogram rows. Defaults to all rows.
+    window : tuple, optional
+            (y0, y1, x0, x1) in native coordinates. Defaults to the whole
+            slice.
+    Others as for padded_recon.
+
+    Returns
+    -------
+    rec : ndarray
+            (end-start, y1-y0, x1-x0) float32 volume.
+    '''
+    n_rows = nrows(data, sino_order)
+    start, end = rows if rows is not None else (0, n_rows)
+    if not 0 <= start < end <= n_rows:
+        raise ValueError('Rows '+str(start)+' to '+str(end)+' are not within the '+str(n_rows)+' rows of the data.')
+    ncols = data.shape[2]
+    if window is not None:
+        y0, y1, x0, x1 = window
+        if not (0 <= y0 < y1 <= ncols and 0 <= x0 < x1 <= ncols):
+            raise ValueError('Window '+str(tuple(window))+' is not within the '+str(ncols)+' x '+str(ncols)+' slice.')
+    centers = np.broadcast_to(np.asarray(center, dtype=np.float32), (n_rows,))
+    return padded_recon(sino_slab(data, start, end, sino_order),
+                        theta,
+                        np.array(centers[start:end]),
+                        npad,
+                        sino_order = sino_order,
+                        chunk_rows = chunk_rows,
+                        callback = callback,
+                        window = window,
+                        **recon_kwargs)
@@ -0,0 +1,161 @@
+'''
+Module for single-distance phase retrieval in the TomoPy_GUI app.
+
+Paganin's filter, with the same parameters and normalization as
+tomopy.retrieve_phase, applied to normalized data in place. The filter for a
+given FFT size, energy, distance, pixel size and alpha is built once and
+kept, so repeated runs only cost the FFTs. Projections are filtered in
+chunks on a thread pool, each chunk in its own padded float32 buffer.
+'''
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from .padding import smooth_widths
+try:
+    from scipy import fft as _fft
+except ImportError:
+    _fft = None
+## scipy < 1.4 has scipy.fft as a function, not a module. numpy.fft always
+## works but computes in double precision.
+if _fft is None or not hasattr(_fft, 'rfft2'):
+    _fft = np.fft
+
+__author__ = 'Brandt M. Gibson'
+__credits__ = 'Matt Newville, Doga Gursoy'
+__all__ = ['fft_shape', 'paganin_kernel', 'retrieve_phase']
+
+PLANCK_CONSTANT = 6.58211928e-19  # keV*s
+SPEED_OF_LIGHT = 299792458e+2  # cm/s
+
+## Filters already built, keyed by (shape, pixel_size, dist, energy, alpha).
+_KERNELS = {}
+
+
+def fft_shape(nrows, ncols, pad_size=0, min_pad=64):
+    '''
+    Padded (rows, columns) for the projection FFTs. Columns reuse the
+    reconstruction pad size when it is wider than the data, so Auto Pad's
+    benchmarked width is used here too. Otherwise, and for rows, the
+    smallest 5-smooth width with at least min_pad on each side is used.
+    '''
+    if int(pad_size) > ncols and (int(pad_size) - ncols) % 2 == 0:
+        cols = int(pad_size)
+    else:
+        cols = smooth_widths(ncols, min_pad)[0]
+    return smooth_widths(nrows, min_pad)[0], cols
+
+
+def paganin_kernel(shape, pixel_size, dist, energy, alpha=1e-3):
+    '''
+    Paganin filter for a real FFT of the given padded shape, normalized to
+    1 at zero frequency.
+
+    Parameters
+    -------
+    shape : tuple
+            Padded (rows, columns).
+    pixel_size : float
+            Detector pixel size in cm.
+    dist : float
+            Sample to detector distance in cm.
+    energy : float
+            Beam energy in keV.
+    alpha : float, optional
+            Regularization (beta/delta like) parameter.
+
+    Returns
+    -------
+    kernel : ndarray
+            float32 array of shape (rows, columns//2 + 1). Cached; do not
+            modify.
+    '''
+    key = (tuple(shape), float(pixel_size), float(dist), float(energy), float(alpha))
+    kernel = _KERNELS.get(key)
+    if kernel is None:
+        wavelength = 2 * np.pi * PLANCK_CONSTANT * SPEED_OF_LIGHT / energy
+        fy = np.fft.fftfreq(shape[0], d=pixel_size)
+        fx = np.fft.rfftfreq(shape[1], d=pixel_size)
+        w2 = np.add.outer(fy**2, fx**2)
+        kernel = (1. / (1. + wavelength * dist * w2 / (4 * np.pi * alpha))).astype(np.float32)
+        kernel.flags.writeable = False
+        _KERNELS[key] = kernel
+    return kernel
+
+
+def _projections(data, i0, i1, sino_order):
+    ## Projections i0:i1 as an (angle, row, column) view of data.
+    if sino_order:
+        return data[:, i0:i1].transpose(1, 0, 2)
+    return data[i0:i1]
+
+
+def retrieve_phase(data, pixel_size, dist, energy, alpha=1e-3, sino_order=False,
+                   pad_size=0, absorption=True, chunk=8, ncore=None, callback=None):
+    '''
+    Applies Paganin phase retrieval to every projection, in place.
+
+    Parameters
+    -------
+    data : ndarray
+            float32 normalized data, in either layout (see layout.py).
+    pixel_size, dist, energy, alpha
+            See paganin_kernel.
+    sino_order : bool, optional
+            Layout of data.
+    pad_size : int, optional
+            Reconstruction pad size, reused for the column padding.
+    absorption : bool, optional
+            Data hold -log of the transmission, as after the app's
+            normalization. Each chunk is turned back into transmission,
+            filtered and logged again in its buffer.
+    chunk : int, optional
+            Projections filtered at a time by each thread.
+    ncore : int, optional
+            Threads. Defaults to all cores.
+    callback : callable, optional
+            Called as callback(projections_done, n_projections).
+
+    Returns
+    -------
+    data : ndarray
+            The same array.
+    '''
+    n_proj = data.shape[1] if sino_order else data.shape[0]
+    n_rows = data.shape[0] if sino_order else data.shape[1]
+    ncols = data.shape[2]
+    shape = fft_shape(n_rows, ncols, pad_size)
+    kernel = paganin_kernel(shape, pixel_size, dist, energy, alpha)
+    py = (shape[0] - n_rows) // 2
+    px = (shape[1] - ncols) // 2
+    if ncore is None:
+        ncore = os.cpu_count() or 1
+    def work(i0):
+        i1 = min(n_proj, i0 + chunk)
+        proj = _projections(data, i0, i1, sino_order)
+        buf = np.empty((i1 - i0,) + shape, dtype=np.float32)
+        inner = buf[:, py:py+n_rows, px:px+ncols]
+        inner[:] = proj
+        if absorption:
+            np.negative(inner, out=inner)
+            np.exp(inner, out=inner)
+        ## Edge padding, rows then columns, as tomopy does.
+        buf[:, :py] = buf[:, py:py+1]
+        buf[:, py+n_rows:] = buf[:, py+n_rows-1:py+n_rows]
+        buf[:, :, :px] = buf[:, :, px:px+1]
+        buf[:, :, px+ncols:] = buf[:, :, px+ncols-1:px+ncols]
+        spectrum = _fft.rfft2(buf)
+        spectrum *= kernel
+        buf[:] = _fft.irfft2(spectrum, s=shape)
+        if absorption:
+            np.maximum(inner, np.finfo(np.float32).tiny, out=inner)
+            np.log(inner, out=inner)
+            np.negative(inner, out=inner)
+        proj[:] = inner
+        return i1 - i0
+    done = 0
+    with ThreadPoolExecutor(max_workers=max(1, int(ncore))) as pool:
+        for n in pool.map(work, range(0, n_proj, chunk)):
+            done += n
+            if callback is not None:
+                callback(done, n_proj)
+    return data
@@ -0,0 +1,169 @@
+'''
+Module for driving a running TomoPy_GUI session from scripts.
+
+RemoteServer speaks JSON-RPC 2.0 over a TCP socket on localhost, one JSON
+object per line in each direction. Requests are read on a daemon thread and
+handed to a dispatch function, which the app uses to run them on the wx
+main thread, so a script sees exactly what a click on the same button does.
+
+Example
+-------
+>>> from tomopy_ui.remote import remote_call
+>>> remote_call('load', {'path': '/data/scan_001.nc'})
+>>> remote_call('run', {'step': 'normalize'})
+>>> remote_call('export', {'data_type': '.vol'})
+'''
+import json
+import socket
+import inspect
+import threading
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+__author__ = 'Brandt M. Gibson'
+__credits__ = 'Matt Newville, Doga Gursoy'
+__all__ = ['RemoteServer', 'remote_call', 'RemoteError']
+
+## JSON-RPC 2.0 error codes.
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+APP_ERROR = -32000
+
+
+class RemoteError(Exception):
+    '''
+    Error returned by the server, raised by remote_call().
+    '''
+    def __init__(self, code, message):
+        Exception.__init__(self, message)
+        self.code = code
+
+
+def _error(req_id, code, message):
+    return {'jsonrpc': '2.0', 'id': req_id, 'error': {'code': code, 'message': message}}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+            response = self.server.remote.handle(line)
+            if response is not None:
+                self.wfile.write((response + '\n').encode('utf-8'))
+                self.wfile.flush()
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class RemoteServer(object):
+    '''
+    JSON-RPC server for a table of methods.
+
+    Parameters
+    -------
+    methods : dict
+            Method name to callable. Called with the request params as
+            keyword arguments (a dict) or positional arguments (a list).
+    port : int, optional
+            Port to listen on. 0 picks a free one.
+    host : str, optional
+            Interface to bind. Defaults to localhost only.
+    dispatch : callable, optional
+            Called as dispatch(func, args, kwargs) to run a method, e.g. on a
+            GUI thread. Defaults to calling it on the server thread.
+    '''
+    def __init__(self, methods, port=8766, host='127.0.0.1', dispatch=None):
+        self.methods = methods
+        self.port = port
+        self.host = host
+        self.dispatch = dispatch
+        self._server = None
+        self._thread = None
+
+    def handle(self, line):
+        '''
+        Runs one request line and returns the JSON response line (None for
+        notifications, which have no id). A result that cannot be encoded
+        as JSON is returned as an APP_ERROR.
+        '''
+        try:
+            req = json.loads(line.decode('utf-8') if isinstance(line, bytes) else line)
+        except ValueError as err:
+            return json.dumps(_error(None, PARSE_ERROR, str(err)))
+        if not isinstance(req, dict) or 'method' not in req:
+            return json.dumps(_error(None, INVALID_REQUEST, 'Expected an object with a method.'))
+        req_id = req.get('id')
+        response = self._call(req, req_id)
+        if req_id is None:
+            return None
+        try:
+            return json.dumps(response)
+        except (TypeError, ValueError) as err:
+            return json.dumps(_error(req_id, APP_ERROR, 'Result is not JSON: ' + str(err)))
+
+    def _call(self, req, req_id):
+        ## Runs the method of a well formed request; returns the response dict.
+        func = self.methods.get(req['method'])
+        if func is None:
+            return _error(req_id, METHOD_NOT_FOUND, 'No method ' + str(req['method']))
+        params = req.get('params', {})
+        args, kwargs = (params, {}) if isinstance(params, list) else ((), params)
+        try:
+            inspect.signature(func).bind(*args, **kwargs)
+        except TypeError as err:
+            return _error(req_id, INVALID_PARAMS, str(err))
+        try:
+            if self.dispatch is None:
+                result = func(*args, **kwargs)
+            else:
+                result = self.dispatch(func, args, kwargs)
+        except Exception as err:
+            return _error(req_id, APP_ERROR, type(err).__name__ + ': ' + str(err))
+        return {'jsonrpc': '2.0', 'id': req_id, 'result': result}
+
+    def start(self):
+        self._server = _TCPServer((self.host, self.port), _Handler)
+        self._server.remote = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='remote-server')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        self._thread = None
+
+
+def remote_call(method, params=None, port=8766, host='127.0.0.1', timeout=600.):
+    '''
+    Calls a method on a running RemoteServer and returns its result.
+    Steps run to completion before the call returns, so a long
+    reconstruction may need a larger timeout (seconds); None waits forever.
+    socket.timeout is raised if no response arrives in time.
+    '''
+    request = {'jsonrpc': '2.0', 'id': 1, 'method': method, 'params': params or {}}
+    sock = socket.create_connection((host, port), timeout=timeout)
+    try:
+        sock.sendall((json.dumps(request) + '\n').encode('utf-8'))
+        fh = sock.makefile('rb')
+        response = json.loads(fh.readline().decode('utf-8'))
+        fh.close()
+    finally:
+        sock.close()
+    if 'error' in response:
+        raise RemoteError(response['error']['code'], response['error']['message'])
+    return response['result']
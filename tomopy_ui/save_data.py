@@ -1,22 +1,42 @@
 '''
 Module for saving data in the TomoPy_GUI appself.
 '''
+import json
 import numpy as np
 import time
 import skimage
 import dxchange as dx
-from netCDF4 import Dataset
+from .data_stats import scale_to_bounds, sample_bbox
+from .volume_io import VolumeWriter
 
 __author__ = 'Brandt M. Gibson'
 __credits__ = 'Matt Newville, Doga Gursoy'
 __all__ = ['save_recon']
 
-def save_recon(data_type, save_dtype, npad, data, fname):
+def _convert(slab, save_dtype, a, b, float_src):
+    ## Scales one slab to the export type.
+    if save_dtype == 'u1':
+        return scale_to_bounds(slab, a, b, np.uint8)
+    ## This allows processed data (float 32) be saved as signed integer (16 signed int) which is same as raw data.
+    if save_dtype == 'u2' and float_src:
+        slab = scale_to_bounds(slab, a, b, np.float32)
+        slab -= a
+        slab /= (b - a) if b > a else 1.
+        save_int = np.empty(slab.shape, dtype=np.int16)
+        for i in range(slab.shape[0]):
+            save_int[i,:,:] = skimage.img_as_int(slab[i,:,:])
+        return save_int
+    if save_dtype == 'u2':
+        return scale_to_bounds(slab, a, b, np.uint16)
+    return slab
+
+def save_recon(data_type, save_dtype, npad, data, fname, bounds=None, slab_size=32,
+               crop=False, margin=16, callback=None):
     '''
     Method for saving. Data are converted based on user specified options,
-    then exported as tif stack or netcdf3 .volume file. Format conversions
-    are very slow. Raw data usually saves quickly, but data that has been
-    changed to float format is slow.
+    then exported as tif stack or netcdf3 .volume file. Conversion and
+    writing are done slab by slab, so at most one converted slab is held
+    in memory and the .volume file is written sequentially.
 
     Parameters
     -------
@@ -30,60 +50,78 @@ def save_recon(data_type, save_dtype, npad, data, fname):
             Array of data to be saved.
     _fname : str
             String of what the dataset is called and file save will be named.
+    bounds : tuple, optional
+            (lo, hi) intensity window used for integer exports. Values outside
+            are clipped. Defaults to the min and max of the data.
+    slab_size : int, optional
+            Slices converted and written at a time.
+    crop : bool, optional
+            Crop to the bounding box of the sample (see sample_bbox) plus
+            margin. The offsets of the box in the unpadded volume are stored
+            as crop_offset/full_shape attributes in .volume files, or in a
+            fname_crop.json file next to a tif stack.
+    margin : int, optional
+            Voxels kept around the sample when cropping.
+    callback : callable, optional
+            Called as callback(slices_done, n_slices) after each slab.
 
     Returns
     -------
     Nothing
     '''
 
-    ## Setup copy of data to allow user to scale and save at different file
-    ## types (e.g. 8 bit, 16 bit, etc.). Must check to see if data are padded.
+    ## Crop the padding with views; nothing is copied until a slab is converted.
     if npad == 0:
-        save_data = data[:]
+        save_data = data
     ## Exporting data without padding.
     if npad != 0: #was padded.
         if data.shape [1] == data.shape[2]: #padded and reconstructed.
             save_data = data[:,npad:data.shape[1]-npad,npad:data.shape[2]-npad]
         if data.shape[1] != data.shape[2]: #padded and NOT reconstructed.
             save_data = data[:,:,npad:data.shape[2]-npad]
-    ## Scales the data appropriately.
-    ## This is extremely slow from float32 to other formats.
-    a = float(save_data.min())
-    b = float(save_data.max()) - a
-    if save_dtype == 'u1':
-        save_data = ((save_data - a) / b) * 255.
-        save_data = save_data.astype(np.uint8)
-    if save_dtype == 'u2':
-        save_data = ((save_data - a) / b) * 65535.
-        save_data = save_data.astype(np.uint16)
-    ## This allows processed data (float 32) be saved as signed integer (16 signed int) which is same as raw data.
-    if save_dtype =='u2' and data.dtype=='float32':
-        save_data = ((save_data - a) / b)
-        for i in range(save_data.shape[0]):
-            save_data[i,:,:] = skimage.img_as_int(save_data[i,:,:])
+    crop_info = None
+    if crop:
+        box = sample_bbox(save_data, margin=margin)
+        crop_info = {'crop_offset': [int(b[0]) for b in box],
+                     'full_shape': [int(n) for n in save_data.shape]}
+        save_data = save_data[tuple(slice(*b) for b in box)]
+        print('cropped to ', box)
+    ## Scales the data appropriately. Percentile bounds from the caller keep
+    ## a few hot pixels from compressing the rest of the 8/16 bit range.
+    if bounds is None:
+        a = float(save_data.min())
+        b = float(save_data.max())
+    else:
+        a, b = float(bounds[0]), float(bounds[1])
+    float_src = data.dtype.kind == 'f'
+    nz = save_data.shape[0]
+    def slabs():
+        for i in range(0, nz, slab_size):
+            yield i, _convert(save_data[i:i+slab_size], save_dtype, a, b, float_src)
+            if callback is not None:
+                callback(min(nz, i+slab_size), nz)
     '''
     Data exporting.
     '''
     ## Create tif stack within a temp folder in the current working directory.
     if data_type == '.tif':
-        dx.write_tiff_stack(save_data, fname = fname, dtype = save_dtype, overwrite=True)
+        for i, slab in slabs():
+            dx.write_tiff_stack(slab, fname = fname, dtype = save_dtype, start = i, overwrite=True)
+        ## tif has no place for the offsets, so they go in a sidecar file.
+        if crop_info is not None:
+            with open(fname+'_crop.json', 'w') as fh:
+                json.dump(crop_info, fh, indent=2)
     ## Create a .volume netCDF3 file.
     ## netndf3 does not support unsigned integers.
     if data_type == '.vol':
-        ## Creates the empty file, and adds metadata.
-        ncfile = Dataset(fname+'_tomopy_recon.volume', 'w', format = 'NETCDF3_64BIT', clobber = True) # Will overwrite if pre-existing file is found.
-        ncfile.description = 'Tomography dataset'
-        ncfile.source = 'APS GSECARS 13BM'
-        ncfile.history = "Created "+time.ctime(time.time())
-        ## Creates the correct dimensions for the file.
-        NX = ncfile.createDimension('NX', save_data.shape[2])
-        NY = ncfile.createDimension('NY', save_data.shape[1])
-        NZ = ncfile.createDimension('NZ', save_data.shape[0])
         print('save_dtype is ', save_dtype)
-        ## Creates variable for data based on previously constructed dimensions.
-        volume = ncfile.createVariable('VOLUME',  save_dtype, ('NZ','NY','NX',))
-        ## Copies data into empty file array.
-        volume[:] = save_data
-        print('volume ', volume.shape, type(volume), volume.dtype)
-        ncfile.close()
-    del save_data
+        attrs = {'description': 'Tomography dataset',
+                 'source': 'APS GSECARS 13BM',
+                 'history': 'Created '+time.ctime(time.time())}
+        if crop_info is not None:
+            attrs.update(crop_info)
+        ## Header is written once, then each slab is appended. Will overwrite
+        ## if pre-existing file is found.
+        with VolumeWriter(fname+'_tomopy_recon.volume', save_data.shape, save_dtype, attrs) as volume:
+            volume.write_slabs(slab for i, slab in slabs())
+        print('volume ', save_data.shape, save_dtype)
@@ -0,0 +1,207 @@
+'''
+Module for reconstructing sinogram slabs in parallel worker processes in the TomoPy_GUI app.
+
+Workers attach to the working volume in POSIX shared memory by name and
+write their slab of the reconstruction straight into a shared output block,
+so no pixel data is ever pickled. A volume made with shared_empty() is
+handed over as it is; any other is copied into a block for the call. The output block
+becomes the returned volume without a copy. Every slice is reconstructed
+with its own center and slabs start on even rows, as gridrec reconstructs
+slices in pairs, so the result is the same as a single tp.recon call over
+the whole volume.
+'''
+import ctypes
+import numpy as np
+import tomopy as tp
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .layout import sino_slab, nrows
+from .padding import pad_slab, crop_recon
+from .fbp import engine
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    ## Python < 3.8.
+    shared_memory = None
+
+__author__ = 'Brandt M. Gibson'
+__credits__ = 'Matt Newville, Doga Gursoy'
+__all__ = ['shared_empty', 'slab_recon']
+
+## Per-process state set up by _init_worker.
+_worker = {}
+
+
+def _attach(name, shape, dtype, offset=0):
+    ## Spawned workers share the parent's resource tracker, which already
+    ## knows about the block, so attaching needs no extra bookkeeping.
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+
+
+def _init_worker(in_spec, out_spec, theta, sino_order, npad, recon_kwargs):
+    _worker['in_shm'], _worker['data'] = _attach(*in_spec)
+    _worker['out_shm'], _worker['out'] = _attach(*out_spec)
+    _worker['theta'] = theta
+    _worker['sino_order'] = sino_order
+    _worker['npad'] = npad
+    _worker['kwargs'] = recon_kwargs
+
+
+class _Segment(object):
+    ## Owner of a shared memory block for the arrays made from it with
+    ## np.asarray(). Arrays see the block through __array_interface__, so
+    ## they hold no buffer export and the block can be closed as soon as the
+    ## last of them is gone. With unlink the block keeps its name, so
+    ## workers can attach to it, until then.
+    def __init__(self, shm, shape, dtype, unlink=False):
+        self._shm = shm
+        self.name = shm.name if unlink else None
+        self._anchor = ctypes.c_char.from_buffer(shm.buf)
+        self.__array_interface__ = {'shape': tuple(shape),
+                                    'typestr': np.dtype(dtype).str,
+                                    'data': (ctypes.addressof(self._anchor), False),
+                                    'version': 3}
+
+    def __del__(self):
+        self._anchor = None
+        self._shm.close()
+        if self.name is not None:
+            self._shm.unlink()
+
+    def offset(self, array):
+        ## Byte offset of array in the block.
+        return array.__array_interface__['data'][0] - ctypes.addressof(self._anchor)
+
+
+def _segment(data):
+    ## The named _Segment holding a contiguous array, if there is one.
+    base = data
+    while isinstance(base, np.ndarray):
+        base = base.base
+    if isinstance(base, _Segment) and base.name is not None and data.flags.c_contiguous:
+        return base
+    return None
+
+
+def shared_empty(shape, dtype=np.float32):
+    '''
+    Uninitialized array in a new POSIX shared memory block. slab_recon()
+    passes such an array (or a contiguous slice of it) to its workers by
+    name instead of copying it. The block is freed with the array.
+    '''
+    if shared_memory is None:
+        return np.empty(shape, dtype=dtype)
+    nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    shm = shared_memory.SharedMemory(create=True, size=max(1, nbytes))
+    return np.asarray(_Segment(shm, shape, dtype, unlink=True))
+
+
+def _recon_slab(start, end, centers):
+    npad = _worker['npad']
+    slab = pad_slab(sino_slab(_worker['data'], start, end, _worker['sino_order']), npad)
+    reconstruct = engine(_worker['kwargs'].get('algorithm'))
+    rec = reconstruct(slab,
+                      _worker['theta'],
+                      center = centers + npad,
+                      sinogram_order = _worker['sino_order'],
+                      **_worker['kwargs'])
+    _worker['out'][start:end] = crop_recon(rec, npad)
+    return start, end
+
+
+def slab_recon(data, theta, center_array, nproc, sino_order=False, slab_rows=None,
+               npad=0, callback=None, **recon_kwargs):
+    '''
+    Reconstructs data with a pool of worker processes, one sinogram slab
+    per task.
+
+    Parameters
+    -------
+    data : ndarray
+            Normalized data in projection or sinogram order. Made with
+            shared_empty() it is used in place; otherwise it is copied into
+            shared memory for the call, so peak memory is twice the input
+            plus the output.
+    theta : ndarray
+            Projection angles in radians.
+    center_array : ndarray
+            One rotation center per sinogram row.
+    nproc : int
+            Number of worker processes.
+    sino_order : bool, optional
+            Layout of data (see layout.py).
+    slab_rows : int, optional
+            Rows per task. Defaults to about four tasks per worker. Rounded
+            up to an even number, since gridrec reconstructs slices in pairs.
+    npad : int, optional
+            Columns of edge padding added to each slab inside the worker
+            (see padding.py). Centers are in native column coordinates.
+    callback : callable, optional
+            Called as callback(rows_done, n_rows) in the parent as slabs finish.
+    recon_kwargs
+            Passed on to tp.recon (algorithm, filter_name, ncore, ...), or
+            to fbp.recon for algorithm='numpy_fbp'.
+
+    Returns
+    -------
+    rec : ndarray
+            Reconstructed volume (row, y, x). Its memory is the shared block
+            the workers wrote to, not a copy; the block is freed with the
+            array.
+    '''
+    if shared_memory is None:
+        raise RuntimeError('Multi-process reconstruction needs Python 3.8 or later.')
+    n_rows = nrows(data, sino_order)
+    ncols = data.shape[2]
+    center_array = np.broadcast_to(np.asarray(center_array, dtype=np.float32), (n_rows,))
+    if slab_rows is None:
+        slab_rows = max(1, int(np.ceil(n_rows / float(4 * nproc))))
+    slab_rows = int(slab_rows) + int(slab_rows) % 2
+    out_shape = (n_rows, ncols, ncols)
+    segment = _segment(data)
+    shm_in = None
+    if segment is None:
+        shm_in = shared_memory.SharedMemory(create=True, size=max(1, data.nbytes))
+    shm_out = shared_memory.SharedMemory(create=True, size=int(np.prod(out_shape)) * 4)
+    shared_in = shared_out = None
+    rec = None
+    try:
+        if segment is None:
+            shared_in = np.ndarray(data.shape, dtype=data.dtype, buffer=shm_in.buf)
+            shared_in[:] = data
+            in_spec = (shm_in.name, data.shape, data.dtype.str, 0)
+        else:
+            in_spec = (segment.name, data.shape, data.dtype.str, segment.offset(data))
+        shared_out = np.ndarray(out_shape, dtype=np.float32, buffer=shm_out.buf)
+        out_spec = (shm_out.name, out_shape, np.dtype(np.float32).str, 0)
+        ## Spawned workers do not inherit the GUI's or OpenMP's thread state.
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=nproc,
+                                 mp_context=ctx,
+                                 initializer=_init_worker,
+                                 initargs=(in_spec, out_spec, theta, sino_order, npad, recon_kwargs)) as pool:
+            futures = [pool.submit(_recon_slab, r0, min(n_rows, r0 + slab_rows),
+                                   np.array(center_array[r0:r0 + slab_rows]))
+                       for r0 in range(0, n_rows, slab_rows)]
+            done = 0
+            for future in as_completed(futures):
+                start, end = future.result()
+                done += end - start
+                if callback is not None:
+                    callback(done, n_rows)
+        shared_out = None
+        ## The output block is handed over as the result instead of copied.
+        rec = np.asarray(_Segment(shm_out, out_shape, np.float32))
+    finally:
+        ## Views into the blocks must go before the blocks can be closed.
+        shared_in = shared_out = None
+        if shm_in is not None:
+            shm_in.close()
+            shm_in.unlink()
+        ## Unlinking only removes the name; a returned result keeps the
+        ## mapping until it is freed.
+        shm_out.unlink()
+        if rec is None:
+            shm_out.close()
+    return rec
@@ -0,0 +1,216 @@
+'''
+Module for keeping several datasets open at once in the TomoPy_GUI app.
+
+SessionManager owns the arrays of every dataset that is not the one being
+worked on (projections, flats, darks, slice reconstructions) and counts
+their bytes. When the total plus whatever the caller still holds goes over
+budget, the least recently used arrays are spilled to memory-mapped files
+in a scratch directory. Spilled arrays stay usable as np.memmap and are
+read back into memory when their dataset is made active again.
+'''
+import os
+import time
+import shutil
+import tempfile
+from collections import OrderedDict
+import numpy as np
+
+__author__ = 'Brandt M. Gibson'
+__credits__ = 'Matt Newville, Doga Gursoy'
+__all__ = ['SessionManager', 'physical_memory']
+
+
+def physical_memory():
+    '''
+    Installed memory in bytes, or None if unknown.
+    '''
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+class SessionManager(object):
+    '''
+    Named datasets, each a dict of arrays plus free-form metadata.
+
+    Parameters
+    -------
+    max_bytes : int, optional
+            Memory budget for resident arrays, including the reserve passed
+            to enforce(). Defaults to half of physical memory; None if that
+            is unknown, which disables spilling.
+    spill_dir : str, optional
+            Directory for spill files. A temporary directory is created on
+            first use and removed by close().
+    '''
+    def __init__(self, max_bytes='auto', spill_dir=None):
+        if max_bytes == 'auto':
+            total = physical_memory()
+            max_bytes = None if total is None else total // 2
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self._own_dir = False
+        self.datasets = OrderedDict()
+        ## (name, key) -> time of last use.
+        self._used = {}
+
+    def names(self):
+        return list(self.datasets)
+
+    def __contains__(self, name):
+        return name in self.datasets
+
+    def _touch(self, name, key):
+        self._used[(name, key)] = time.time()
+
+    def put(self, name, key, array, reserve=0):
+        '''
+        Stores an array under dataset name. Other arrays are spilled if the
+        session goes over budget.
+        '''
+        entry = self.datasets.setdefault(name, {'arrays': {}, 'meta': {}, 'files': {}})
+        self._remove_file(name, key)
+        entry['arrays'][key] = array
+        self._touch(name, key)
+        self.enforce(reserve, keep=[(name, key)])
+
+    def get(self, name, key, default=None):
+        entry = self.datasets.get(name)
+        if entry is None or key not in entry['arrays']:
+            return default
+        self._touch(name, key)
+        return entry['arrays'][key]
+
+    def set_meta(self, name, meta):
+        entry = self.datasets.setdefault(name, {'arrays': {}, 'meta': {}, 'files': {}})
+        entry['meta'].update(meta)
+
+    def meta(self, name):
+        return self.datasets[name]['meta']
+
+    def resident_bytes(self):
+        '''
+        Bytes held in memory by arrays that have not been spilled.
+        '''
+        return sum(a.nbytes for entry in self.datasets.values()
+                   for a in entry['arrays'].values() if not isinstance(a, np.memmap))
+
+    def spilled_bytes(self):
+        '''
+        Bytes held in spill files.
+        '''
+        return sum(a.nbytes for entry in self.datasets.values()
+                   for a in entry['arrays'].values() if isinstance(a, np.memmap))
+
+    def report(self):
+        '''
+        Bytes of every array, and whether it has been spilled.
+
+        Returns
+        -------
+        dict of name -> dict of key -> (nbytes, spilled)
+        '''
+        return dict((name, dict((key, (int(a.nbytes), isinstance(a, np.memmap)))
+                                for key, a in entry['arrays'].items()))
+                    for name, entry in self.datasets.items())
+
+    def _spill_path(self, name, key):
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix='tomopy_gui_')
+            self._own_dir = True
+        safe = ''.join(c if c.isalnum() else '_' for c in str(name))
+        return os.path.join(self.spill_dir, safe+'_'+str(key)+'_'+str(id(self))+'.dat')
+
+    def spill(self, name, key):
+        '''
+        Moves one array to a memory-mapped file and drops the in-memory copy.
+        '''
+        entry = self.datasets[name]
+        array = entry['arrays'][key]
+        if isinstance(array, np.memmap) or array.nbytes == 0:
+            return
+        path = self._spill_path(name, key)
+        mm = np.memmap(path, dtype=array.dtype, mode='w+', shape=array.shape)
+        mm[:] = array
+        mm.flush()
+        entry['arrays'][key] = mm
+        entry['files'][key] = path
+
+    def enforce(self, reserve=0, keep=()):
+        '''
+        Spills least recently used arrays until resident bytes plus reserve
+        (bytes the caller holds outside the session) fit the budget. Arrays
+        listed in keep as (name, key) are never spilled.
+
+        Returns
+        -------
+        spilled : list of (name, key)
+        '''
+        spilled = []
+        if self.max_bytes is None:
+            return spilled
+        resident = self.resident_bytes()
+        for name, key in sorted(self._used, key=self._used.get):
+            if resident + reserve <= self.max_bytes:
+                break
+            if (name, key) in keep:
+                continue
+            array = self.datasets.get(name, {'arrays': {}})['arrays'].get(key)
+            if array is None or isinstance(array, np.memmap):
+                continue
+            self.spill(name, key)
+            resident -= array.nbytes
+            spilled.append((name, key))
+        return spilled
+
+    def pop(self, name, reserve=0):
+        '''
+        Removes a dataset from the session and returns (arrays, meta) with
+        every array back in memory, e.g. to make it the active dataset.
+        '''
+        entry = self.datasets[name]
+        spilled = sum(a.nbytes for a in entry['arrays'].values() if isinstance(a, np.memmap))
+        ## Make room before reading spilled arrays back.
+        self.enforce(reserve + spilled, keep=[(name, key) for key in entry['arrays']])
+        arrays = {}
+        for key, array in entry['arrays'].items():
+            arrays[key] = np.array(array) if isinstance(array, np.memmap) else array
+        meta = entry['meta']
+        self.drop(name)
+        return arrays, meta
+
+    def _remove_file(self, name, key):
+        entry = self.datasets.get(name)
+        if entry is None or key not in entry['files']:
+            return
+        path = entry['files'].pop(key)
+        ## The memmap must go before its file can be removed on Windows.
+        entry['arrays'].pop(key, None)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def drop(self, name):
+        '''
+        Forgets a dataset and deletes its spill files.
+        '''
+        entry = self.datasets.get(name)
+        if entry is None:
+            return
+        ## _remove_file() takes spilled arrays out of the entry, so their
+        ## use times must be cleared first.
+        for key in set(entry['arrays']) | set(entry['files']):
+            self._used.pop((name, key), None)
+        for key in list(entry['files']):
+            self._remove_file(name, key)
+        del self.datasets[name]
+
+    def close(self):
+        for name in self.names():
+            self.drop(name)
+        if self._own_dir and self.spill_dir is not None:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+            self.spill_dir = None
+            self._own_dir = False
@@ -0,0 +1,247 @@
+'''
+Module for stitching vertically offset scans in the TomoPy_GUI app.
+
+Tall samples are scanned as a stack of datasets, each shifted down by a
+little less than the detector height. stitch_scans() reconstructs the scans
+one sinogram slab at a time, blends the rows each pair of scans share with
+a linear ramp, and streams the result to a single .volume or HDF5 file.
+Only one slab and the overlap rows held back from the previous scan are in
+memory at any time.
+'''
+import os
+import numpy as np
+import tomopy as tp
+from .padding import padded_recon
+from .volume_io import VolumeWriter
+
+__author__ = 'Brandt M. Gibson'
+__credits__ = 'Matt Newville, Doga Gursoy'
+__all__ = ['preprocess_slab', 'read_slab', 'recon_scan', 'stitch_slabs', 'open_writer', 'stitch_scans']
+
+
+def _rows(field, r0, r1):
+    ## Flat or dark rows for a sinogram slab. Scalars and single images
+    ## without a row axis are used as they are.
+    if field is None or np.ndim(field) < 3:
+        return field
+    return field[:, r0:r1]
+
+
+def preprocess_slab(raw, flat, dark, air=False, ncore=None):
+    '''
+    Normalization steps of the app applied to one slab of raw projections:
+    flat/dark correction, optional air normalization, minus log and NaN
+    removal. Zinger removal, ring removal and phase retrieval are not
+    applied.
+
+    Parameters
+    -------
+    raw : ndarray
+            Raw data (angle, row, column).
+    flat, dark : ndarray
+            Flat and dark fields for the same rows.
+    air : bool, optional
+            Also normalize to the 10 air pixels at the sinogram edges.
+
+    Returns
+    -------
+    data : ndarray
+            float32 data ready for reconstruction.
+    '''
+    data = tp.normalize(raw, flat=flat, dark=dark, ncore=ncore)
+    if air:
+        data = tp.normalize_bg(data, air=10, ncore=ncore)
+    ## Same clamp as normalization() so stitched and single scan
+    ## reconstructions agree.
+    data[np.where(data < 0)] = 1**-6
+    tp.minus_log(data, out=data)
+    return tp.remove_nan(data, val=0., ncore=ncore)
+
+
+def read_slab(dataset, r0, r1, air=False, ncore=None):
+    '''
+    Reads sinogram rows r0 to r1 of a dataset and normalizes them.
+    '''
+    return preprocess_slab(dataset.read(sino=(r0, r1)),
+                           _rows(dataset.flat, r0, r1),
+                           _rows(dataset.dark, r0, r1),
+                           air = air,
+                           ncore = ncore)
+
+
+def recon_scan(dataset, center, npad=0, slab_rows=32, air=False, ncore=None, **recon_kwargs):
+    '''
+    Reads, normalizes and reconstructs a dataset slab by slab.
+
+    Parameters
+    -------
+    dataset : LazyDataset
+            Opened scan (see import_data.py).
+    center : float or ndarray
+            Rotation center, or one per sinogram row.
+    npad : int, optional
+            Columns of virtual padding per side (see padding.py).
+    slab_rows : int, optional
+            Sinogram rows read and reconstructed at a time.
+    recon_kwargs
+            Passed on to tp.recon (algorithm, filter_name, ...).
+
+    Yields
+    -------
+    rec : ndarray
+            Reconstructed slices (row, y, x) of the next slab.
+    '''
+    n_rows = dataset.shape[1]
+    centers = np.broadcast_to(np.asarray(center, dtype=np.float32), (n_rows,))
+    for r0 in range(0, n_rows, slab_rows):
+        r1 = min(n_rows, r0 + slab_rows)
+        data = read_slab(dataset, r0, r1, air, ncore)
+        rec = padded_recon(data, dataset.theta, centers[r0:r1], npad,
+                           chunk_rows = slab_rows,
+                           ncore = ncore,
+                           **recon_kwargs)
+        yield tp.remove_nan(rec, val=0., ncore=ncore)
+
+
+def stitch_slabs(parts, rows, overlaps):
+    '''
+    Joins streams of reconstructed slabs from vertically offset scans.
+
+    The last overlaps[i] rows of scan i cover the same part of the sample
+    as the first overlaps[i] rows of scan i+1. Those rows of scan i are held
+    back, then blended into scan i+1 with weights going linearly from scan i
+    to scan i+1 across the overlap.
+
+    Parameters
+    -------
+    parts : list of iterables
+            One per scan, top to bottom, each yielding (row, y, x) slabs in
+            row order (e.g. recon_scan()).
+    rows : list of int
+            Rows in each scan.
+    overlaps : list of int
+            Rows shared by scan i and scan i+1; one less than the scans.
+
+    Yields
+    -------
+    slab : ndarray
+            Next rows of the stitched volume.
+    '''
+    if len(overlaps) != len(parts) - 1:
+        raise ValueError('Need one overlap per pair of scans.')
+    tail = None
+    for i, part in enumerate(parts):
+        n = rows[i]
+        head = overlaps[i-1] if i > 0 else 0
+        keep = overlaps[i] if i < len(overlaps) else 0
+        if head + keep > n:
+            raise ValueError('Overlaps of scan '+str(i)+' are larger than its '+str(n)+' rows.')
+        new_tail = None
+        r0 = 0
+        for slab in part:
+            r1 = r0 + slab.shape[0]
+            ## Rows shared with the previous scan.
+            h1 = min(r1, head)
+            if h1 > r0:
+                w = ((np.arange(r0, h1, dtype=np.float32) + 0.5) / head)[:, None, None]
+                slab[:h1-r0] *= w
+                slab[:h1-r0] += (1 - w) * tail[r0:h1]
+            ## Rows shared with the next scan are held back.
+            t0 = max(r0, n - keep)
+            if t0 < r1:
+                if new_tail is None:
+                    new_tail = np.empty((keep,) + slab.shape[1:], dtype=np.float32)
+                new_tail[t0-(n-keep):r1-(n-keep)] = slab[t0-r0:]
+            end = min(r1, n - keep)
+            if end > r0:
+                yield slab[:end-r0]
+            r0 = r1
+        tail = new_tail
+
+
+class _H5Writer(object):
+    ## Same interface as VolumeWriter, for .h5 output.
+    def __init__(self, fname, shape, dtype='f4', attrs=None, path='/exchange/data'):
+        import h5py
+        self.shape = tuple(int(n) for n in shape)
+        self._f = h5py.File(fname, 'w')
+        self._d = self._f.create_dataset(path, self.shape, dtype=dtype,
+                                         chunks=(1,) + self.shape[1:])
+        for key, value in (attrs or {}).items():
+            self._d.attrs[key] = value
+        self.written = 0
+
+    def write(self, slab):
+        slab = np.asarray(slab)
+        if slab.shape[1:] != self.shape[1:] or self.written + slab.shape[0] > self.shape[0]:
+            raise ValueError('Slab of shape ' + str(slab.shape) + ' does not fit volume ' + str(self.shape))
+        self._d[self.written:self.written+slab.shape[0]] = slab
+        self.written += slab.shape[0]
+
+    def close(self):
+        if self._f is None:
+            return
+        self._f.close()
+        self._f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_writer(fname, shape, dtype='f4', attrs=None):
+    '''
+    Slab writer for a .h5/.hdf5 file (needs h5py) or a netCDF3 .volume file
+    (any other extension).
+    '''
+    if os.path.splitext(fname)[1].lower() in ('.h5', '.hdf5'):
+        return _H5Writer(fname, shape, dtype, attrs)
+    return VolumeWriter(fname, shape, dtype, attrs)
+
+
+def stitch_scans(datasets, centers, overlaps, fname, npad=0, slab_rows=32, air=False,
+                 ncore=None, callback=None, **recon_kwargs):
+    '''
+    Reconstructs a stack of scans and writes them as one stitched volume.
+
+    Parameters
+    -------
+    datasets : list of LazyDataset
+            Scans from top to bottom, all with the same detector width.
+    centers : list
+            Rotation center of each scan, a float or one per row.
+    overlaps : int or list of int
+            Rows shared by each pair of neighbouring scans.
+    fname : str
+            Output file, .volume or .h5.
+    callback : callable, optional
+            Called as callback(rows_written, n_rows) after each slab.
+    recon_kwargs
+            Passed on to tp.recon.
+
+    Returns
+    -------
+    shape : tuple
+            Shape of the stitched volume.
+    '''
+    if np.ndim(overlaps) == 0:
+        overlaps = [int(overlaps)] * (len(datasets) - 1)
+    ncols = datasets[0].shape[2]
+    if any(d.shape[2] != ncols for d in datasets):
+        raise ValueError('All scans must have the same detector width.')
+    rows = [d.shape[1] for d in datasets]
+    shape = (sum(rows) - sum(overlaps), ncols, ncols)
+    attrs = {'description': 'Stitched tomography dataset',
+             'source': 'APS GSECARS 13BM',
+             'stitch_scans': ';'.join(os.path.basename(d.fname) for d in datasets),
+             'stitch_overlaps': np.asarray(overlaps, dtype=np.int32)}
+    parts = [recon_scan(d, c, npad, slab_rows, air, ncore, **recon_kwargs)
+             for d, c in zip(datasets, centers)]
+    with open_writer(fname, shape, 'f4', attrs) as out:
+        for slab in stitch_slabs(parts, rows, overlaps):
+            out.write(slab)
+            if callback is not None:
+                callback(out.written, shape[0])
+    return shape
@@ -0,0 +1,199 @@
+'''
+Module for comparing reconstruction settings on one slice in the TomoPy_GUI app.
+
+sweep_slice() reconstructs a single sinogram once for every combination of
+algorithm, filter and iteration count, in a pool of worker processes, and
+times each run inside its worker. Filters only apply to the filtered
+algorithms and iteration counts only to the iterative ones, so the grid is
+pruned of runs that would repeat. mosaic() tiles the results into a single
+image for display, each tile scaled to its own intensity window.
+
+Each worker's first run is repeated untimed beforehand, so import and
+first-call costs are not charged to it. Runs share the machine with the
+other workers, so times are for concurrent runs; nproc=1 times them one at
+a time.
+'''
+import os
+import time
+import numpy as np
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .padding import padded_recon
+from .iterative import ITERATIVE_ALGORITHMS
+from .fbp import ALGORITHM
+
+__author__ = 'Brandt M. Gibson'
+__credits__ = 'Matt Newville, Doga Gursoy'
+__all__ = ['FILTERED_ALGORITHMS', 'sweep_grid', 'label', 'sweep_slice', 'mosaic']
+
+## Algorithms that take filter_name.
+FILTERED_ALGORITHMS = ('gridrec', 'fbp', ALGORITHM)
+
+## Per-process state set up by _init_worker.
+_worker = {}
+
+
+def sweep_grid(algorithms, filters, iterations):
+    '''
+    Runs needed to compare every algorithm, filter and iteration count.
+
+    Returns
+    -------
+    combos : list of tuple
+            (algorithm, filter_name, num_iter), with None where the setting
+            does not apply to the algorithm.
+    '''
+    combos = []
+    for algorithm in algorithms:
+        names = filters if algorithm in FILTERED_ALGORITHMS else [None]
+        counts = iterations if algorithm in ITERATIVE_ALGORITHMS else [None]
+        for filter_name in names:
+            for num_iter in counts:
+                combo = (algorithm, filter_name, None if num_iter is None else int(num_iter))
+                if combo not in combos:
+                    combos.append(combo)
+    return combos
+
+
+def label(combo):
+    '''
+    Short name of a run, e.g. 'gridrec/hann' or 'sirt x50'.
+    '''
+    algorithm, filter_name, num_iter = combo
+    text = algorithm
+    if filter_name is not None:
+        text += '/' + filter_name
+    if num_iter is not None:
+        text += ' x' + str(num_iter)
+    return text
+
+
+def _init_worker(sino, theta, center, npad, ncore):
+    _worker['sino'] = sino
+    _worker['theta'] = theta
+    _worker['center'] = center
+    _worker['npad'] = npad
+    _worker['ncore'] = ncore
+
+
+def _recon(combo):
+    algorithm, filter_name, num_iter = combo
+    kwargs = {'algorithm': algorithm, 'ncore': _worker['ncore']}
+    if filter_name is not None:
+        kwargs['filter_name'] = filter_name
+    if num_iter is not None:
+        kwargs['num_iter'] = num_iter
+    return padded_recon(_worker['sino'],
+                        _worker['theta'],
+                        _worker['center'],
+                        _worker['npad'],
+                        sino_order = True,
+                        **kwargs)
+
+
+def _run(combo):
+    ## One timed reconstruction of the sweep sinogram, after an untimed
+    ## warm-up on the worker's first run.
+    if not _worker.get('warm'):
+        _recon(combo)
+        _worker['warm'] = True
+    t0 = time.perf_counter()
+    rec = _recon(combo)
+    seconds = time.perf_counter() - t0
+    return combo, rec[0], seconds
+
+
+def sweep_slice(sino, theta, center, combos, npad=0, nproc=None, ncore=1, callback=None):
+    '''
+    Reconstructs one sinogram with every combination in combos.
+
+    Parameters
+    -------
+    sino : ndarray
+            2D sinogram (angle, column) of normalized data.
+    theta : ndarray
+            Projection angles in radians.
+    center : float
+            Rotation center of the slice.
+    combos : list of tuple
+            Runs from sweep_grid().
+    npad : int, optional
+            Columns of padding per side (see padding.py).
+    nproc : int, optional
+            Worker processes, at most one per run. Defaults to one per core.
+            With 1, runs are done in this process one at a time, so each
+            is timed on an otherwise idle machine.
+    ncore : int, optional
+            Threads for each run, as for tp.recon.
+    callback : callable, optional
+            Called as callback(runs_done, n_runs, result) as runs finish.
+
+    Returns
+    -------
+    results : list of dict
+            One per combo, in order, with 'algorithm', 'filter_name',
+            'num_iter', 'label', 'seconds' and 'image'.
+    '''
+    if nproc is None:
+        nproc = os.cpu_count() or 1
+    nproc = max(1, min(int(nproc), len(combos)))
+    sino = np.ascontiguousarray(sino, dtype=np.float32)[None]
+    initargs = (sino, np.asarray(theta), float(center), npad, int(ncore))
+    found = {}
+    def collect(result):
+        combo, image, seconds = result
+        found[combo] = {'algorithm': combo[0],
+                        'filter_name': combo[1],
+                        'num_iter': combo[2],
+                        'label': label(combo),
+                        'seconds': seconds,
+                        'image': image}
+        if callback is not None:
+            callback(len(found), len(combos), found[combo])
+    if nproc == 1:
+        _init_worker(*initargs)
+        try:
+            for combo in combos:
+                collect(_run(combo))
+        finally:
+            _worker.clear()
+    else:
+        ## Spawned workers do not inherit the GUI's or OpenMP's thread state.
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=nproc,
+                                 mp_context=ctx,
+                                 initializer=_init_worker,
+                                 initargs=initargs) as pool:
+            futures = [pool.submit(_run, combo) for combo in combos]
+            for future in as_completed(futures):
+                collect(future.result())
+    return [found[combo] for combo in combos]
+
+
+def mosaic(images, columns=None, gap=4, lower=0.5, upper=99.5):
+    '''
+    Tiles equally sized images into one, row by row. Each tile is windowed
+    to its own percentiles and scaled to 0-1, so algorithms with different
+    intensity scales can be compared; gaps are 0.
+
+    Returns
+    -------
+    tiled : ndarray
+            float32 mosaic.
+    origins : list of (row, column)
+            Top left pixel of each tile.
+    '''
+    n = len(images)
+    if columns is None:
+        columns = int(np.ceil(np.sqrt(n)))
+    rows = int(np.ceil(n / float(columns)))
+    h, w = images[0].shape
+    tiled = np.full((rows * (h + gap) - gap, columns * (w + gap) - gap), 0., dtype=np.float32)
+    origins = []
+    for i, image in enumerate(images):
+        y = (i // columns) * (h + gap)
+        x = (i % columns) * (w + gap)
+        lo, hi = np.nanpercentile(image, (lower, upper))
+        tiled[y:y+h, x:x+w] = np.clip((image - lo) / ((hi - lo) or 1.), 0, 1)
+        origins.append((y, x))
+    return tiled, origins
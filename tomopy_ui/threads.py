@@ -0,0 +1,140 @@
+'''
+Module for coordinating thread counts between processing stages in the TomoPy_GUI app.
+
+tomopy splits work over ncore threads, while NumPy/BLAS and OpenMP keep
+their own pools sized to every core by default. Running both at once, or
+inside worker processes, oversubscribes the machine. ThreadGovernor gives
+each stage a thread budget: tomopy gets ncore (split over worker processes
+if there are any) and the native pools get what is left over.
+
+threadpoolctl is used when it is installed, so pools that are already
+running are limited too. Without it the usual environment variables are
+set, which reaches worker processes and any pool not yet started.
+'''
+import os
+import time
+from contextlib import contextmanager
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+__author__ = 'Brandt M. Gibson'
+__credits__ = 'Matt Newville, Doga Gursoy'
+__all__ = ['ThreadGovernor', 'limit_threads']
+
+## Variables read by OpenMP and the common BLAS builds at pool start-up.
+THREAD_ENV = ('OMP_NUM_THREADS',
+              'OPENBLAS_NUM_THREADS',
+              'MKL_NUM_THREADS',
+              'NUMEXPR_NUM_THREADS',
+              'VECLIB_MAXIMUM_THREADS')
+
+
+def limit_threads(n):
+    '''
+    Caps BLAS and OpenMP pools in this process (and in processes started
+    from it) at n threads.
+
+    Returns
+    -------
+    restore : callable
+            Puts the previous limits back.
+    '''
+    saved = dict((k, os.environ.get(k)) for k in THREAD_ENV)
+    for k in THREAD_ENV:
+        os.environ[k] = str(int(n))
+    limiter = None
+    if threadpool_limits is not None:
+        limiter = threadpool_limits(limits=int(n))
+    def restore():
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        if limiter is not None:
+            limiter.restore_original_limits()
+    return restore
+
+
+class ThreadGovernor(object):
+    '''
+    Hands out thread budgets per stage and keeps a record of what each
+    stage actually ran with.
+
+    Parameters
+    -------
+    max_threads : int, optional
+            Threads the machine can run at once. Defaults to the core count.
+    status : RunStatus, optional
+            Told when each stage begins and ends (see metrics.py).
+
+    Attributes
+    -------
+    stages : dict
+            Last run of each stage: 'processes', 'tomopy', 'native',
+            'effective' (total threads), 'seconds' and 'backend'.
+    '''
+    def __init__(self, max_threads=None, status=None):
+        if max_threads is None:
+            max_threads = os.cpu_count() or 1
+        self.max_threads = max_threads
+        self.status = status
+        self.stages = {}
+
+    def plan(self, ncore, nproc=1, native=None):
+        '''
+        Thread budget for a stage that runs tomopy with ncore threads over
+        nproc processes. Native pools get one thread each when tomopy is
+        already parallel, otherwise the whole ncore.
+        '''
+        ncore = max(1, min(int(ncore), self.max_threads))
+        nproc = max(1, int(nproc))
+        tomopy_threads = max(1, ncore // nproc)
+        if native is None:
+            native = 1 if tomopy_threads > 1 or nproc > 1 else ncore
+        return {'processes': nproc,
+                'tomopy': tomopy_threads,
+                'native': int(native),
+                'effective': nproc * tomopy_threads * int(native)}
+
+    @contextmanager
+    def stage(self, name, ncore, nproc=1, native=None):
+        '''
+        Runs the body of a with block under the stage's thread budget.
+
+        Yields
+        -------
+        plan : dict
+                As returned by plan(); pass plan['tomopy'] on as ncore.
+        '''
+        plan = self.plan(ncore, nproc, native)
+        restore = limit_threads(plan['native'])
+        if self.status is not None:
+            self.status.begin(name)
+        t0 = time.time()
+        try:
+            yield plan
+        finally:
+            restore()
+            if self.status is not None:
+                self.status.end()
+            plan['seconds'] = time.time() - t0
+            plan['backend'] = 'threadpoolctl' if threadpool_limits is not None else 'environment'
+            self.stages[name] = plan
+
+    def describe(self, name):
+        '''
+        One line summary of the last run of a stage.
+        '''
+        p = self.stages[name]
+        return (name+': '+str(p['processes'])+' process(es) x '+str(p['tomopy'])+' tomopy x '
+                +str(p['native'])+' native = '+str(p['effective'])+' threads, '
+                +str(round(p['seconds'], 2))+' s ('+p['backend']+')')
+
+    def report(self):
+        '''
+        Summary of every stage run so far.
+        '''
+        return '\n'.join(self.describe(name) for name in sorted(self.stages))
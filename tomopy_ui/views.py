@@ -0,0 +1,120 @@
+'''
+Module for serving orthogonal views of the working volume in the TomoPy_GUI app.
+'''
+import numpy as np
+
+__author__ = 'Brandt M. Gibson'
+__credits__ = 'Matt Newville, Doga Gursoy'
+__all__ = ['OrthoViews']
+
+
+class OrthoViews(object):
+    '''
+    Serves Z, Y and X views of a (z, y, x) ordered volume.
+
+    Z views are contiguous and are returned straight from the data. Y and X
+    views are strided gathers through every page of the volume, so on first
+    request a transposed float32 copy is built with the requested axis
+    first. Later requests for any slice along that axis are a single
+    contiguous read. The in-plane axes of the copy are downsampled when
+    needed to keep it under max_bytes. Copies are dropped by invalidate().
+
+    Parameters
+    -------
+    max_bytes : int, optional
+            Upper limit on the size of each transposed copy.
+    block : int, optional
+            Number of z slices transposed per step while building a copy.
+    '''
+    def __init__(self, max_bytes=512*2**20, block=32):
+        self.max_bytes = max_bytes
+        self.block = block
+        self.generation = 0
+        self._key = None
+        self._copies = {}
+
+    def invalidate(self):
+        '''
+        Drops the transposed copies. Called whenever the data change.
+        '''
+        self.generation += 1
+        self._key = None
+        self._copies = {}
+
+    def _check(self, data):
+        key = (id(data), data.shape, data.dtype.str, self.generation)
+        if key != self._key:
+            self._key = key
+            self._copies = {}
+
+    def _step(self, data):
+        ## Smallest in-plane stride that keeps a float32 copy under max_bytes.
+        full = float(data.size) * 4
+        step = 1
+        while full / (step * step) > self.max_bytes:
+            step += 1
+        return step
+
+    def _build(self, data, plane):
+        ## Transposes the volume block by block so that the temporary is only
+        ## one block of z slices, and each block is read once contiguously.
+        nz, ny, nx = data.shape
+        step = self._step(data)
+        zs = range(0, nz, step)
+        if plane == 'Y':
+            copy = np.empty((ny, len(zs), len(range(0, nx, step))), dtype=np.float32)
+        else:
+            copy = np.empty((nx, len(zs), len(range(0, ny, step))), dtype=np.float32)
+        for k0 in range(0, len(zs), self.block):
+            k1 = min(len(zs), k0 + self.block)
+            src = data[k0*step:k1*step:step]
+            if plane == 'Y':
+                copy[:, k0:k1, :] = src[:, :, ::step].transpose(1, 0, 2)
+            else:
+                copy[:, k0:k1, :] = src[:, ::step, :].transpose(2, 0, 1)
+        self._copies[plane] = copy
+        return copy
+
+    def _raw(self, data, plane, index):
+        ## Unflipped slice along one array axis: data[index], data[:, index, :]
+        ## or data[:, :, index].
+        if plane == 'Z':
+            return data[index]
+        copy = self._copies.get(plane)
+        if copy is None:
+            copy = self._build(data, plane)
+        return copy[index]
+
+    def get(self, data, plane, index, sino_order=False):
+        '''
+        Returns one orthogonal slice, oriented the same way plotData has
+        always shown it.
+
+        Parameters
+        -------
+        data : ndarray
+                Volume ordered (z, y, x), or (row, angle, column) when
+                sino_order is set.
+        plane : str
+                'Z', 'Y' or 'X', as seen in projection order.
+        index : int
+                Slice along the chosen axis.
+        sino_order : bool, optional
+                Data are in sinogram order (see layout.py). Z (projection)
+                and Y (sinogram) swap array axes, and X views are transposed
+                back to (angle, row).
+
+        Returns
+        -------
+        ndarray
+        '''
+        self._check(data)
+        plane = plane[0].upper()
+        if sino_order and plane != 'X':
+            plane = 'Y' if plane == 'Z' else 'Z'
+        view = self._raw(data, plane, index)
+        if plane == 'X':
+            if sino_order:
+                return view.T[:, ::-1]
+            return view[:, ::-1]
+        return view[::-1, :]
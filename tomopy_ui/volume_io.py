@@ -0,0 +1,260 @@
+'''
+Module for reading and writing netCDF3 .volume files in the TomoPy_GUI app.
+
+Classic and 64-bit offset netCDF3 files store each fixed-size variable as
+one contiguous big-endian block at an offset given in the header. Parsing
+the header is enough to memory-map a variable as a NumPy array, so a
+reconstruction of any size opens without reading or copying its voxels,
+and a writer only has to emit the header once before streaming slabs.
+'''
+import struct
+import numpy as np
+
+__author__ = 'Brandt M. Gibson'
+__credits__ = 'Matt Newville, Doga Gursoy'
+__all__ = ['read_header', 'open_volume', 'VolumeWriter']
+
+## netCDF3 header tags and external types.
+NC_DIMENSION = 10
+NC_VARIABLE = 11
+NC_ATTRIBUTE = 12
+NC_TYPES = {1: '>i1', 2: 'S1', 3: '>i2', 4: '>i4', 5: '>f4', 6: '>f8'}
+NC_CODES = {'i1': 1, 'i2': 3, 'i4': 4, 'f4': 5, 'f8': 6}
+
+
+def _pad4(n):
+    return (4 - n % 4) % 4
+
+
+class _HeaderReader(object):
+    def __init__(self, fh):
+        self.fh = fh
+
+    def int32(self):
+        return struct.unpack('>i', self.fh.read(4))[0]
+
+    def int64(self):
+        return struct.unpack('>q', self.fh.read(8))[0]
+
+    def name(self):
+        n = self.int32()
+        text = self.fh.read(n)
+        self.fh.read(_pad4(n))
+        return text.decode('utf-8')
+
+    def values(self, nc_type, n):
+        dtype = np.dtype(NC_TYPES[nc_type])
+        raw = self.fh.read(n * dtype.itemsize)
+        self.fh.read(_pad4(n * dtype.itemsize))
+        if nc_type == 2:
+            return raw.decode('utf-8', 'replace').rstrip('\x00')
+        values = np.frombuffer(raw, dtype=dtype)
+        return values[0] if n == 1 else values
+
+    def attributes(self):
+        tag = self.int32()
+        n = self.int32()
+        attrs = {}
+        if tag == 0:
+            return attrs
+        if tag != NC_ATTRIBUTE:
+            raise IOError('Malformed netCDF3 attribute list.')
+        for i in range(n):
+            key = self.name()
+            nc_type = self.int32()
+            attrs[key] = self.values(nc_type, self.int32())
+        return attrs
+
+
+def read_header(fname):
+    '''
+    Parses the header of a netCDF3 classic or 64-bit offset file.
+
+    Parameters
+    -------
+    fname : str
+            File to read.
+
+    Returns
+    -------
+    header : dict
+            'dims' (list of (name, length)), 'attrs' (global attributes) and
+            'vars' (dict of name to dict with 'shape', 'dtype', 'offset', 'attrs').
+    '''
+    with open(fname, 'rb') as fh:
+        magic = fh.read(4)
+        if magic[:3] != b'CDF' or magic[3:4] not in (b'\x01', b'\x02'):
+            raise IOError(fname + ' is not a netCDF3 classic or 64-bit offset file.')
+        offset64 = magic[3:4] == b'\x02'
+        r = _HeaderReader(fh)
+        r.int32()   # numrecs
+        dims = []
+        tag = r.int32()
+        n = r.int32()
+        if tag == NC_DIMENSION:
+            for i in range(n):
+                dims.append((r.name(), r.int32()))
+        attrs = r.attributes()
+        variables = {}
+        tag = r.int32()
+        n = r.int32()
+        if tag == NC_VARIABLE:
+            for i in range(n):
+                name = r.name()
+                dimids = [r.int32() for j in range(r.int32())]
+                vattrs = r.attributes()
+                nc_type = r.int32()
+                r.int32()   # vsize
+                begin = r.int64() if offset64 else r.int32()
+                variables[name] = {'shape': tuple(dims[d][1] for d in dimids),
+                                   'dtype': np.dtype(NC_TYPES[nc_type]),
+                                   'offset': begin,
+                                   'attrs': vattrs}
+    return {'dims': dims, 'attrs': attrs, 'vars': variables}
+
+
+def open_volume(fname, var='VOLUME', mode='c'):
+    '''
+    Memory-maps one variable of a netCDF3 file with no copy.
+
+    Parameters
+    -------
+    fname : str
+            File to open.
+    var : str, optional
+            Variable name. tomoRecon and this app use 'VOLUME'.
+    mode : str, optional
+            np.memmap mode. The default 'c' (copy-on-write) lets processing
+            steps modify the array without touching the file.
+
+    Returns
+    -------
+    volume : np.memmap
+            Big-endian array in (NZ, NY, NX) order.
+    header : dict
+            As returned by read_header.
+    '''
+    header = read_header(fname)
+    info = header['vars'][var]
+    if 0 in info['shape']:
+        raise IOError('Record (unlimited) variables cannot be memory-mapped.')
+    volume = np.memmap(fname, dtype=info['dtype'], mode=mode,
+                       offset=info['offset'], shape=info['shape'])
+    return volume, header
+
+
+def _name(text):
+    raw = text.encode('utf-8')
+    return struct.pack('>i', len(raw)) + raw + b'\x00' * _pad4(len(raw))
+
+
+def _attribute(key, value):
+    ## Strings become NC_CHAR, integers NC_INT and everything else NC_DOUBLE.
+    if isinstance(value, str):
+        raw = value.encode('utf-8')
+        return _name(key) + struct.pack('>ii', 2, len(raw)) + raw + b'\x00' * _pad4(len(raw))
+    values = np.atleast_1d(value)
+    if values.dtype.kind in 'iu':
+        raw = values.astype('>i4').tobytes()
+        return _name(key) + struct.pack('>ii', 4, values.size) + raw
+    raw = values.astype('>f8').tobytes()
+    return _name(key) + struct.pack('>ii', 6, values.size) + raw
+
+
+class VolumeWriter(object):
+    '''
+    Streams a (NZ, NY, NX) volume to a netCDF3 64-bit offset .volume file.
+
+    The header is written once when the file is opened, then slabs along NZ
+    are appended in order with one large sequential write each. Memory use
+    is one converted slab, whatever the size of the volume. The data block
+    starts on an align-byte boundary; netCDF readers skip the gap after the
+    header.
+
+    Parameters
+    -------
+    fname : str
+            File to create. Overwritten if it exists.
+    shape : tuple
+            (NZ, NY, NX) of the whole volume.
+    dtype : str, optional
+            'f4', 'i2', 'i1', 'i4' or 'f8'. netCDF3 has no unsigned types.
+    attrs : dict, optional
+            Global attributes.
+    align : int, optional
+            Alignment of the data block in bytes.
+    '''
+    def __init__(self, fname, shape, dtype='f4', attrs=None, var='VOLUME',
+                 dims=('NZ', 'NY', 'NX'), align=4096):
+        code = NC_CODES.get(np.dtype(dtype).str[1:])
+        if code is None:
+            raise ValueError('netCDF3 does not support ' + str(dtype) + ' data.')
+        self.fname = fname
+        self.shape = tuple(int(n) for n in shape)
+        self.dtype = np.dtype(NC_TYPES[code])
+        if attrs is None:
+            attrs = {}
+        nbytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        vsize = nbytes + _pad4(nbytes)
+        if vsize > 2**32 - 4:
+            vsize = 2**32 - 1
+        header = b'CDF\x02' + struct.pack('>i', 0)
+        header += struct.pack('>ii', NC_DIMENSION, len(dims))
+        for name, n in zip(dims, self.shape):
+            header += _name(name) + struct.pack('>i', n)
+        if attrs:
+            header += struct.pack('>ii', NC_ATTRIBUTE, len(attrs))
+            for key in sorted(attrs):
+                header += _attribute(key, attrs[key])
+        else:
+            header += struct.pack('>ii', 0, 0)
+        header += struct.pack('>ii', NC_VARIABLE, 1)
+        header += _name(var) + struct.pack('>i', len(dims))
+        header += struct.pack('>' + 'i' * len(dims), *range(len(dims)))
+        header += struct.pack('>ii', 0, 0)   # no variable attributes
+        header += struct.pack('>ii', code, vsize)
+        self.offset = int(np.ceil((len(header) + 8) / float(align))) * align
+        header += struct.pack('>q', self.offset)
+        self._fh = open(fname, 'wb')
+        self._fh.write(header + b'\x00' * (self.offset - len(header)))
+        self._nbytes = nbytes
+        self.written = 0
+
+    def write(self, slab):
+        '''
+        Appends the next slab of NZ slices. Data are converted to the file
+        type (big-endian) one slab at a time.
+        '''
+        slab = np.asarray(slab)
+        if slab.ndim == 2:
+            slab = slab[None]
+        if slab.shape[1:] != self.shape[1:] or self.written + slab.shape[0] > self.shape[0]:
+            raise ValueError('Slab of shape ' + str(slab.shape) + ' does not fit volume ' + str(self.shape))
+        out = np.ascontiguousarray(slab, dtype=self.dtype)
+        self._fh.write(memoryview(out).cast('B'))
+        self.written += slab.shape[0]
+
+    def write_slabs(self, slabs):
+        '''
+        Consumes an iterable of slabs, e.g. from a slab-wise reconstruction.
+        '''
+        for slab in slabs:
+            self.write(slab)
+
+    def close(self):
+        '''
+        Closes the file. Slices that were never written are left as zeros so
+        the file is always the size the header says.
+        '''
+        if self._fh is None:
+            return
+        end = self.offset + self._nbytes + _pad4(self._nbytes)
+        self._fh.truncate(end)
+        self._fh.close()
+        self._fh = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()